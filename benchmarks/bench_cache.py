@@ -0,0 +1,78 @@
+"""
+Teste de carga do cache de respostas do site3 (cache.CacheRespostas).
+
+Popula um banco SQLite com alertas e mede requisições/s de '/' e '/modulos.json' com o cache
+desligado, com o cache ligado (200 a partir da memória) e com If-None-Match (304), como
+faz o navegador no polling de 5 s do dashboard. Também simula uma escrita da ingestão
+no meio do teste para conferir a invalidação.
+
+Uso:
+    python benchmarks/bench_cache.py --alertas 200000 --segundos 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def medir(cliente, caminho, segundos, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    feitas, inicio = 0, time.perf_counter()
+    while time.perf_counter() - inicio < segundos:
+        resposta = cliente.get(caminho, headers=headers)
+        assert resposta.status_code in (200, 304), resposta.status_code
+        feitas += 1
+    return feitas / (time.perf_counter() - inicio), resposta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alertas', type=int, default=200_000)
+    parser.add_argument('--modulos', type=int, default=50)
+    parser.add_argument('--segundos', type=float, default=3.0)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='bench_cache_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+    import API
+    import site3
+    from bench_modulos_json import popular
+
+    popular(API, args.alertas, args.modulos)
+    session = API.criar_sessao()
+    API.reconstruir_status_modulos(session)
+    session.commit()
+    session.close()
+
+    # Os templates ficam na raiz do repositório
+    site3.app.template_folder = RAIZ
+    cliente = site3.app.test_client()
+
+    for caminho in ('/', '/modulos.json'):
+        site3.cache.ativo = False
+        sem_cache, _ = medir(cliente, caminho, args.segundos)
+        site3.cache.ativo = True
+        com_cache, resposta = medir(cliente, caminho, args.segundos)
+        com_304, _ = medir(cliente, caminho, args.segundos, etag=resposta.headers['ETag'])
+        print(f"{caminho:14s} sem cache {sem_cache:8.0f} req/s | com cache {com_cache:8.0f} req/s "
+              f"| If-None-Match (304) {com_304:8.0f} req/s")
+
+    # Uma gravação da ingestão muda a versão: a próxima resposta deve ser recalculada
+    etag = cliente.get('/modulos.json').headers['ETag']
+    session = API.criar_sessao()
+    API.gravar_lote(session, [API.interpretar_mensagem(b"A,-23.56,-46.64,1")])
+    session.commit()
+    session.close()
+    time.sleep(site3.INTERVALO_VERSAO)
+    resposta = cliente.get('/modulos.json', headers={'If-None-Match': etag})
+    print(f"Após nova gravação: status {resposta.status_code} (esperado 200)")
+    print(f"Métricas: {site3.cache.metricas()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark dos modos do pipeline em CONFIRMANDO (modelos.DetectionPipeline).
+
+Para cada frame de vídeos gravados (ou de frames sintéticos) mede a latência por frame de:
+- 'sequential': só o modelo 2 sobre o frame inteiro (comportamento original);
+- 'dual': modelo 1 e modelo 2 sobre o mesmo tensor pré-processado;
+- 'cascade': modelo 1 no frame e modelo 2 sobre os recortes marcados, em lote e um a um.
+E confere que as otimizações não mudam resultados: o tensor compartilhado do 'dual' dá as mesmas
+contagens que pré-processar cada modelo separadamente, e o lote da cascata dá as mesmas contagens
+que invocar cada recorte sozinho. A concordância entre cascata e frame inteiro é informada à parte,
+pois a cascata muda de propósito o que o modelo 2 vê.
+
+--forcar-celulas K marca K células extras por frame na saída do modelo 1, para exercitar a cascata
+em vídeos onde o modelo 1 quase não detecta fogo (padrão: 3 com frames sintéticos, 0 com vídeos).
+Qualquer divergência nas duas verificações termina o script com erro (código de saída 1).
+
+Uso:
+    python benchmarks/bench_cascata.py video1.mp4 video2.mp4 --frames 300
+    python benchmarks/bench_cascata.py --frames 200 --forcar-celulas 3 --num-threads 1
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+from captura import SyntheticFrameSource, VideoFileSource
+from configuracao import LABELS_1, LABELS_2, DETECTION_THRESHOLD_1, DETECTION_THRESHOLD_2
+from modelos import DetectionPipeline, ModelRunner
+
+
+def carregar_frames(videos, quantidade):
+    fontes = [VideoFileSource(video, realtime=False) for video in videos] or [SyntheticFrameSource(fps=None)]
+    frames = []
+    for fonte in fontes:
+        while len(frames) < quantidade * (fontes.index(fonte) + 1) // len(fontes):
+            ok, frame = fonte.read()
+            if not ok:
+                break
+            frames.append(frame)
+        fonte.release()
+    return frames
+
+
+def resumo(tempos):
+    tempos = np.array(tempos) * 1000
+    return f"p50 {np.percentile(tempos, 50):6.2f} ms | p95 {np.percentile(tempos, 95):6.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='*', help="Vídeos gravados (padrão: frames sintéticos)")
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--num-threads', type=int, default=1)
+    parser.add_argument('--forcar-celulas', type=int, default=None)
+    parser.add_argument('--modelo-1', default=os.path.join(RAIZ, 'Modelo_Fogo.tflite'))
+    parser.add_argument('--modelo-2', default=os.path.join(RAIZ, 'Fumaça.tflite'))
+    args = parser.parse_args()
+    if args.forcar_celulas is None:
+        # Nos frames sintéticos o modelo 1 não marca nada e a cascata não rodaria o modelo 2
+        args.forcar_celulas = 0 if args.videos else 3
+
+    frames = carregar_frames(args.videos, args.frames)
+    print(f"{len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]}, num_threads={args.num_threads}")
+
+    model_1 = ModelRunner(args.modelo_1, LABELS_1, DETECTION_THRESHOLD_1, 0, args.num_threads)
+    model_2 = ModelRunner(args.modelo_2, LABELS_2, DETECTION_THRESHOLD_2, 1, args.num_threads)
+    model_2_um_a_um = ModelRunner(args.modelo_2, LABELS_2, DETECTION_THRESHOLD_2, 1, args.num_threads)
+    model_2_um_a_um.supports_batch = False
+
+    frame_atual = {'indice': 0}
+    if args.forcar_celulas:
+        mascara_original = model_1.mask
+
+        def mascara_forcada(output_data):
+            mascara = mascara_original(output_data).copy()
+            rng = np.random.default_rng(frame_atual['indice'])
+            mascara.flat[rng.choice(mascara.size, args.forcar_celulas, replace=False)] = True
+            return mascara
+        model_1.mask = mascara_forcada
+
+    pipelines = {
+        'sequential': DetectionPipeline(model_1, model_2, 'sequential'),
+        'dual': DetectionPipeline(model_1, model_2, 'dual'),
+        'cascade (lote)': DetectionPipeline(model_1, model_2, 'cascade'),
+        'cascade (um a um)': DetectionPipeline(model_1, model_2_um_a_um, 'cascade'),
+    }
+    tempos = {nome: [] for nome in pipelines}
+    divergencias = {'dual x separado': 0, 'lote x um a um': 0}
+    concordancia, recortes = 0, []
+
+    for indice, frame in enumerate(frames):
+        frame_atual['indice'] = indice
+        resultados = {}
+        for nome, pipeline in pipelines.items():
+            inicio = time.perf_counter()
+            resultados[nome] = pipeline.run(frame, 2)
+            if indice >= 5:  # aquecimento
+                tempos[nome].append(time.perf_counter() - inicio)
+
+        # Referência sem compartilhar o tensor: cada modelo pré-processa o frame por conta própria
+        m1_separado, _ = model_1.detect(frame)
+        dual = resultados['dual']
+        if (dual.m1_objects, dual.m2_objects) != (m1_separado, resultados['sequential'].m2_objects):
+            divergencias['dual x separado'] += 1
+        if resultados['cascade (lote)'].m2_objects != resultados['cascade (um a um)'].m2_objects:
+            divergencias['lote x um a um'] += 1
+        concordancia += (resultados['cascade (lote)'].m2_objects > 0) == (resultados['sequential'].m2_objects > 0)
+        recortes.append(len(resultados['cascade (lote)'].regions))
+
+    print("Latência por frame em CONFIRMANDO (pré-processamento + inferência + contagem):")
+    for nome, valores in tempos.items():
+        print(f"  {nome:18s}: {resumo(valores)}")
+    print(f"Recortes por frame na cascata: média {np.mean(recortes):.2f}, máximo {max(recortes)}; "
+          f"frames sem recorte (modelo 2 não roda): {recortes.count(0)}")
+    for nome, quantidade in divergencias.items():
+        print(f"Divergências {nome}: {quantidade} de {len(frames)} frames")
+    print(f"Cascata concorda com o modelo 2 no frame inteiro (há fumaça ou não) em {concordancia / len(frames):.1%} dos frames")
+
+    if not any(recortes):
+        sys.exit("ERRO: nenhum recorte na cascata; o lote do modelo 2 não foi verificado (use --forcar-celulas).")
+    if any(divergencias.values()):
+        sys.exit(f"ERRO: as otimizações mudaram resultados: {divergencias}")
+
+
+if __name__ == '__main__':
+    main()
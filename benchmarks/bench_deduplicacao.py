@@ -0,0 +1,297 @@
+"""
+Deduplicação na ingestão (deduplicacao.py): linhas gravadas e CPU por mensagem numa rajada reproduzida.
+
+Gera o tráfego de --horas horas de --modulos módulos: o keep-alive de status 0 do Pi a cada 300 s e
+--incendios-por-dia detecções por módulo, cada uma repetida pelo nó LoRa a cada 500 ms por 10 s
+(status 1) e encerrada 60 s depois pelo status 0, também repetido. As mensagens são agrupadas em lotes
+como no GravadorAlertas (LATENCIA_MAXIMA_LOTE de tempo simulado, até TAMANHO_LOTE) e gravadas por
+API.gravar_lote em um SQLite temporário, com e sem o DeduplicadorAlertas. Mede:
+- linhas inseridas em 'alertas', eventos estendidos (UPDATE) e commits;
+- CPU do processo por mensagem (deduplicação + gravação) e só a deduplicação;
+- tamanho do banco e consultas sobre o histórico (últimos críticos, contagem por módulo, status).
+Verifica que a soma de 'repeticoes' é o número de mensagens, que o status final dos módulos e os totais
+dos agregados por hora e por dia de cada módulo (contagens, primeira e última vez) são iguais, e
+que num payload binário com status 1 e 0 do mesmo módulo (mesma data_hora) os keep-alives seguintes só
+estendem o evento Informativo.
+
+Depois verifica o arquivamento de eventos longos: um módulo saudável manda só keep-alives por
+RETENCAO_ALERTAS_DIAS + 1 dias, com arquivar_alertas() rodando uma vez por dia. Nenhuma repetição pode
+se perder: com DURACAO_MAXIMA_EVENTO o evento é fechado todo dia; sem ela, e com tudo arquivado no meio
+do período (como no critério antigo, pelo início do evento), a extensão seguinte vai para a linha em
+alertas_arquivo e a próxima repetição abre um evento novo.
+
+Uso:
+    python benchmarks/bench_deduplicacao.py --modulos 100 --horas 12 --incendios-por-dia 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+INTERVALO_KEEPALIVE = 300.0
+REPETICAO_LORA = 0.5
+DURACAO_REPETICAO_LORA = 10.0
+COOLDOWN = 60.0
+
+
+def gerar_trafego(API, modulos, horas, incendios_por_dia):
+    """Lista (segundos desde o início, registro) em ordem de chegada, e o número de incêndios simulados."""
+    random.seed(42)
+    inicio = datetime(2024, 1, 1)
+    duracao = horas * 3600
+    mensagens, incendios = [], 0
+    for indice in range(modulos):
+        letra = f"M{indice}"
+        latitude, longitude = -23.55 + indice * 1e-3, -46.63
+
+        def enviar(segundos, status):
+            payload = f"{letra},{latitude:.6f},{longitude:.6f},{status}".encode('utf-8')
+            registro = API.interpretar_mensagem(payload)
+            registro['data_hora'] = inicio + timedelta(seconds=segundos)
+            mensagens.append((segundos, registro))
+
+        esperados = incendios_por_dia * horas / 24
+        deteccoes = [random.uniform(0, duracao - COOLDOWN - DURACAO_REPETICAO_LORA)
+                     for _ in range(int(esperados) + (random.random() < esperados % 1))]
+        for deteccao in deteccoes:
+            incendios += 1
+            for status, comeco in ((1, deteccao), (0, deteccao + COOLDOWN)):
+                for repeticao in range(int(DURACAO_REPETICAO_LORA / REPETICAO_LORA)):
+                    enviar(comeco + repeticao * REPETICAO_LORA, status)
+
+        # O keep-alive só sai sem detecção em andamento
+        instante = random.uniform(0, INTERVALO_KEEPALIVE)
+        while instante < duracao:
+            if not any(deteccao <= instante <= deteccao + COOLDOWN + DURACAO_REPETICAO_LORA for deteccao in deteccoes):
+                enviar(instante, 0)
+            instante += INTERVALO_KEEPALIVE
+    mensagens.sort(key=lambda mensagem: mensagem[0])
+    return mensagens, incendios
+
+
+def agrupar_lotes(API, mensagens):
+    """Lotes como os do GravadorAlertas: fecham LATENCIA_MAXIMA_LOTE após a primeira mensagem ou em TAMANHO_LOTE."""
+    lotes, atual, prazo = [], [], None
+    for segundos, registro in mensagens:
+        if atual and (segundos > prazo or len(atual) >= API.TAMANHO_LOTE):
+            lotes.append((prazo, atual))
+            atual = []
+        if not atual:
+            prazo = segundos + API.LATENCIA_MAXIMA_LOTE
+        atual.append(registro)
+    if atual:
+        lotes.append((prazo, atual))
+    return lotes
+
+
+def usar_banco(API, caminho):
+    """Aponta o API.py para outro SQLite (a engine é global ao módulo)."""
+    if API._engine is not None:
+        API._engine.dispose()
+    API.DATABASE_URL = f"sqlite:///{caminho}"
+    API._engine = None
+    API.obter_engine()
+
+
+def reproduzir(API, lotes, deduplicador):
+    linhas = estendidos = commits = 0
+    cpu, relogio = time.process_time(), time.perf_counter()
+    for instante, lote in lotes:
+        registros, atualizacoes = lote, []
+        if deduplicador:
+            registros, atualizacoes = deduplicador.processar([dict(registro) for registro in lote], agora=instante)
+        if not (registros or atualizacoes):
+            continue
+        session = API.criar_sessao()
+        # Os próprios eventos do deduplicador: gravar_lote preenche o id que as extensões usam
+        API.gravar_lote(session, registros if deduplicador else [dict(registro) for registro in registros], atualizacoes)
+        session.commit()
+        session.close()
+        linhas += len(registros)
+        estendidos += len(atualizacoes)
+        commits += 1
+    atualizacoes = deduplicador.descarregar() if deduplicador else []
+    if atualizacoes:
+        session = API.criar_sessao()
+        API.gravar_lote(session, [], atualizacoes)
+        session.commit()
+        session.close()
+        estendidos += len(atualizacoes)
+        commits += 1
+    return {'linhas': linhas, 'estendidos': estendidos, 'commits': commits,
+            'cpu': time.process_time() - cpu, 'tempo': time.perf_counter() - relogio}
+
+
+def verificar_arquivamento(API, caminho, duracao_maxima, arquivar_tudo_no_dia=None):
+    """Keep-alives de um módulo por RETENCAO_ALERTAS_DIAS + 1 dias. Retorna (mensagens, linhas em alertas, no arquivo)."""
+    from sqlalchemy import func
+    from deduplicacao import DeduplicadorAlertas
+    usar_banco(API, caminho)
+    deduplicador = DeduplicadorAlertas(duracao_maxima=duracao_maxima)
+    inicio = datetime(2024, 1, 1)
+    dias = API.RETENCAO_ALERTAS_DIAS + 1
+    mensagens = int(dias * 86400 / INTERVALO_KEEPALIVE)
+    session = API.criar_sessao()
+    for indice in range(mensagens):
+        segundos = indice * INTERVALO_KEEPALIVE
+        registro = API.interpretar_mensagem(b"M0,-23.550000,-46.630000,0")
+        registro['data_hora'] = inicio + timedelta(seconds=segundos)
+        registros, atualizacoes = deduplicador.processar([registro], agora=segundos)
+        if indice == mensagens - 1:
+            atualizacoes += deduplicador.descarregar(agora=segundos)
+        if registros or atualizacoes:
+            perdidos = API.gravar_lote(session, registros, atualizacoes)
+            if perdidos:
+                deduplicador.fechar(perdidos)
+        if segundos % 86400 == 0:
+            antes_de = registro['data_hora'] - timedelta(days=API.RETENCAO_ALERTAS_DIAS)
+            if arquivar_tudo_no_dia and segundos == arquivar_tudo_no_dia * 86400:
+                antes_de = registro['data_hora'] + timedelta(seconds=1)
+            API.arquivar_alertas(session, antes_de)
+            session.commit()
+    session.commit()
+    repeticoes = sum(session.query(func.sum(tabela.repeticoes)).scalar() or 0 for tabela in (API.Alertas, API.AlertasArquivo))
+    linhas = session.query(API.Alertas).count(), session.query(API.AlertasArquivo).count()
+    ultima = session.query(func.max(func.coalesce(API.Alertas.ultima_vez, API.Alertas.data_hora))).scalar()
+    session.close()
+    if repeticoes != mensagens:
+        raise AssertionError(f"Repetições perdidas no arquivamento: {repeticoes} de {mensagens}")
+    if ultima != registro['data_hora']:
+        raise AssertionError(f"Último keep-alive fora de 'alertas': {ultima} em vez de {registro['data_hora']}")
+    return mensagens, *linhas
+
+
+def verificar_lote_misto(API, caminho):
+    """
+    Um payload binário com dois registros do mesmo módulo (status 1 e depois 0) dá às duas linhas a mesma
+    data_hora; os keep-alives seguintes só podem estender o evento Informativo.
+    """
+    import telemetria
+    from deduplicacao import DeduplicadorAlertas
+    usar_banco(API, caminho)
+    deduplicador = DeduplicadorAlertas()
+    payload = telemetria.encode_batch([telemetria.TelemetryRecord(1, -23.55, -46.63, status) for status in (1, 0)])
+    lote = API.interpretar_payload(payload)
+    keepalives = 5
+    session = API.criar_sessao()
+    for indice in range(keepalives + 1):
+        if indice:
+            lote = [API.interpretar_mensagem(b"A,-23.550000,-46.630000,0")]
+            lote[0]['data_hora'] = lote[0]['data_hora'] + timedelta(seconds=indice)
+        registros, atualizacoes = deduplicador.processar(lote, agora=indice * deduplicador.intervalo_atualizacao)
+        if registros or atualizacoes:
+            API.gravar_lote(session, registros, atualizacoes)
+            session.commit()
+    linhas = {linha.nivel: linha.repeticoes for linha in session.query(API.Alertas)}
+    session.close()
+    esperado = {'Crítico': 1, 'Informativo': keepalives + 1}
+    if linhas != esperado:
+        raise AssertionError(f"Lote misto de um módulo: repetições {linhas} em vez de {esperado}")
+    return linhas
+
+
+def agregados(API):
+    """Por tabela de agregados e módulo: (críticos, informativos, primeira_vez, última_vez) somados sobre os intervalos."""
+    from sqlalchemy import func
+    session = API.criar_sessao()
+    resultado = {}
+    for modelo in (API.AlertasPorHora, API.AlertasPorDia):
+        for linha in session.query(modelo.nome_modulo, func.sum(modelo.criticos), func.sum(modelo.informativos),
+                                   func.min(modelo.primeira_vez), func.max(modelo.ultima_vez)).group_by(modelo.nome_modulo):
+            resultado[(modelo.__tablename__, linha[0])] = tuple(linha[1:])
+    session.close()
+    return resultado
+
+
+def consultas(API):
+    from sqlalchemy import desc, func
+    session = API.criar_sessao()
+    tempos = {}
+    inicio = time.perf_counter()
+    session.query(API.Alertas).filter_by(nivel='Crítico').order_by(desc(API.Alertas.data_hora)).limit(5).all()
+    tempos['últimos críticos'] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    session.query(API.Alertas.nome_modulo, func.count()).filter_by(nivel='Crítico').group_by(API.Alertas.nome_modulo).all()
+    tempos['críticos por módulo'] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    API.reconstruir_status_modulos(session)
+    tempos['status a partir do histórico'] = time.perf_counter() - inicio
+    session.rollback()
+    status = sorted((linha.nome_modulo, linha.nivel, linha.data_hora) for linha in session.query(API.StatusModulos))
+    repeticoes = session.query(func.sum(func.coalesce(API.Alertas.repeticoes, 1))).scalar()
+    criticos = session.query(API.Alertas).filter_by(nivel='Crítico').count()
+    session.close()
+    return tempos, status, repeticoes, criticos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modulos', type=int, default=100)
+    parser.add_argument('--horas', type=float, default=12.0)
+    parser.add_argument('--incendios-por-dia', type=float, default=4.0, help="Detecções por módulo por dia")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='bench_deduplicacao_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'vazio.db')}"
+    os.environ['FIREWATCHER_METRICAS'] = '0'
+    import API
+    from deduplicacao import DeduplicadorAlertas
+
+    mensagens, incendios = gerar_trafego(API, args.modulos, args.horas, args.incendios_por_dia)
+    lotes = agrupar_lotes(API, mensagens)
+    print(f"{len(mensagens)} mensagens de {args.modulos} módulos em {args.horas:.0f} h simuladas "
+          f"({incendios} incêndios, {len(lotes)} lotes)")
+
+    deduplicador = DeduplicadorAlertas()
+    copias = [(instante, [dict(registro) for registro in lote]) for instante, lote in lotes]
+    inicio = time.process_time()
+    for instante, lote in copias:
+        deduplicador.processar(lote, agora=instante)
+    print(f"  só a deduplicação: {(time.process_time() - inicio) / len(mensagens) * 1e6:.2f} µs de CPU por mensagem")
+
+    resultados = {}
+    for nome, deduplicar in (("uma linha por mensagem", False), ("deduplicado", True)):
+        caminho = os.path.join(pasta, f"{'dedup' if deduplicar else 'todas'}.db")
+        usar_banco(API, caminho)
+        medida = reproduzir(API, lotes, DeduplicadorAlertas() if deduplicar else None)
+        tempos, status, repeticoes, criticos = consultas(API)
+        resultados[deduplicar] = (status, repeticoes, agregados(API))
+        print(f"  {nome:22s}: {medida['linhas']:7d} linhas | {medida['estendidos']:6d} eventos estendidos | "
+              f"{medida['commits']:6d} commits | CPU {medida['cpu'] / len(mensagens) * 1e6:6.1f} µs/msg | "
+              f"{medida['tempo']:6.1f} s | banco {os.path.getsize(caminho) / 1024:7.0f} KiB | {criticos} linhas críticas")
+        print(f"  {'':22s}  " + " | ".join(f"{consulta} {tempo * 1000:.1f} ms" for consulta, tempo in tempos.items()))
+
+    status_todas, _, agregados_todas = resultados[False]
+    status_dedup, repeticoes, agregados_dedup = resultados[True]
+    if repeticoes != len(mensagens):
+        raise AssertionError(f"Soma de 'repeticoes' {repeticoes} diferente de {len(mensagens)} mensagens")
+    if status_dedup != status_todas:
+        raise AssertionError("Status final dos módulos diferente")
+    diferentes = sorted(chave for chave in agregados_todas if agregados_dedup.get(chave) != agregados_todas[chave])
+    if diferentes or agregados_dedup.keys() != agregados_todas.keys():
+        tabela, modulo = (diferentes or [('?', '?')])[0]
+        raise AssertionError(f"Agregados diferentes com deduplicação ({len(diferentes)}), ex: {tabela} {modulo}: "
+                             f"{agregados_dedup.get((tabela, modulo))} em vez de {agregados_todas.get((tabela, modulo))}")
+    print(f"  soma de 'repeticoes' = {repeticoes} mensagens; status final dos {len(status_dedup)} módulos e "
+          f"agregados por hora e por dia iguais")
+
+    linhas = verificar_lote_misto(API, os.path.join(pasta, 'misto.db'))
+    print(f"  lote binário com status 1 e 0 do mesmo módulo: repetições {linhas}, extensões só no evento aberto")
+
+    from deduplicacao import DURACAO_MAXIMA_EVENTO
+    casos = ((f"eventos de até {DURACAO_MAXIMA_EVENTO / timedelta(hours=1):.0f} h", DURACAO_MAXIMA_EVENTO, None),
+             ("sem duração máxima, evento aberto arquivado", timedelta.max, API.RETENCAO_ALERTAS_DIAS // 2))
+    for indice, (nome, duracao_maxima, arquivar_tudo_no_dia) in enumerate(casos):
+        mensagens, em_alertas, no_arquivo = verificar_arquivamento(
+            API, os.path.join(pasta, f"arquivo_{indice}.db"), duracao_maxima, arquivar_tudo_no_dia)
+        print(f"  arquivamento, {nome}: {mensagens} keep-alives em {API.RETENCAO_ALERTAS_DIAS + 1} dias -> "
+              f"{em_alertas} linha(s) em 'alertas', {no_arquivo} no arquivo, nenhuma repetição perdida")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark de count_detections (deteccao.py).
+
+Gera grades FOMO sintéticas, confere que a versão vetorizada retorna exatamente
+as mesmas contagens do laço Python original e compara o tempo por chamada.
+
+Uso:
+    python benchmarks/bench_deteccao.py --grades 12 20 --repeticoes 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from deteccao import count_detections, MARGIN_HORIZONTAL, MARGIN_VERTICAL
+
+LABELS_1 = ['uncertain', 'fire']
+LABELS_2 = ['no_smoke', 'smoke']
+
+
+def count_detections_loop(output_grid, labels, threshold, model_index=0):
+    """Implementação original (laço duplo) usada como referência."""
+    squeezed_grid = np.squeeze(output_grid)
+    grid_h, grid_w, num_classes = squeezed_grid.shape
+    total_detection_count = 0
+    margin_x_start, margin_x_end = int(grid_w * MARGIN_HORIZONTAL), int(grid_w * (1 - MARGIN_HORIZONTAL))
+    margin_y_start, margin_y_end = int(grid_h * MARGIN_VERTICAL), int(grid_h * (1 - MARGIN_VERTICAL))
+
+    for y in range(grid_h):
+        for x in range(grid_w):
+            if model_index == 0 and not (margin_x_start <= x < margin_x_end and margin_y_start <= y < margin_y_end):
+                continue
+            scores = squeezed_grid[y][x]
+            class_id = np.argmax(scores)
+            confidence = scores[class_id]
+            if class_id >= len(labels): continue
+            is_background = (class_id == 0) or (labels[class_id].lower() in ['background', 'uncertain'])
+            if confidence > threshold and not is_background:
+                total_detection_count += 1
+    return total_detection_count
+
+
+def gerar_grade(rng, tamanho, num_classes, dtype):
+    """Grade (1, H, W, C) com scores do tipo de saída do modelo (float softmax ou uint8 quantizado)."""
+    scores = rng.random((1, tamanho, tamanho, num_classes))
+    scores /= scores.sum(axis=-1, keepdims=True)
+    if dtype == np.uint8:
+        return (scores * 255).astype(np.uint8)
+    return scores.astype(np.float32)
+
+
+def verificar_equivalencia(rng, tamanhos, casos=500):
+    """Compara as duas implementações em grades aleatórias, incluindo classes além dos rótulos e empates."""
+    for tamanho in tamanhos:
+        for num_classes in (2, 3):
+            for dtype in (np.float32, np.uint8):
+                for _ in range(casos):
+                    grade = gerar_grade(rng, tamanho, num_classes, dtype)
+                    if rng.random() < 0.2:
+                        grade[..., -1] = grade[..., 0]  # Empates: argmax escolhe a primeira classe
+                    for labels, limiar, modelo in ((LABELS_1, 0.65, 0), (LABELS_2, 0.70, 1),
+                                                   (['background', 'Background', 'fire'], 0.5, 0)):
+                        esperado = count_detections_loop(grade, labels, limiar, modelo)
+                        obtido = count_detections(grade, labels, limiar, modelo)
+                        if esperado != obtido:
+                            # Levantado explicitamente: um assert sumiria com python -O
+                            raise AssertionError(f"count_detections diverge do laço original em grade {tamanho}x{tamanho}, "
+                                                 f"{num_classes} classes, {np.dtype(dtype).name}, rótulos {labels}: "
+                                                 f"esperado {esperado}, obtido {obtido}")
+    print(f"Equivalência OK em grades {', '.join(f'{t}x{t}' for t in tamanhos)}.")
+
+
+def cronometrar(funcao, grades, labels, limiar, modelo):
+    inicio = time.perf_counter()
+    for grade in grades:
+        funcao(grade, labels, limiar, modelo)
+    return (time.perf_counter() - inicio) / len(grades)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--grades', type=int, nargs='+', default=[12, 20])
+    parser.add_argument('--repeticoes', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    verificar_equivalencia(rng, args.grades)
+
+    for tamanho in args.grades:
+        grades = [gerar_grade(rng, tamanho, 2, np.float32) for _ in range(args.repeticoes)]
+        tempo_laco = cronometrar(count_detections_loop, grades, LABELS_1, 0.65, 0)
+        tempo_vetor = cronometrar(count_detections, grades, LABELS_1, 0.65, 0)
+        print(f"Grade {tamanho}x{tamanho}: laço {tempo_laco * 1e6:8.1f} us | vetorizado {tempo_vetor * 1e6:6.1f} us "
+              f"| {tempo_laco / tempo_vetor:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Replay com e sem o filtro de movimento (movimento.MotionGate) em MONITORANDO.
+
+Reproduz vídeos gravados (ou uma cena sintética de câmera parada) com o relógio simulado no FPS
+do vídeo e passa cada frame por duas cópias do pipeline, cada uma com sua máquina de estados:
+uma inferindo todo frame e outra com o filtro. Mede o tempo de CPU por frame, as inferências do
+modelo 1 por segundo de vídeo, e confere se o filtro mudou alguma decisão: frames em que a contagem
+reaproveitada difere da contagem real e eventos da máquina de estados que divergem.
+
+Por fim roda o DetectionEngine no relógio real, como o Firewatcher_Raspi.py, e lê a taxa de inferências
+do filtro como a linha de status do Pi (MotionGate.inference_fps()) e o resumo do encerramento: as duas
+precisam estar no mesmo relógio dos ticks (time.time() no motor), senão dariam 0.0/s.
+
+A cena sintética tem fundo fixo com ruído de sensor, um objeto que atravessa a imagem e uma mancha
+cinza que cresce devagar (fumaça), para exercitar a comparação com o último frame inferido e a
+inferência forçada.
+
+Uso:
+    python benchmarks/bench_filtro_movimento.py --duracao 120 --fps 10
+    python benchmarks/bench_filtro_movimento.py gravacao.mp4 --fps 15 --max-pulo 2
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+from captura import SyntheticFrameSource, VideoFileSource
+from configuracao import LABELS_1, LABELS_2, DETECTION_THRESHOLD_1, DETECTION_THRESHOLD_2, MOTION_MAX_SKIP_SECONDS
+from maquina_estados import DetectionStateMachine
+from modelos import DetectionPipeline, ModelRunner
+from motor_deteccao import DetectionEngine
+from movimento import MotionGate
+
+
+def cena_estatica(duracao, fps, largura=640, altura=480, seed=0):
+    """Câmera parada: ruído de sensor, um objeto passando no 1º quarto e fumaça crescendo na metade final."""
+    rng = np.random.default_rng(seed)
+    fundo = cv2.GaussianBlur(rng.integers(20, 140, (altura, largura, 3), dtype=np.uint8), (31, 31), 0)
+    total = int(duracao * fps)
+    for indice in range(total):
+        frame = cv2.add(fundo, rng.normal(0, 3, fundo.shape).astype(np.int8), dtype=cv2.CV_8U)
+        progresso = indice / total
+        if 0.20 <= progresso < 0.25:
+            x = int((progresso - 0.20) / 0.05 * (largura - 60))
+            frame[altura // 3:altura // 3 + 60, x:x + 60] = (40, 40, 40)
+        if progresso >= 0.5:
+            raio = int(2 + 60 * (progresso - 0.5) / 0.5)
+            fumaca = frame.copy()
+            cv2.circle(fumaca, (largura * 2 // 3, altura // 2), raio, (170, 170, 170), -1)
+            frame = cv2.addWeighted(fumaca, 0.6, frame, 0.4, 0)
+        yield frame
+
+
+def frames_gravados(videos):
+    for video in videos:
+        fonte = VideoFileSource(video, realtime=False)
+        while True:
+            ok, frame = fonte.read()
+            if not ok:
+                break
+            yield frame
+        fonte.release()
+
+
+def taxa_no_relogio_real(pipeline, frames=20, fps=10.0):
+    """
+    DetectionEngine com o relógio padrão e um filtro que infere todo frame (changed_fraction=0). Retorna a
+    taxa lida a cada frame como o print_status do Pi e a do resumo, como na limpeza do Pi.
+    """
+    gate = MotionGate(changed_fraction=0.0)
+    engine = DetectionEngine(pipeline, SyntheticFrameSource(fps=fps, max_frames=frames), motion_gate=gate, verbose=False)
+    lidas = []
+    engine.run(on_frame=lambda motor, evento, resultado: lidas.append(gate.inference_fps()))
+    return lidas[-1], gate.summary()['inference_fps']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='*', help="Vídeos gravados (padrão: cena sintética)")
+    parser.add_argument('--duracao', type=float, default=60.0, help="Segundos da cena sintética")
+    parser.add_argument('--fps', type=float, default=10.0, help="FPS do replay (relógio simulado)")
+    parser.add_argument('--max-pulo', type=float, default=MOTION_MAX_SKIP_SECONDS)
+    parser.add_argument('--num-threads', type=int, default=1)
+    parser.add_argument('--modelo-1', default=os.path.join(RAIZ, 'Modelo_Fogo.tflite'))
+    parser.add_argument('--modelo-2', default=os.path.join(RAIZ, 'Fumaça.tflite'))
+    args = parser.parse_args()
+
+    model_1 = ModelRunner(args.modelo_1, LABELS_1, DETECTION_THRESHOLD_1, 0, args.num_threads)
+    model_2 = ModelRunner(args.modelo_2, LABELS_2, DETECTION_THRESHOLD_2, 1, args.num_threads)
+    pipeline = DetectionPipeline(model_1, model_2, 'sequential')
+    gate = MotionGate(max_skip_seconds=args.max_pulo)
+    maquinas = {'sem filtro': DetectionStateMachine(now=0.0), 'com filtro': DetectionStateMachine(now=0.0)}
+    cpu = {nome: 0.0 for nome in maquinas}
+    inferencias = {nome: 0 for nome in maquinas}
+    eventos = {nome: [] for nome in maquinas}
+    contagens_diferentes, frames = 0, 0
+
+    fonte = frames_gravados(args.videos) if args.videos else cena_estatica(args.duracao, args.fps)
+    for indice, frame in enumerate(fonte):
+        agora = indice / args.fps
+        resultados = {}
+        for nome, maquina in maquinas.items():
+            inicio = time.process_time()
+            resultado = pipeline.run(frame, maquina.active_model, gate if nome == 'com filtro' else None, agora)
+            contagem = (resultado.m1_objects if maquina.active_model == 1 else resultado.m2_objects) or 0
+            evento = maquina.update(contagem, now=agora, m1_objects_found=resultado.m1_objects)
+            cpu[nome] += time.process_time() - inicio
+            inferencias[nome] += maquina.active_model is not None and not resultado.reused
+            resultados[nome] = resultado
+            if evento:
+                eventos[nome].append((round(agora, 1), evento))
+        if resultados['com filtro'].reused and resultados['com filtro'].m1_objects != resultados['sem filtro'].m1_objects:
+            contagens_diferentes += 1
+        frames += 1
+
+    duracao = frames / args.fps
+    print(f"{frames} frames ({duracao:.0f}s de vídeo a {args.fps:g} fps), inferência forçada a cada {args.max_pulo:g}s")
+    for nome in maquinas:
+        print(f"  {nome:10s}: CPU {cpu[nome] / frames * 1000:6.2f} ms/frame | "
+              f"inferências {inferencias[nome] / duracao:5.2f}/s de vídeo | eventos {eventos[nome]}")
+    resumo = gate.summary(now=duracao)
+    print(f"Filtro: {resumo['skipped']} frames reaproveitados ({resumo['skip_ratio']:.1%}), "
+          f"{resumo['forced']} inferências forçadas por tempo")
+    print(f"Frames reaproveitados com contagem diferente da inferência real: {contagens_diferentes}")
+    print(f"Eventos iguais com e sem filtro: {'sim' if eventos['sem filtro'] == eventos['com filtro'] else 'NÃO'}")
+
+    taxa_status, taxa_resumo = taxa_no_relogio_real(pipeline)
+    print(f"Relógio real (DetectionEngine): {taxa_status:.1f} inferências/s na linha de status, "
+          f"{taxa_resumo:.1f}/s no resumo")
+    if taxa_status <= 0 or taxa_resumo <= 0:
+        raise AssertionError("Taxa de inferências do filtro lida em outro relógio que o dos ticks (0.0/s)")
+
+
+if __name__ == '__main__':
+    main()
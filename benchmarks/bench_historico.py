@@ -0,0 +1,133 @@
+"""
+Gerador de dados e benchmark do histórico de alertas (agregados por hora/dia e arquivamento).
+
+Gera meses de alertas no ritmo do keep-alive (um 'Informativo' por módulo a cada
+MQTT_KEEPALIVE_INTERVAL) com rajadas de 'Crítico', grava pelo caminho da ingestão
+(API.gravar_lote, que mantém os agregados) e compara:
+- agregação direta sobre a tabela alertas (GROUP BY módulo, dia);
+- leitura dos agregados diários (site3.consultar_historico);
+- a rota /historico.json para um mês e para o período inteiro.
+Por fim mede o arquivamento dos alertas fora da retenção.
+
+Uso:
+    python benchmarks/bench_historico.py --dias 90 --modulos 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+KEEPALIVE_SEGUNDOS = 300
+
+
+def gerar_alertas(dias, modulos, fim):
+    """Gera os registros em ordem de data, como chegariam da ingestão."""
+    inicio = fim - timedelta(days=dias)
+    nomes = [f"Modulo {i}" for i in range(modulos)]
+    instante = inicio
+    passo = timedelta(seconds=KEEPALIVE_SEGUNDOS / modulos)
+    while instante < fim:
+        nome = random.choice(nomes)
+        critico = random.random() < 0.01
+        yield {'nome_modulo': nome, 'nivel': 'Crítico' if critico else 'Informativo',
+               'descricao': 'Incêndio detectado pela IA' if critico else 'Alarme falso detectado pela IA',
+               'latitude': -23.55, 'longitude': -46.63, 'data_hora': instante}
+        instante += passo
+
+
+def popular(API, dias, modulos, fim, lote=5000):
+    session = API.criar_sessao()
+    bloco, total = [], 0
+    for registro in gerar_alertas(dias, modulos, fim):
+        bloco.append(registro)
+        if len(bloco) == lote:
+            API.gravar_lote(session, bloco)
+            session.commit()
+            total += len(bloco)
+            bloco = []
+    if bloco:
+        API.gravar_lote(session, bloco)
+        session.commit()
+        total += len(bloco)
+    session.close()
+    return total
+
+
+def cronometrar(funcao, repeticoes=5):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return sorted(tempos)[len(tempos) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dias', type=int, default=90)
+    parser.add_argument('--modulos', type=int, default=20)
+    parser.add_argument('--url', help="URL do banco (padrão: SQLite temporário)")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='bench_historico_')
+    os.environ['DATABASE_URL'] = args.url or f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+    os.environ['SITE_CACHE'] = '0'
+    import API
+    import site3
+    from sqlalchemy import func
+
+    fim = datetime.now().replace(minute=0, second=0, microsecond=0)
+    inicio_total = fim - timedelta(days=args.dias)
+    inicio = time.perf_counter()
+    total = popular(API, args.dias, args.modulos, fim)
+    print(f"{total} alertas gravados pela ingestão em {time.perf_counter() - inicio:.1f}s "
+          f"({total / (time.perf_counter() - inicio):.0f} alertas/s com os agregados)")
+
+    session = API.criar_sessao()
+    print(f"Linhas: alertas {session.query(API.Alertas).count()} | por hora {session.query(API.AlertasPorHora).count()} "
+          f"| por dia {session.query(API.AlertasPorDia).count()}")
+
+    def agregacao_direta():
+        return (session.query(API.Alertas.nome_modulo, func.date(API.Alertas.data_hora), API.Alertas.nivel,
+                              func.count(), func.min(API.Alertas.data_hora), func.max(API.Alertas.data_hora))
+                .filter(API.Alertas.data_hora >= inicio_total, API.Alertas.data_hora < fim)
+                .group_by(API.Alertas.nome_modulo, func.date(API.Alertas.data_hora), API.Alertas.nivel)
+                .all())
+
+    direta = cronometrar(agregacao_direta, 3)
+    agregados = cronometrar(lambda: site3.consultar_historico(session, inicio_total, fim, 'dia'))
+    print(f"Período inteiro ({args.dias} dias) por dia: GROUP BY em alertas {direta:8.1f} ms | agregados {agregados:6.1f} ms")
+
+    cliente = site3.app.test_client()
+    mes = f"/historico.json?inicio={(fim - timedelta(days=30)).isoformat()}&fim={fim.isoformat()}"
+    tudo = f"/historico.json?inicio={inicio_total.isoformat()}&fim={fim.isoformat()}&granularidade=dia"
+    horas = f"/historico.json?inicio={(fim - timedelta(days=30)).isoformat()}&fim={fim.isoformat()}&granularidade=hora&modulo=Modulo%200"
+    for descricao, caminho in (("último mês, por dia", mes), ("período inteiro, por dia", tudo),
+                               ("último mês, por hora, 1 módulo", horas)):
+        resposta = cliente.get(caminho)
+        assert resposta.status_code == 200, resposta.data
+        tempo = cronometrar(lambda: cliente.get(caminho))
+        print(f"/historico.json {descricao:32s}: {tempo:6.1f} ms ({len(resposta.get_json()['intervalos'])} intervalos)")
+
+    inicio = time.perf_counter()
+    movidos, corte = 0, datetime.now() - timedelta(days=API.RETENCAO_ALERTAS_DIAS)
+    while True:
+        bloco = API.arquivar_alertas(session, corte)
+        session.commit()
+        movidos += bloco
+        if bloco < API.LOTE_ARQUIVAMENTO:
+            break
+    print(f"Arquivamento: {movidos} alertas movidos em {time.perf_counter() - inicio:.1f}s; "
+          f"restam {session.query(API.Alertas).count()} na tabela principal")
+    tempo = cronometrar(lambda: cliente.get(tudo))
+    print(f"/historico.json período inteiro após arquivar: {tempo:6.1f} ms (agregados não mudam)")
+    session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark da ingestão MQTT de ponta a ponta: publicador -> broker -> ingestão -> banco.
+
+Usa o broker em processo (broker_local.py) e compara:
+- 'threads': cliente paho (loop em thread) + GravadorAlertas, como em API.main;
+- 'asyncio': IngestaoAssincrona (aiomqtt + fila limitada + driver assíncrono do banco).
+Mede mensagens/s sustentadas até o último commit, atraso recebimento->commit, profundidade
+máxima da fila e descartes. --atraso-gravacao simula um banco lento (segundos por lote) para
+observar a política de fila cheia.
+
+Uso:
+    python benchmarks/bench_ingestao_async.py --mensagens 50000
+    python benchmarks/bench_ingestao_async.py --mensagens 20000 --taxa 2000 --atraso-gravacao 0.5 --tamanho-fila 1000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_ingestao import gerar_payloads
+from broker_local import BrokerLocal
+
+
+def publicar(porta, topico, payloads, taxa):
+    """Publica os payloads em QoS 0; com taxa > 0 mantém esse ritmo (mensagens/s)."""
+    import paho.mqtt.client as mqtt
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.connect('127.0.0.1', porta)
+    client.loop_start()
+    inicio = time.monotonic()
+    for indice, payload in enumerate(payloads):
+        if taxa and indice % 100 == 0:
+            atraso = inicio + indice / taxa - time.monotonic()
+            if atraso > 0:
+                time.sleep(atraso)
+        client.publish(topico, payload)
+    client.loop_stop()
+    client.disconnect()
+
+
+def aguardar(concluido, limite_sem_progresso=10.0):
+    """Espera concluido() retornar True, desistindo se o progresso parar por 'limite_sem_progresso' segundos."""
+    ultimo, desde = None, time.monotonic()
+    while True:
+        estado = concluido()
+        if estado is True:
+            return True
+        if estado != ultimo:
+            ultimo, desde = estado, time.monotonic()
+        elif time.monotonic() - desde > limite_sem_progresso:
+            return False
+        time.sleep(0.05)
+
+
+def rodar_threads(API, porta, payloads, args):
+    gravar_lote = API.gravar_lote
+
+    def gravar_lote_lento(session, registros, atualizacoes=()):
+        # Driver síncrono: a thread do gravador fica bloqueada durante a espera pelo banco
+        time.sleep(args.atraso_gravacao)
+        return gravar_lote(session, registros, atualizacoes)
+
+    if args.atraso_gravacao:
+        API.gravar_lote = gravar_lote_lento
+    gravador = API.GravadorAlertas(tamanho_lote=args.tamanho_lote, tamanho_fila=args.tamanho_fila)
+    gravador.iniciar()
+    client = API.criar_cliente_mqtt(gravador)
+    client.connect('127.0.0.1', porta)
+    client.loop_start()
+    time.sleep(0.5)
+
+    inicio = time.perf_counter()
+    publicar(porta, API.TOPICO_DADOS, payloads, args.taxa)
+    processadas = lambda: gravador.registros_gravados + gravador.registros_descartados
+    completo = aguardar(lambda: processadas() >= len(payloads) or processadas())
+    duracao = time.perf_counter() - inicio
+    client.loop_stop()
+    client.disconnect()
+    gravador.parar()
+    API.gravar_lote = gravar_lote
+    return {'gravadas': gravador.registros_gravados, 'descartadas': gravador.registros_descartados,
+            'duracao': duracao, 'completo': completo,
+            'atraso_ms': None, 'maior_fila': None}
+
+
+def rodar_asyncio(ingestao_assincrona, porta, payloads, args):
+    class IngestaoBancoLento(ingestao_assincrona.IngestaoAssincrona):
+        async def _gravar(self, lote, **opcoes):
+            # Com o driver assíncrono a espera pelo banco não bloqueia o loop
+            await asyncio.sleep(args.atraso_gravacao)
+            await super()._gravar(lote, **opcoes)
+
+    ingestao = IngestaoBancoLento(
+        broker_host='127.0.0.1', broker_port=porta, tamanho_lote=args.tamanho_lote, tamanho_fila=args.tamanho_fila,
+        politica=args.politica, porta_estatisticas=None)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(ingestao.executar(),), daemon=True)
+    thread.start()
+    aguardar(lambda: ingestao.conectado)
+    time.sleep(0.2)
+
+    inicio = time.perf_counter()
+    publicar(porta, ingestao.topico, payloads, args.taxa)
+    processadas = lambda: (ingestao.registros_gravados + ingestao.fila.descartados
+                           + ingestao.estatisticas()['descartadas_cliente_mqtt'])
+    completo = aguardar(lambda: processadas() >= len(payloads) or processadas())
+    duracao = time.perf_counter() - inicio
+    estatisticas = ingestao.estatisticas()
+    loop.call_soon_threadsafe(ingestao.parar)
+    thread.join()
+    descartadas = estatisticas['descartadas'] + estatisticas['descartadas_cliente_mqtt']
+    return {'gravadas': estatisticas['gravadas'], 'descartadas': descartadas, 'duracao': duracao, 'completo': completo,
+            'atraso_ms': estatisticas['atraso_ms'], 'maior_fila': estatisticas['maior_fila']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mensagens', type=int, default=50000)
+    parser.add_argument('--modulos', type=int, default=50)
+    parser.add_argument('--taxa', type=float, default=0, help="Mensagens/s do publicador (0 = o mais rápido possível)")
+    parser.add_argument('--atraso-gravacao', type=float, default=0.0, help="Atraso artificial por lote gravado (s)")
+    parser.add_argument('--tamanho-lote', type=int, default=200)
+    parser.add_argument('--tamanho-fila', type=int, default=10000)
+    parser.add_argument('--politica', help="Política de fila cheia (padrão: ingestao_assincrona.POLITICA_FILA)")
+    parser.add_argument('--modos', default='threads,asyncio')
+    parser.add_argument('--url', help="URL do banco (padrão: SQLite temporário)")
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_async_'), 'bench.db')}"
+    import API
+    import ingestao_assincrona
+    args.politica = args.politica or ingestao_assincrona.POLITICA_FILA
+
+    broker = BrokerLocal()
+    porta = broker.iniciar_em_thread()
+    payloads = gerar_payloads(args.mensagens, args.modulos)
+    print(f"{args.mensagens} mensagens, taxa {'máxima' if not args.taxa else f'{args.taxa:.0f}/s'}, "
+          f"fila {args.tamanho_fila}, atraso de gravação {args.atraso_gravacao}s/lote")
+
+    for modo in args.modos.split(','):
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):  # os prints por mensagem/lote não entram na medida
+            if modo == 'threads':
+                resultado = rodar_threads(API, porta, payloads, args)
+            else:
+                resultado = rodar_asyncio(ingestao_assincrona, porta, payloads, args)
+        taxa = resultado['gravadas'] / resultado['duracao']
+        extra = ''
+        if resultado['atraso_ms']:
+            extra = (f" | atraso p50 {resultado['atraso_ms']['p50']} ms p95 {resultado['atraso_ms']['p95']} ms"
+                     f" | fila máx {resultado['maior_fila']}")
+        print(f"{modo:8s}: {resultado['gravadas']:6d} gravadas, {resultado['descartadas']:6d} descartadas em "
+              f"{resultado['duracao']:.2f}s = {taxa:7.0f} msg/s{extra}"
+              f"{'' if resultado['completo'] else ' (parou de progredir)'}")
+    print(f"Broker: {broker.publicacoes} publicações, {broker.descartes} descartes por assinante lento")
+    broker.parar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Inicialização do Pi (inicializacao.py): tempo até a primeira inferência, do início do processo.
+
+Cada variante roda em um subprocesso novo (importações, carga dos modelos e cache de páginas como
+depois de religar a caixa), com a câmera e os módulos seriais simulados:
+- a fonte de vídeo só abre depois de --atraso-camera segundos (conexão RTSP);
+- os módulos requeridos chegam pela serial --atraso-modulos segundos depois do início.
+Variantes:
+- 'sequencial': como era o Firewatcher_Raspi.py: modelos, espera pelos módulos, câmera, sem aquecimento;
+- 'paralelo': modelos (aquecidos) e câmera ao mesmo tempo, detecção sem esperar os módulos;
+- 'paralelo_sob_demanda': como 'paralelo', com o modelo 2 carregado só no primeiro CONFIRMANDO.
+Mede o tempo até a primeira inferência, o invoke do modelo 1 no primeiro frame contra o regime, a
+memória residente antes de CONFIRMANDO e o custo do primeiro frame em CONFIRMANDO. Confere que um
+alerta disparado antes dos módulos chegarem, seguido do fim do cooldown, é publicado (1 e depois 0)
+quando eles chegam. Por fim compara o invoke em regime com e sem o delegate XNNPACK
+(INTERPRETER_USE_XNNPACK).
+
+Uso:
+    python benchmarks/bench_inicializacao.py --atraso-camera 2 --atraso-modulos 5
+    python benchmarks/bench_inicializacao.py --variantes sequencial paralelo --num-threads 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+
+VARIANTES = ('sequencial', 'paralelo', 'paralelo_sob_demanda')
+
+
+def memoria_residente_mb():
+    with open('/proc/self/status') as status:
+        for linha in status:
+            if linha.startswith('VmRSS:'):
+                return int(linha.split()[1]) / 1024
+    return 0.0
+
+
+def executar_variante(args):
+    """Roda no subprocesso: inicializa como o Pi, processa --frames frames e força um CONFIRMANDO."""
+    from inicializacao import StartupTimeline, run_concurrently
+    startup = StartupTimeline()
+    import numpy as np
+    from captura import LatestFrameGrabber, SyntheticFrameSource
+    from configuracao import (LABELS_1, LABELS_2, DETECTION_THRESHOLD_1, DETECTION_THRESHOLD_2, REQUIRED_MODULES,
+                              MQTT_TOPIC)
+    from leitor_serial import SerialReader
+    from modelos import DetectionPipeline, LazyModelRunner, ModelRunner
+    from motor_deteccao import DetectionEngine, RecordingPublisher
+    from replay import fake_serial_lines
+    import telemetria
+    startup.mark('imports')
+
+    paralelo = args.variante != 'sequencial'
+    aquecimento = 1 if paralelo else 0
+    serial_reader = SerialReader(port=None, verbose=False)
+    linhas = ('\n'.join(fake_serial_lines(REQUIRED_MODULES)) + '\n').encode('utf-8')
+    chegada = threading.Timer(max(0.0, args.atraso_modulos - startup.mark('serial')), serial_reader.feed, (linhas,))
+    chegada.start()
+
+    def abrir_fonte():
+        time.sleep(args.atraso_camera)
+        return SyntheticFrameSource(fps=25.0)
+
+    grabber = LatestFrameGrabber(abrir_fonte, reconnect=False)
+
+    def carregar_modelos():
+        model_1 = ModelRunner(args.modelo_1, LABELS_1, DETECTION_THRESHOLD_1, 0, args.num_threads)
+        model_1.warmup(aquecimento)
+        if args.variante == 'paralelo_sob_demanda':
+            model_2 = LazyModelRunner(args.modelo_2, LABELS_2, DETECTION_THRESHOLD_2, 1, args.num_threads)
+        else:
+            model_2 = ModelRunner(args.modelo_2, LABELS_2, DETECTION_THRESHOLD_2, 1, args.num_threads)
+            model_2.warmup(aquecimento)
+        startup.mark('models')
+        return DetectionPipeline(model_1, model_2, 'sequential')
+
+    def abrir_camera():
+        aberta = grabber.start()
+        startup.mark('camera')
+        return aberta
+
+    if paralelo:
+        pipeline = run_concurrently(pipeline=carregar_modelos, camera=abrir_camera)['pipeline']
+    else:
+        pipeline = carregar_modelos()
+        serial_reader.registry.wait_for(REQUIRED_MODULES)
+        startup.mark('modules')
+        abrir_camera()
+
+    publisher = RecordingPublisher()
+    engine = DetectionEngine(pipeline, grabber, serial_reader.registry, publisher, verbose=False)
+    invokes = []
+
+    def ao_processar(motor, evento, resultado):
+        if motor.frames == 1:
+            startup.first_inference()
+        invokes.append(resultado.m1_time)
+
+    engine.run(max_frames=args.frames, on_frame=ao_processar)
+    memoria = memoria_residente_mb()
+
+    # Primeiro frame em CONFIRMANDO (carga do modelo 2 sob demanda) contra os seguintes
+    ok, frame = grabber.read()
+    confirmando = []
+    for _ in range(args.frames):
+        inicio = time.perf_counter()
+        pipeline.run(frame, 2)
+        confirmando.append(time.perf_counter() - inicio)
+
+    # Alerta antes dos módulos, como o motor publica: ALVO_CONFIRMADO (1), CICLO_COMPLETO (0) e keep-alive (0).
+    # Os status ficam pendentes e saem, em ordem, no primeiro frame depois que os módulos chegam.
+    modulos_antes = bool(serial_reader.registry.records())
+    publisher.messages.clear()
+    for status in (1, 0, 0):
+        engine.publish_status(status)
+    serial_reader.registry.wait_for(REQUIRED_MODULES)
+    engine.process(frame)
+    publicados = [telemetria.decode_batch(payload)[0].status for topico, payload in publisher.messages
+                  if topico == MQTT_TOPIC]
+    chegada.cancel()
+    grabber.stop()
+
+    resultado = {
+        'marcas': startup.summary(),
+        'primeiro_invoke_ms': invokes[0] * 1000,
+        'invoke_regime_ms': float(np.median(invokes[1:])) * 1000,
+        'memoria_mb': memoria,
+        'primeiro_confirmando_ms': confirmando[0] * 1000,
+        'confirmando_regime_ms': float(np.median(confirmando[1:])) * 1000,
+        'modulos_antes_do_alerta': modulos_antes,
+        'status_publicados': publicados,
+    }
+    with open(args.saida, 'w') as arquivo:
+        json.dump(resultado, arquivo)
+
+
+def invoke_em_regime(args, use_xnnpack, repeticoes=200):
+    import numpy as np
+    from configuracao import LABELS_1, DETECTION_THRESHOLD_1
+    from modelos import ModelRunner
+    model = ModelRunner(args.modelo_1, LABELS_1, DETECTION_THRESHOLD_1, 0, args.num_threads, use_xnnpack=use_xnnpack)
+    model.warmup(5)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        model.interpreter.invoke()
+        tempos.append(time.perf_counter() - inicio)
+    return float(np.median(tempos)) * 1000, (model.load_time + model.warmup_time) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variantes', nargs='+', choices=VARIANTES, default=list(VARIANTES))
+    parser.add_argument('--atraso-camera', type=float, default=2.0, help="Segundos até a fonte de vídeo abrir")
+    parser.add_argument('--atraso-modulos', type=float, default=5.0, help="Segundos até os módulos chegarem pela serial")
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--num-threads', type=int, default=1)
+    parser.add_argument('--modelo-1', default=os.path.join(RAIZ, 'Modelo_Fogo.tflite'))
+    parser.add_argument('--modelo-2', default=os.path.join(RAIZ, 'Fumaça.tflite'))
+    parser.add_argument('--variante', choices=VARIANTES, help=argparse.SUPPRESS)
+    parser.add_argument('--saida', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variante:
+        executar_variante(args)
+        return
+
+    print(f"Câmera abre em {args.atraso_camera:.1f} s | módulos chegam em {args.atraso_modulos:.1f} s | "
+          f"{args.num_threads} thread(s) | {os.cpu_count()} CPU(s)")
+    ambiente = dict(os.environ, FIREWATCHER_METRICAS='0')
+    repassados = ['--atraso-camera', str(args.atraso_camera), '--atraso-modulos', str(args.atraso_modulos),
+                  '--frames', str(args.frames), '--num-threads', str(args.num_threads),
+                  '--modelo-1', args.modelo_1, '--modelo-2', args.modelo_2]
+    for variante in args.variantes:
+        with tempfile.NamedTemporaryFile(suffix='.json') as saida:
+            # O TFLite escreve no stdout ao criar o delegate: o resultado vai por arquivo
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--variante', variante, '--saida', saida.name]
+                           + repassados, cwd=RAIZ, env=ambiente, check=True, stdout=subprocess.DEVNULL)
+            resultado = json.load(open(saida.name))
+        marcas = resultado['marcas']
+        etapas = " | ".join(f"{nome} {instante:.2f}s" for nome, instante in marcas.items() if nome != 'first_inference')
+        print(f"  {variante:22s}: primeira inferência em {marcas['first_inference']:5.2f} s ({etapas})")
+        print(f"  {'':22s}  invoke M1 no 1º frame {resultado['primeiro_invoke_ms']:6.2f} ms, em regime "
+              f"{resultado['invoke_regime_ms']:5.2f} ms | RSS antes de CONFIRMANDO {resultado['memoria_mb']:5.0f} MB")
+        print(f"  {'':22s}  1º frame em CONFIRMANDO {resultado['primeiro_confirmando_ms']:6.2f} ms, em regime "
+              f"{resultado['confirmando_regime_ms']:5.2f} ms | status publicados "
+              f"{resultado['status_publicados']} (módulos registrados "
+              f"{'antes' if resultado['modulos_antes_do_alerta'] else 'depois'} do alerta)")
+        publicados = [status for indice, status in enumerate(resultado['status_publicados'])
+                      if not indice or status != resultado['status_publicados'][indice - 1]]
+        if publicados != [1, 0]:
+            raise AssertionError(f"Alerta anterior aos módulos perdido: publicados {resultado['status_publicados']}")
+
+    for use_xnnpack in (True, False):
+        regime, carga = invoke_em_regime(args, use_xnnpack)
+        print(f"  XNNPACK {'ligado ' if use_xnnpack else 'desligado'}: invoke M1 em regime {regime:5.2f} ms | "
+              f"carga + aquecimento {carga:6.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
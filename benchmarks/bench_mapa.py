@@ -0,0 +1,152 @@
+"""
+Mapa com muitos módulos: clusters por geohash (/mapa/clusters.json) e busca por raio
+(/alertas/proximos.json) x /modulos.json completo e varredura de todos os módulos.
+
+Gera num SQLite temporário --modulos módulos espalhados em um parque de --lado-km km de lado, o
+último status de cada um (--criticos de crítico) e --alertas alertas no histórico (gerados pelo
+próprio SQLite, sem passar pelo Python). As views do site3 são chamadas pelo cliente de teste do
+Flask com o cache desligado, então cada requisição vai ao banco. Mede:
+- tempo e tamanho da resposta do mapa inteiro (/modulos.json) e dos clusters em três níveis de zoom;
+- busca "alertas críticos ativos a até R km de um ponto": /alertas/proximos.json x varredura de
+  todos os módulos com haversine (os resultados são comparados);
+- custo do geohash por registro na ingestão.
+
+Uso:
+    python benchmarks/bench_mapa.py --modulos 100000 --alertas 10000000
+    python benchmarks/bench_mapa.py --modulos 100000 --alertas 0     # sem o histórico, mais rápido
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+CENTRO = (-23.55, -46.63)
+
+
+def popular(API, modulos, alertas, lado_km, fracao_criticos):
+    from sqlalchemy import insert
+    import geografia
+
+    random.seed(42)
+    meio_lat = lado_km / 2 / geografia.KM_POR_GRAU_LAT
+    meio_lon = meio_lat / 0.917  # cos(-23.55°)
+    agora = datetime.now()
+    linhas_modulos, linhas_status = [], []
+    for indice in range(modulos):
+        nome = f"Módulo {indice}"
+        latitude = CENTRO[0] + random.uniform(-meio_lat, meio_lat)
+        longitude = CENTRO[1] + random.uniform(-meio_lon, meio_lon)
+        linhas_modulos.append({'nome_modulo': nome, 'latitude': latitude, 'longitude': longitude,
+                               'geohash': geografia.codificar_geohash(latitude, longitude)})
+        critico = random.random() < fracao_criticos
+        linhas_status.append({'nome_modulo': nome, 'nivel': 'Crítico' if critico else 'Informativo',
+                              'descricao': 'Incêndio detectado pela IA' if critico else 'Alarme falso detectado pela IA',
+                              'data_hora': agora - timedelta(seconds=random.randint(0, 3600))})
+
+    session = API.criar_sessao()
+    session.execute(insert(API.Modulos), linhas_modulos)
+    session.execute(insert(API.StatusModulos), linhas_status)
+    session.commit()
+    if alertas:
+        # Histórico: cada alerta copia a posição de um módulo; gerado todo dentro do SQLite
+        session.connection().exec_driver_sql(
+            "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < ?) "
+            "INSERT INTO alertas (nome_modulo, nivel, descricao, latitude, longitude, data_hora) "
+            "SELECT m.nome_modulo, CASE WHEN n.i % 50 = 0 THEN 'Crítico' ELSE 'Informativo' END, 'x', "
+            "m.latitude, m.longitude, datetime('now', '-' || (n.i / ?) || ' minutes') "
+            "FROM n JOIN modulos m ON m.id = n.i % ? + 1",
+            (alertas, modulos, modulos))
+        session.commit()
+    session.close()
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return sorted(tempos)[len(tempos) // 2], resultado
+
+
+def varredura_raio(API, session, latitude, longitude, raio_km):
+    """Sem índice espacial, como a partir de /modulos.json: todos os módulos com status e haversine em cada um."""
+    import geografia
+    linhas = (session.query(API.Modulos.nome_modulo, API.Modulos.latitude, API.Modulos.longitude, API.StatusModulos.nivel)
+              .outerjoin(API.StatusModulos, API.StatusModulos.nome_modulo == API.Modulos.nome_modulo).all())
+    return sorted(nome for nome, lat, lon, nivel in linhas
+                  if nivel == 'Crítico' and geografia.distancia_km(latitude, longitude, lat, lon) <= raio_km)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modulos', type=int, default=100000)
+    parser.add_argument('--alertas', type=int, default=10000000)
+    parser.add_argument('--lado-km', type=float, default=100.0)
+    parser.add_argument('--criticos', type=float, default=0.02, help="Fração de módulos com status crítico")
+    parser.add_argument('--raio-km', type=float, default=5.0)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='bench_mapa_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+    os.environ['SITE_CACHE'] = '0'
+    import API
+    import geografia
+    import site3
+
+    inicio = time.perf_counter()
+    popular(API, args.modulos, args.alertas, args.lado_km, args.criticos)
+    print(f"{args.modulos} módulos, {args.alertas} alertas em {args.lado_km:.0f} km x {args.lado_km:.0f} km "
+          f"(gerados em {time.perf_counter() - inicio:.0f}s)")
+
+    cliente = site3.app.test_client()
+    tempo, resposta = cronometrar(lambda: cliente.get('/modulos.json'), max(1, args.repeticoes // 2))
+    print(f"  /modulos.json (todos os marcadores)  : {tempo * 1000:8.1f} ms | {len(resposta.data) / 1024:8.1f} KiB | "
+          f"{len(resposta.get_json())} marcadores")
+
+    meio = args.lado_km / 2 / geografia.KM_POR_GRAU_LAT
+    for zoom, fracao in ((9, 1.0), (12, 0.15), (15, 0.02)):
+        sul, norte = CENTRO[0] - meio * fracao, CENTRO[0] + meio * fracao
+        oeste, leste = CENTRO[1] - meio * fracao / 0.917, CENTRO[1] + meio * fracao / 0.917
+        url = f"/mapa/clusters.json?sul={sul}&oeste={oeste}&norte={norte}&leste={leste}&zoom={zoom}"
+        tempo, resposta = cronometrar(lambda: cliente.get(url), args.repeticoes)
+        dados = resposta.get_json()
+        modulos = sum(cluster['quantidade'] for cluster in dados['clusters'])
+        print(f"  clusters zoom {zoom:2d} ({args.lado_km * fracao:5.1f} km de lado): {tempo * 1000:8.1f} ms | "
+              f"{len(resposta.data) / 1024:8.1f} KiB | {len(dados['clusters'])} grupos (precisão {dados['precisao']}) "
+              f"com {modulos} módulos")
+
+    session = API.criar_sessao()
+    pontos = [(CENTRO[0] + random.uniform(-meio, meio) * 0.8, CENTRO[1] + random.uniform(-meio, meio) * 0.8) for _ in range(20)]
+    tempos_indice, tempos_varredura, encontrados = [], [], 0
+    for latitude, longitude in pontos:
+        inicio = time.perf_counter()
+        resposta = cliente.get(f"/alertas/proximos.json?lat={latitude}&lon={longitude}&raio_km={args.raio_km}&limite=100000")
+        tempos_indice.append(time.perf_counter() - inicio)
+        inicio = time.perf_counter()
+        esperado = varredura_raio(API, session, latitude, longitude, args.raio_km)
+        tempos_varredura.append(time.perf_counter() - inicio)
+        obtido = sorted(alerta['nome_modulo'] for alerta in resposta.get_json()['alertas'])
+        assert obtido == esperado, (latitude, longitude, len(obtido), len(esperado))
+        encontrados += len(obtido)
+    session.close()
+    mediana = lambda valores: sorted(valores)[len(valores) // 2] * 1000
+    print(f"  críticos a até {args.raio_km:.0f} km ({len(pontos)} pontos, {encontrados / len(pontos):.1f} por ponto, resultados iguais):")
+    print(f"    /alertas/proximos.json  : {mediana(tempos_indice):8.2f} ms (requisição completa)")
+    print(f"    varredura com haversine : {mediana(tempos_varredura):8.2f} ms (só a consulta)")
+
+    amostras = [(random.uniform(-60, 10), random.uniform(-80, -30)) for _ in range(20000)]
+    inicio = time.perf_counter()
+    for latitude, longitude in amostras:
+        geografia.codificar_geohash(latitude, longitude)
+    print(f"  geohash na ingestão: {(time.perf_counter() - inicio) / len(amostras) * 1e6:.1f} µs por registro")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Custo das métricas (metricas.py) no caminho quente.
+
+1. Custo por chamada de Histogram.observe e Counter.inc, ligadas e desligadas;
+2. Laço de frames do motor (motor_deteccao.DetectionEngine) sobre frames sintéticos, alternando
+   rodadas com as métricas ligadas e desligadas, para medir a diferença em frames/s;
+3. Tempo para gerar /metrics com todas as métricas do Pi e da API registradas, e uma leitura
+   real pelo servidor HTTP.
+
+Uso:
+    python benchmarks/bench_metricas.py --frames 500 --rodadas 5
+"""
+import argparse
+import os
+import sys
+import time
+import timeit
+import urllib.request
+
+import numpy as np
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+import API  # noqa: F401  (registra as métricas da ingestão)
+import metricas
+from captura import SyntheticFrameSource
+from configuracao import LABELS_1, LABELS_2, DETECTION_THRESHOLD_1, DETECTION_THRESHOLD_2
+from maquina_estados import DetectionStateMachine
+from modelos import DetectionPipeline, ModelRunner
+from leitor_serial import SerialReader
+from motor_deteccao import DetectionEngine, RecordingPublisher
+
+
+def custo_por_chamada(funcao, repeticoes):
+    return min(timeit.repeat(funcao, number=repeticoes, repeat=5)) / repeticoes * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--rodadas', type=int, default=5)
+    parser.add_argument('--repeticoes', type=int, default=200000)
+    parser.add_argument('--num-threads', type=int, default=1)
+    args = parser.parse_args()
+
+    registro = metricas.Registry()
+    histograma = registro.histogram('bench_seconds', "teste")
+    contador = registro.counter('bench_total', "teste")
+    print("Custo por chamada:")
+    for ligado in (True, False):
+        registro.enabled = ligado
+        print(f"  {'ligadas' if ligado else 'desligadas':10s}: observe {custo_por_chamada(lambda: histograma.observe(0.003), args.repeticoes):6.0f} ns"
+              f" | inc {custo_por_chamada(contador.inc, args.repeticoes):6.0f} ns")
+
+    model_1 = ModelRunner(os.path.join(RAIZ, 'Modelo_Fogo.tflite'), LABELS_1, DETECTION_THRESHOLD_1, 0, args.num_threads)
+    model_2 = ModelRunner(os.path.join(RAIZ, 'Fumaça.tflite'), LABELS_2, DETECTION_THRESHOLD_2, 1, args.num_threads)
+    pipeline = DetectionPipeline(model_1, model_2, 'sequential')
+    fonte = SyntheticFrameSource(fps=None)
+    frames = [fonte.read()[1] for _ in range(args.frames)]
+
+    class FonteMemoria:
+        def __init__(self):
+            self.indice = 0
+
+        def read(self):
+            if self.indice >= len(frames):
+                return False, None
+            self.indice += 1
+            return True, frames[self.indice - 1]
+
+    taxas = {True: [], False: []}
+    for rodada in range(args.rodadas * 2):
+        ligado = rodada % 2 == 0
+        metricas.REGISTRY.enabled = ligado
+        leitor = SerialReader(port=None, verbose=False)
+        leitor.feed(b'Modulo_A,1,2\nModulo_B,3,4\n')
+        engine = DetectionEngine(pipeline, FonteMemoria(), leitor.registry, RecordingPublisher(),
+                                 DetectionStateMachine(now=0.0), verbose=False)
+        inicio = time.perf_counter()
+        engine.run(fps=10)
+        taxas[ligado].append(args.frames / (time.perf_counter() - inicio))
+    ligadas, desligadas = np.median(taxas[True]), np.median(taxas[False])
+    print(f"Laço do motor ({args.frames} frames 640x480, mediana de {args.rodadas} rodadas):")
+    print(f"  ligadas   : {ligadas:7.1f} frames/s")
+    print(f"  desligadas: {desligadas:7.1f} frames/s  (custo das métricas: {(desligadas - ligadas) / desligadas:+.2%})")
+
+    metricas.REGISTRY.enabled = True
+    texto = metricas.REGISTRY.render()
+    geracao = custo_por_chamada(metricas.REGISTRY.render, 200) / 1e6
+    servidor = metricas.start_http_server(0, '127.0.0.1')
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/metrics"
+    inicio = time.perf_counter()
+    with urllib.request.urlopen(url) as resposta:
+        corpo = resposta.read().decode()
+    leitura = (time.perf_counter() - inicio) * 1000
+    servidor.shutdown()
+    print(f"/metrics: {len(texto.splitlines())} linhas, {len(texto)} bytes | render {geracao:.2f} ms | "
+          f"GET pelo HTTP {leitura:.1f} ms | frames contados: "
+          f"{[linha for linha in corpo.splitlines() if linha.startswith('firewatcher_frame_seconds_count')]}")
+
+
+if __name__ == '__main__':
+    main()
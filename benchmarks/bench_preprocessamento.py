@@ -0,0 +1,111 @@
+"""
+Benchmark do pré-processamento por frame (modelos.ModelRunner).
+
+Compara o caminho antigo (resize, cvtColor, expand_dims, astype(float32) / 255 e set_tensor, cada
+passo alocando um array novo) com ModelRunner.load, que redimensiona em um buffer reaproveitado e
+escreve direto no tensor de entrada do interpretador pela tabela de conversão. Mede o tempo por
+frame e, com tracemalloc, o pico de memória alocada durante cada frame. Também confere que o
+tensor de entrada e as contagens ficam idênticos nos dois caminhos.
+
+Uso:
+    python benchmarks/bench_preprocessamento.py --frames 500
+    python benchmarks/bench_preprocessamento.py video.mp4 --largura 1280 --altura 720
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+from captura import SyntheticFrameSource, VideoFileSource
+from configuracao import LABELS_1, DETECTION_THRESHOLD_1
+from modelos import ModelRunner
+
+
+def preprocessar_antigo(model, frame):
+    """O pré-processamento como era antes de ModelRunner.load."""
+    input_image = cv2.resize(frame, model.input_size)
+    input_image = cv2.cvtColor(input_image, cv2.COLOR_BGR2RGB)
+    if model.input_dtype == np.uint8:
+        input_data = np.expand_dims(input_image, axis=0)
+    else:
+        input_data = np.expand_dims(input_image, axis=0).astype(np.float32) / 255.0
+    model.interpreter.set_tensor(model.input_details[0]['index'], input_data)
+
+
+def preprocessar_novo(model, frame):
+    model.load(frame)
+
+
+def carregar_frames(videos, quantidade, largura, altura):
+    fonte = VideoFileSource(videos[0], realtime=False) if videos else SyntheticFrameSource(largura, altura, fps=None)
+    frames = []
+    while len(frames) < quantidade:
+        ok, frame = fonte.read()
+        if not ok:
+            break
+        frames.append(frame)
+    fonte.release()
+    return frames
+
+
+def medir(funcao, model, frames, repeticoes):
+    for frame in frames[:10]:  # aquecimento
+        funcao(model, frame)
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for frame in frames:
+            funcao(model, frame)
+    por_frame = (time.perf_counter() - inicio) / (repeticoes * len(frames))
+
+    picos = []
+    tracemalloc.start()
+    for frame in frames:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        funcao(model, frame)
+        picos.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return por_frame, np.mean(picos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='*', help="Vídeo gravado (padrão: frames sintéticos)")
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--largura', type=int, default=640)
+    parser.add_argument('--altura', type=int, default=480)
+    parser.add_argument('--num-threads', type=int, default=1)
+    parser.add_argument('--modelo', default=os.path.join(RAIZ, 'Modelo_Fogo.tflite'))
+    args = parser.parse_args()
+
+    frames = carregar_frames(args.videos, args.frames, args.largura, args.altura)
+    model = ModelRunner(args.modelo, LABELS_1, DETECTION_THRESHOLD_1, 0, args.num_threads)
+    indice_entrada = model.input_details[0]['index']
+    print(f"{len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]} -> entrada "
+          f"{model.input_size[0]}x{model.input_size[1]} {np.dtype(model.input_dtype).name}")
+
+    divergencias = 0
+    for frame in frames:
+        preprocessar_antigo(model, frame)
+        antigo = model.interpreter.get_tensor(indice_entrada)
+        contagem_antiga = model.count(model.run())
+        preprocessar_novo(model, frame)
+        novo = model.interpreter.get_tensor(indice_entrada)
+        contagem_nova = model.count(model.run())
+        divergencias += not np.array_equal(antigo, novo) or contagem_antiga != contagem_nova
+    print(f"Tensores ou contagens diferentes: {divergencias} de {len(frames)} frames")
+
+    for nome, funcao in (("antes (aloca + set_tensor)", preprocessar_antigo), ("depois (load no tensor)", preprocessar_novo)):
+        por_frame, pico = medir(funcao, model, frames, args.repeticoes)
+        print(f"  {nome:28s}: {por_frame * 1e6:8.1f} us/frame | pico alocado por frame {pico / 1024:8.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Publicação MQTT do Pi durante quedas do enlace: publicador_mqtt.SpoolingMqttPublisher x publish QoS 0 direto.
+
+Usa o broker em processo (broker_local.py) atrás de um repassador TCP que pode ser cortado, para
+simular a queda do Wi-Fi/4G: com o enlace cortado as conexões caem e novas conexões são recusadas.
+O "laço de detecção" publica um status binário de dois módulos a --taxa mensagens/s e um assinante
+ligado direto ao broker conta o que chega. Mede:
+- duração de publish() no laço (é o que o frame espera);
+- mensagens perdidas e duplicadas;
+- tempo entre publish() e a chegada ao assinante (p50/p95/máx);
+- recuperação: do fim da queda até chegar a última mensagem publicada durante ela.
+No fim, o publicador é fechado com mensagens no spool (queda em andamento) e um novo publicador
+sobre o mesmo arquivo as entrega quando o enlace volta, como num reinício do Pi.
+
+Uso:
+    python benchmarks/bench_publicador_mqtt.py --taxa 20 --duracao 12 --queda 3 8
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import telemetria
+from broker_local import BrokerLocal
+from publicador_mqtt import MessageSpool, SpoolingMqttPublisher
+
+TOPICO = 'firewatcher/bench'
+
+
+class EnlaceInterrompivel:
+    """Repassador TCP para o broker; cortar() derruba as conexões e recusa novas até restaurar()."""
+
+    def __init__(self, porta_broker):
+        self.porta_broker = porta_broker
+        self.porta = 0
+        self._servidor = None
+        self._conexoes = []
+        self.restaurar()
+
+    def restaurar(self):
+        servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        servidor.bind(('127.0.0.1', self.porta))
+        servidor.listen()
+        self.porta = servidor.getsockname()[1]
+        self._servidor = servidor
+        threading.Thread(target=self._aceitar, args=(servidor,), daemon=True).start()
+
+    def _aceitar(self, servidor):
+        while True:
+            try:
+                cliente, _ = servidor.accept()
+            except OSError:
+                return
+            broker = socket.create_connection(('127.0.0.1', self.porta_broker))
+            self._conexoes += [cliente, broker]
+            threading.Thread(target=self._repassar, args=(cliente, broker), daemon=True).start()
+            threading.Thread(target=self._repassar, args=(broker, cliente), daemon=True).start()
+
+    @staticmethod
+    def _repassar(origem, destino):
+        try:
+            while dados := origem.recv(65536):
+                destino.sendall(dados)
+        except OSError:
+            pass
+        for conexao in (origem, destino):
+            try:
+                conexao.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def cortar(self):
+        self._servidor.shutdown(socket.SHUT_RDWR)
+        self._servidor.close()
+        for conexao in self._conexoes:
+            try:
+                conexao.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conexao.close()
+        self._conexoes = []
+
+
+class Assinante:
+    """Cliente ligado direto ao broker; guarda o instante de chegada de cada seq."""
+
+    def __init__(self, porta):
+        self.chegadas = {}
+        self.duplicadas = 0
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
+        self.client.on_message = self._on_message
+        self.client.connect('127.0.0.1', porta)
+        self.client.subscribe(TOPICO, qos=1)
+        self.client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        agora = time.time()
+        for registro in telemetria.decode_batch(msg.payload):
+            if registro.module_id != 1:
+                continue
+            if registro.seq in self.chegadas:
+                self.duplicadas += 1
+            else:
+                self.chegadas[registro.seq] = agora
+
+    def limpar(self):
+        self.chegadas, self.duplicadas = {}, 0
+
+    def fechar(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+def criar_cliente(porta):
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
+    client.reconnect_delay_set(min_delay=0.2, max_delay=1)
+    client.connect_async('127.0.0.1', porta, keepalive=10)
+    client.loop_start()
+    deadline = time.monotonic() + 5
+    while not client.is_connected() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return client
+
+
+def status(seq):
+    registros = [telemetria.TelemetryRecord(modulo, -23.55, -46.63, 1, 0, 0, seq) for modulo in (1, 2)]
+    return telemetria.encode_batch(registros)
+
+
+def rodar(publicar, enlace, args, enviados, chamadas):
+    """Publica a args.taxa msgs/s por args.duracao s, cortando o enlace no intervalo args.queda."""
+    inicio = time.monotonic()
+    cortado = restaurado = False
+    seq = 0
+    while time.monotonic() - inicio < args.duracao:
+        decorrido = time.monotonic() - inicio
+        if not cortado and decorrido >= args.queda[0]:
+            enlace.cortar()
+            cortado = True
+        if cortado and not restaurado and decorrido >= args.queda[1]:
+            enlace.restaurar()
+            restaurado = time.time()
+        seq += 1
+        enviados[seq] = time.time()
+        t0 = time.perf_counter()
+        publicar(TOPICO, status(seq))
+        chamadas.append(time.perf_counter() - t0)
+        time.sleep(max(0.0, inicio + seq / args.taxa - time.monotonic()))
+    return restaurado
+
+
+def esperar_chegadas(assinante, enviados, segundos):
+    deadline = time.monotonic() + segundos
+    while len(assinante.chegadas) < len(enviados) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def relatorio(nome, enviados, assinante, chamadas, extra=''):
+    atrasos = np.array([assinante.chegadas[seq] - instante for seq, instante in enviados.items()
+                        if seq in assinante.chegadas]) * 1000
+    chamadas = np.array(chamadas) * 1e6
+    perdidas = len(enviados) - len(assinante.chegadas)
+    atraso = (f"p50 {np.percentile(atrasos, 50):7.1f} ms | p95 {np.percentile(atrasos, 95):7.1f} ms | "
+              f"máx {atrasos.max():7.1f} ms" if len(atrasos) else "sem entregas")
+    print(f"  {nome:24s}: publish() p50 {np.percentile(chamadas, 50):5.1f} µs / p99 {np.percentile(chamadas, 99):6.1f} µs"
+          f" | perdidas {perdidas:4d} de {len(enviados)} | duplicadas {assinante.duplicadas} | entrega {atraso}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--taxa', type=float, default=20.0, help="Mensagens de status por segundo")
+    parser.add_argument('--duracao', type=float, default=12.0)
+    parser.add_argument('--queda', type=float, nargs=2, default=(3.0, 8.0), metavar=('INICIO', 'FIM'))
+    parser.add_argument('--taxa-drenagem', type=float, default=20.0, help="Publishes/s ao esvaziar o spool")
+    args = parser.parse_args()
+
+    broker = BrokerLocal()
+    porta_broker = broker.iniciar_em_thread()
+    assinante = Assinante(porta_broker)
+    print(f"{args.taxa:.0f} status/s por {args.duracao:.0f}s, enlace cortado de {args.queda[0]:.0f}s a {args.queda[1]:.0f}s")
+
+    # Caminho antigo: publish QoS 0 direto no laço
+    enlace = EnlaceInterrompivel(porta_broker)
+    client = criar_cliente(enlace.porta)
+    enviados, chamadas = {}, []
+    rodar(lambda topico, payload: client.publish(topico, payload), enlace, args, enviados, chamadas)
+    esperar_chegadas(assinante, enviados, 2.0)
+    relatorio("QoS 0 direto", enviados, assinante, chamadas)
+    client.loop_stop()
+    client.disconnect()
+    enlace.cortar()
+
+    # SpoolingMqttPublisher: QoS 1 + spool em disco
+    pasta = tempfile.mkdtemp(prefix='bench_publicador_')
+    caminho_spool = os.path.join(pasta, 'fila_mqtt.sqlite3')
+    assinante.limpar()
+    enlace = EnlaceInterrompivel(porta_broker)
+    publicador = SpoolingMqttPublisher(criar_cliente(enlace.porta), MessageSpool(caminho_spool),
+                                       drain_rate=args.taxa_drenagem, verbose=False)
+    enviados, chamadas = {}, []
+    restaurado = rodar(publicador.publish, enlace, args, enviados, chamadas)
+    publicador.flush(10.0)
+    esperar_chegadas(assinante, enviados, 5.0)
+    # Recuperação: até chegar a última mensagem publicada antes da volta do enlace
+    atrasadas = [assinante.chegadas.get(seq, float('inf')) for seq, instante in enviados.items() if instante < restaurado]
+    relatorio("spool + QoS 1", enviados, assinante, chamadas,
+              f" | atraso recuperado {max(atrasadas) - restaurado:.2f}s após a volta")
+    print(f"  {'':24s}  {publicador.summary()}")
+    publicador.close()
+
+    # Reinício durante a queda: as mensagens ficam no arquivo e o próximo publicador as entrega
+    assinante.limpar()
+    enlace = EnlaceInterrompivel(porta_broker)
+    publicador = SpoolingMqttPublisher(criar_cliente(enlace.porta), MessageSpool(caminho_spool), verbose=False)
+    enlace.cortar()
+    time.sleep(0.3)
+    enviados, chamadas = {}, []
+    for seq in range(1, 51):
+        enviados[seq] = time.time()
+        publicador.publish(TOPICO, status(seq))
+    time.sleep(0.3)
+    publicador.close()
+    no_arquivo = len(MessageSpool(caminho_spool))
+    enlace.restaurar()
+    publicador = SpoolingMqttPublisher(criar_cliente(enlace.porta), MessageSpool(caminho_spool), verbose=False)
+    publicador.flush(10.0)
+    esperar_chegadas(assinante, enviados, 5.0)
+    print(f"  reinício durante a queda: {no_arquivo} no spool ao fechar | entregues depois {len(assinante.chegadas)} "
+          f"de {len(enviados)} | duplicadas {assinante.duplicadas}")
+    publicador.close()
+    enlace.cortar()
+    assinante.fechar()
+    time.sleep(0.1)
+    broker.parar()
+
+
+if __name__ == '__main__':
+    main()
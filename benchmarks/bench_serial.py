@@ -0,0 +1,184 @@
+"""
+Leitura da serial: thread do leitor_serial.SerialReader x o laço antigo (uma readline por frame).
+
+Um pty faz o papel do gateway LoRa: uma thread escreve no lado mestre rajadas de registros '#<hex>'
+de vários módulos (cada nó envia a cada --intervalo segundos) e um PING de vez em quando; o lado
+escravo é aberto pelo pyserial como se fosse /dev/serial0. Mede:
+- atraso entre a escrita da linha e o registro do módulo ser atualizado (p50/p95/máx) e linhas
+  ainda pendentes no fim;
+- tempo até o ACK_PI chegar ao gateway depois de um PING;
+- CPU gasta esperando os módulos na inicialização (laço antigo em in_waiting x wait_for).
+
+O laço antigo é simulado como no Firewatcher_Raspi.py original: a cada frame (--fps-laco) lê no
+máximo uma linha se houver bytes esperando.
+
+Uso:
+    python benchmarks/bench_serial.py --modulos 8 --intervalo 0.5 --duracao 10 --fps-laco 5
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import serial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import telemetria
+from leitor_serial import SerialReader, parse_serial_line
+
+
+class Gateway:
+    """Lado mestre do pty: escreve registros dos módulos e PINGs, e lê as respostas ACK_PI."""
+
+    def __init__(self, modulos, intervalo, duracao, intervalo_ping=1.0):
+        self.mestre, escravo = os.openpty()
+        self.caminho = os.ttyname(escravo)
+        self._escravo = escravo
+        self.modulos = [f"Modulo_{telemetria.module_letter(indice + 1)}" for indice in range(modulos)]
+        self.intervalo = intervalo
+        self.duracao = duracao
+        self.intervalo_ping = intervalo_ping
+        self.escritas = {}  # (módulo, seq) -> instante da escrita
+        self.pings = []
+        self.acks = []
+        self._thread = None
+        self._leitor_acks = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._escrever, daemon=True)
+        self._leitor_acks = threading.Thread(target=self._ler_acks, daemon=True)
+        self._thread.start()
+        self._leitor_acks.start()
+
+    def _escrever(self):
+        inicio = time.monotonic()
+        seq, proximo_ping = 0, inicio
+        while time.monotonic() - inicio < self.duracao:
+            rodada = time.monotonic()
+            seq += 1
+            for indice, modulo in enumerate(self.modulos):
+                registro = telemetria.TelemetryRecord(indice + 1, -23.5 - indice * 0.01, -46.6, 1, 300, 200, seq)
+                self.escritas[(modulo, seq)] = time.monotonic()
+                os.write(self.mestre, (telemetria.format_serial(registro) + '\n').encode())
+            if rodada >= proximo_ping:
+                self.pings.append(time.monotonic())
+                os.write(self.mestre, b'PING\n')
+                proximo_ping += self.intervalo_ping
+            time.sleep(max(0.0, self.intervalo - (time.monotonic() - rodada)))
+
+    def _ler_acks(self):
+        buffer = b''
+        while True:
+            try:
+                buffer += os.read(self.mestre, 1024)
+            except OSError:
+                return
+            while b'ACK_PI\n' in buffer:
+                buffer = buffer.replace(b'ACK_PI\n', b'', 1)
+                self.acks.append(time.monotonic())
+
+    def esperar(self):
+        self._thread.join()
+
+    def fechar(self):
+        os.close(self._escravo)
+        os.close(self.mestre)
+
+
+def percentis(valores):
+    if not valores:
+        return "sem amostras"
+    valores = np.array(valores) * 1000
+    return f"p50 {np.percentile(valores, 50):7.1f} ms | p95 {np.percentile(valores, 95):7.1f} ms | máx {valores.max():7.1f} ms"
+
+
+def rodar_thread(args):
+    gateway = Gateway(args.modulos, args.intervalo, args.duracao)
+    leitor = SerialReader(gateway.caminho, 115200, required_modules=gateway.modulos, verbose=False)
+    atrasos = []
+    original = leitor.handle_line
+
+    def medir(linha, now=None):
+        tipo = original(linha, now)
+        if tipo == 'module':
+            _, modulo, registro = parse_serial_line(linha, gateway.modulos)
+            atrasos.append(time.monotonic() - gateway.escritas[(modulo, registro.seq)])
+        return tipo
+    leitor.handle_line = medir
+    leitor.start()
+    gateway.iniciar()
+    gateway.esperar()
+    time.sleep(0.5)
+    leitor.stop()
+    gateway.fechar()
+    pendentes = len(gateway.escritas) - len(atrasos)
+    return atrasos, pendentes, [ack - ping for ping, ack in zip(gateway.pings, gateway.acks)], leitor
+
+
+def rodar_laco_antigo(args):
+    gateway = Gateway(args.modulos, args.intervalo, args.duracao)
+    porta = serial.Serial(gateway.caminho, 115200, timeout=1)
+    atrasos, acks = [], []
+    gateway.iniciar()
+    fim = time.monotonic() + args.duracao + 0.5
+    while time.monotonic() < fim:
+        time.sleep(1.0 / args.fps_laco)  # inferência e demais etapas do frame
+        if porta.in_waiting > 0:
+            linha = porta.readline().decode('utf-8', errors='ignore').strip()
+            if 'PING' in linha:
+                porta.write(b'ACK_PI\n')
+                continue
+            tipo, modulo, registro = parse_serial_line(linha, gateway.modulos)
+            if tipo == 'module':
+                atrasos.append(time.monotonic() - gateway.escritas[(modulo, registro.seq)])
+    gateway.esperar()
+    porta.close()
+    gateway.fechar()
+    pendentes = len(gateway.escritas) - len(atrasos)
+    return atrasos, pendentes, [ack - ping for ping, ack in zip(gateway.pings, gateway.acks)]
+
+
+def cpu_na_espera(segundos):
+    """CPU gasta esperando módulos que não chegam: laço antigo em in_waiting x ModuleRegistry.wait_for."""
+    gateway = Gateway(1, 1.0, 0)
+    porta = serial.Serial(gateway.caminho, 115200, timeout=1)
+    inicio, fim = time.process_time(), time.monotonic() + segundos
+    while time.monotonic() < fim:
+        if porta.in_waiting > 0:
+            porta.readline()
+    antigo = (time.process_time() - inicio) / segundos
+    porta.close()
+
+    leitor = SerialReader(gateway.caminho, 115200, required_modules=['Modulo_A'], verbose=False)
+    leitor.start()
+    inicio = time.process_time()
+    leitor.registry.wait_for(['Modulo_A'], timeout=segundos)
+    novo = (time.process_time() - inicio) / segundos
+    leitor.stop()
+    gateway.fechar()
+    return antigo, novo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modulos', type=int, default=8)
+    parser.add_argument('--intervalo', type=float, default=0.5, help="Segundos entre envios de cada nó")
+    parser.add_argument('--duracao', type=float, default=10.0)
+    parser.add_argument('--fps-laco', type=float, default=5.0, help="Frames/s do laço antigo (uma readline por frame)")
+    args = parser.parse_args()
+
+    taxa = args.modulos / args.intervalo
+    print(f"{args.modulos} módulos a cada {args.intervalo}s ({taxa:.0f} linhas/s) por {args.duracao:.0f}s, PING a cada 1s")
+    atrasos, pendentes, acks, leitor = rodar_thread(args)
+    print(f"  thread do leitor    : atraso {percentis(atrasos)} | pendentes no fim {pendentes} | ACK {percentis(acks)}")
+    atrasos, pendentes, acks = rodar_laco_antigo(args)
+    print(f"  laço antigo {args.fps_laco:4.0f} fps: atraso {percentis(atrasos)} | pendentes no fim {pendentes} | ACK {percentis(acks)}")
+    print(f"  registro: {leitor.summary()['modules'].get('Modulo_A')}")
+    antigo, novo = cpu_na_espera(2.0)
+    print(f"CPU esperando módulos na inicialização: laço em in_waiting {antigo:.0%} de um núcleo | wait_for {novo:.1%}")
+
+
+if __name__ == '__main__':
+    main()
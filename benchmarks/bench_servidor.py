@@ -0,0 +1,164 @@
+"""
+Carga no site3: servidor de desenvolvimento do Flask x gunicorn (gunicorn.conf.py) com 1, 2, 4... workers.
+
+Gera um SQLite temporário com --modulos módulos e --alertas alertas (bench_mapa.popular), sobe cada
+servidor em um subprocesso e dispara --conexoes conexões keep-alive simultâneas contra /, /leituras e
+/modulos.json por --duracao segundos cada. Os clientes rodam em --processos-cliente processos, para
+que o gerador de carga não fique preso ao GIL de um só processo. Mede requisições/s, p50 e p99 da
+latência e respostas com erro. Com --cache 0 (padrão) cada requisição vai ao banco.
+
+A escala com os workers depende dos núcleos livres: o gerador de carga divide a máquina com o
+servidor, então rode com menos processos cliente que núcleos.
+
+Uso:
+    python benchmarks/bench_servidor.py --workers 1 2 4 --conexoes 32 --duracao 10
+    python benchmarks/bench_servidor.py --workers 4 --cache 1
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ROTAS = ('/', '/leituras', '/modulos.json')
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(comando, porta, ambiente):
+    processo = subprocess.Popen(comando, cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(300):
+        try:
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=5)
+            conexao.request('GET', '/cache.json')
+            if conexao.getresponse().status == 200:
+                conexao.close()
+                return processo
+        except OSError:
+            time.sleep(0.1)
+    processo.kill()
+    raise SystemExit(f"O servidor não subiu: {' '.join(comando)}")
+
+
+def parar_servidor(processo):
+    processo.terminate()
+    try:
+        processo.wait(10)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+        processo.wait()
+
+
+def _conexao_cliente(porta, rota, ate, latencias, erros):
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+    while time.monotonic() < ate:
+        inicio = time.perf_counter()
+        try:
+            conexao.request('GET', rota)
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status != 200:
+                erros.append(resposta.status)
+                continue
+        except (OSError, http.client.HTTPException):
+            erros.append(0)
+            conexao.close()
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+    conexao.close()
+
+
+def processo_cliente(parametros):
+    """Um processo gerador de carga: 'conexoes' threads, cada uma com uma conexão keep-alive."""
+    porta, rota, conexoes, ate = parametros
+    latencias, erros = [], []
+    threads = [threading.Thread(target=_conexao_cliente, args=(porta, rota, ate, latencias, erros))
+               for _ in range(conexoes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencias, len(erros)
+
+
+def carga(pool, porta, rota, args):
+    """Aquecimento de 1 s e depois args.duracao s de carga; retorna (req/s, p50 ms, p99 ms, erros)."""
+    por_processo = [args.conexoes // args.processos_cliente + (i < args.conexoes % args.processos_cliente)
+                    for i in range(args.processos_cliente)]
+    for duracao in (1.0, args.duracao):
+        inicio = time.monotonic()
+        resultados = pool.map(processo_cliente, [(porta, rota, n, inicio + duracao) for n in por_processo if n])
+    decorrido = time.monotonic() - inicio
+    latencias = np.array([latencia for parcial, _ in resultados for latencia in parcial]) * 1000
+    erros = sum(quantidade for _, quantidade in resultados)
+    if not len(latencias):
+        return 0.0, float('nan'), float('nan'), erros
+    return len(latencias) / decorrido, np.percentile(latencias, 50), np.percentile(latencias, 99), erros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="Workers do gunicorn a medir")
+    parser.add_argument('--threads', type=int, default=8, help="Threads por worker do gunicorn")
+    parser.add_argument('--conexoes', type=int, default=32, help="Conexões simultâneas")
+    parser.add_argument('--processos-cliente', type=int, default=max(1, min(4, os.cpu_count() // 2)))
+    parser.add_argument('--duracao', type=float, default=10.0, help="Segundos de carga por rota")
+    parser.add_argument('--modulos', type=int, default=2000)
+    parser.add_argument('--alertas', type=int, default=200000)
+    parser.add_argument('--cache', choices=('0', '1'), default='0', help="Cache de respostas do site3")
+    parser.add_argument('--sem-dev', action='store_true', help="Não medir o servidor de desenvolvimento")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='bench_servidor_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+    import API
+    from bench_mapa import popular
+    API.preparar_banco()
+    popular(API, args.modulos, args.alertas, 100.0, 0.02)
+    ambiente = dict(os.environ, SITE_CACHE=args.cache, SITE_TEMPLATES=os.path.abspath(RAIZ))
+
+    servidores = []
+    if not args.sem_dev:
+        servidores.append(("Flask dev (threaded)", lambda porta: [
+            sys.executable, '-c', f"import sys; sys.path.insert(0, {RAIZ!r}); import site3; "
+                                  f"site3.app.run(port={porta}, threaded=True)"], {}))
+    for workers in args.workers:
+        servidores.append((f"gunicorn {workers}w x {args.threads}t", lambda porta: [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'site3:criar_app()'],
+            {'SITE_WORKERS': str(workers), 'SITE_THREADS': str(args.threads)}))
+
+    print(f"{args.modulos} módulos, {args.alertas} alertas | {args.conexoes} conexões em {args.processos_cliente} "
+          f"processo(s) cliente | {os.cpu_count()} CPU(s) | cache {'ligado' if args.cache == '1' else 'desligado'}")
+    with multiprocessing.Pool(args.processos_cliente) as pool:
+        for nome, comando, extra in servidores:
+            porta = porta_livre()
+            processo = iniciar_servidor(comando(porta), porta, dict(ambiente, SITE_BIND=f"127.0.0.1:{porta}", **extra))
+            try:
+                for rota in ROTAS:
+                    taxa, p50, p99, erros = carga(pool, porta, rota, args)
+                    print(f"  {nome:24s} {rota:14s}: {taxa:8.1f} req/s | p50 {p50:7.1f} ms | p99 {p99:7.1f} ms"
+                          + (f" | {erros} erros" if erros else ""))
+            finally:
+                parar_servidor(processo)
+    shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Harness de carga das atualizações ao vivo (/eventos, Server-Sent Events).
+
+Sobe o site3 em um subprocesso sobre um SQLite temporário, conecta centenas de clientes SSE
+(asyncio, neste processo), grava alertas pelo mesmo caminho da ingestão (API.gravar_lote)
+e mede a latência entre o commit e a chegada do evento em cada cliente, além da memória
+residente do servidor antes e depois de conectar os clientes (lida de /proc, apenas Linux).
+
+Uso:
+    python benchmarks/bench_sse.py --clientes 300 --eventos 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+
+
+def memoria_kb(pid):
+    with open(f"/proc/{pid}/status") as arquivo:
+        for linha in arquivo:
+            if linha.startswith('VmRSS:'):
+                return int(linha.split()[1])
+    return 0
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(porta, clientes):
+    codigo = (f"import sys; sys.path.insert(0, {RAIZ!r}); import site3; "
+              f"site3.app.run(port={porta}, threaded=True)")
+    # O servidor de desenvolvimento abre uma thread por conexão: o limite de clientes SSE não se aplica
+    ambiente = dict(os.environ, SITE_MAX_SSE=str(clientes))
+    processo = subprocess.Popen([sys.executable, '-c', codigo], env=ambiente,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', porta), timeout=0.1).close()
+            return processo
+        except OSError:
+            time.sleep(0.1)
+    processo.kill()
+    raise SystemExit("O servidor não subiu.")
+
+
+async def cliente(porta, recebidos, conectados):
+    leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+    # HTTP/1.0 para receber o fluxo sem codificação chunked
+    escritor.write(b"GET /eventos HTTP/1.0\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n")
+    await escritor.drain()
+    while (await leitor.readline()) not in (b'\r\n', b'\n', b''):
+        pass
+    conectados.append(1)
+    tipo = None
+    try:
+        while True:
+            linha = await leitor.readline()
+            if not linha:
+                break
+            linha = linha.decode('utf-8').rstrip('\n')
+            if linha.startswith('event: '):
+                tipo = linha[7:]
+            elif linha.startswith('data: ') and tipo == 'status':
+                recebidos.append((json.loads(linha[6:])['nome_modulo'], time.monotonic()))
+    finally:
+        escritor.close()
+
+
+async def executar(args, API, pid, porta):
+    recebidos, conectados = [], []
+    memoria_inicial = memoria_kb(pid)
+    tarefas = [asyncio.create_task(cliente(porta, recebidos, conectados)) for _ in range(args.clientes)]
+    while len(conectados) < args.clientes:
+        await asyncio.sleep(0.1)
+    # Tempo para o monitor registrar o estado inicial
+    await asyncio.sleep(2.0)
+    memoria_conectados = memoria_kb(pid)
+
+    enviados = {}
+    for k in range(args.eventos):
+        nome = f"bench-{k}"
+        session = API.criar_sessao()
+        API.gravar_lote(session, [{'nome_modulo': nome, 'nivel': 'Crítico', 'descricao': 'Incêndio detectado pela IA',
+                                   'latitude': -23.55, 'longitude': -46.63, 'data_hora': API.datetime.now()}])
+        session.commit()
+        session.close()
+        enviados[nome] = time.monotonic()
+        await asyncio.sleep(args.intervalo)
+    await asyncio.sleep(2.0)
+    memoria_final = memoria_kb(pid)
+    for tarefa in tarefas:
+        tarefa.cancel()
+
+    latencias = sorted((chegada - enviados[nome]) * 1000 for nome, chegada in recebidos if nome in enviados)
+    esperado = args.clientes * args.eventos
+    print(f"Clientes: {args.clientes} | eventos entregues: {len(latencias)}/{esperado}")
+    if latencias:
+        print(f"Latência commit -> cliente: p50 {latencias[len(latencias) // 2]:.0f} ms | "
+              f"p95 {latencias[int(len(latencias) * 0.95)]:.0f} ms | máx {latencias[-1]:.0f} ms")
+    print(f"Memória do servidor: {memoria_inicial / 1024:.1f} MB sem clientes | "
+          f"{memoria_conectados / 1024:.1f} MB com clientes | {memoria_final / 1024:.1f} MB após os eventos "
+          f"(~{(memoria_conectados - memoria_inicial) / args.clientes:.0f} KB por cliente)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clientes', type=int, default=300)
+    parser.add_argument('--eventos', type=int, default=20)
+    parser.add_argument('--intervalo', type=float, default=0.25, help="Intervalo entre gravações (segundos)")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='bench_sse_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+    import API
+    API.preparar_banco()
+
+    porta = porta_livre()
+    servidor = iniciar_servidor(porta, args.clientes)
+    try:
+        asyncio.run(executar(args, API, servidor.pid, porta))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+if __name__ == '__main__':
+    main()
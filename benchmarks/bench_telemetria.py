@@ -0,0 +1,110 @@
+"""
+Benchmark do formato de telemetria: texto atual x registro binário (telemetria.py).
+
+Mede a vazão de interpretação no Pi (linha serial) e na API (payload MQTT), com um e
+com vários módulos por publish, e compara o tamanho dos pacotes e o tempo no ar do LoRa
+(fórmula da Semtech, BW 125 kHz, CR 4/5, preâmbulo de 8 símbolos, cabeçalho explícito, sem CRC,
+que são os padrões da biblioteca arduino-LoRa).
+
+Uso:
+    python benchmarks/bench_telemetria.py --repeticoes 200000 --modulos 20
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import API
+import telemetria
+from leitor_serial import parse_serial_line
+
+TOPICO = API.TOPICO_DADOS
+
+
+def tempo_no_ar_ms(tamanho, sf=7, largura_banda=125e3, taxa_codigo=1, preambulo=8, crc=False):
+    simbolo = (2 ** sf) / largura_banda
+    otimizacao = 1 if sf >= 11 and largura_banda <= 125e3 else 0
+    simbolos = 8 + max(math.ceil((8 * tamanho - 4 * sf + 28 + 16 * crc) / (4 * (sf - 2 * otimizacao))) * (taxa_codigo + 4), 0)
+    return ((preambulo + 4.25) + simbolos) * simbolo * 1000
+
+
+def linha_serial_texto(registro):
+    """O que o Pi espera hoje na serial (o nó LoRa envia ainda lat e lon concatenados, sem separador)."""
+    return f"Modulo_{telemetria.module_letter(registro.module_id)},{registro.lat:.6f},{registro.lon:.6f}"
+
+
+def interpretar_serial_texto(linha):
+    """Reproduz o caminho texto de process_serial_data."""
+    limpa = linha.replace('(', '').replace(')', '').replace('"', '').strip()
+    partes = limpa.split(',')
+    if len(partes) == 3:
+        return partes[0].strip(), float(partes[1]), float(partes[2])
+    return None
+
+
+def vazao(funcao, entradas, repeticoes):
+    inicio = time.perf_counter()
+    for indice in range(repeticoes):
+        funcao(entradas[indice % len(entradas)])
+    return repeticoes / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=200000)
+    parser.add_argument('--modulos', type=int, default=20, help="Módulos por publish no caso em lote")
+    args = parser.parse_args()
+
+    registros = [telemetria.TelemetryRecord(random.randint(1, 26), -23.55 + random.uniform(-0.5, 0.5),
+                                            -46.63 + random.uniform(-0.5, 0.5), random.randint(0, 1),
+                                            random.randint(0, 4095), random.randint(0, 4095), indice)
+                 for indice in range(1000)]
+    for registro in registros[:50]:
+        decodificado = telemetria.decode(telemetria.encode(registro))
+        if decodificado.module_id != registro.module_id or abs(decodificado.lat - registro.lat) >= 1e-7:
+            raise AssertionError(f"Registro decodificado diferente do codificado: {decodificado} x {registro}")
+
+    print("Pi, linha serial -> registro")
+    linhas_texto = [linha_serial_texto(registro) for registro in registros]
+    linhas_binarias = [telemetria.format_serial(registro) for registro in registros]
+    print(f"  texto (replace/split)       : {vazao(interpretar_serial_texto, linhas_texto, args.repeticoes):>10,.0f} linhas/s")
+    print(f"  binário ('#' + hex)         : {vazao(telemetria.decode_serial, linhas_binarias, args.repeticoes):>10,.0f} linhas/s")
+    # Caminho completo do leitor serial, até o TelemetryRecord do módulo (o texto não traz sensores nem seq)
+    modulos = [f"Modulo_{telemetria.module_letter(indice)}" for indice in range(1, 27)]
+    for nome, linhas in (("texto", linhas_texto), ("binário", linhas_binarias)):
+        taxa = vazao(lambda linha: parse_serial_line(linha, modulos), linhas, args.repeticoes)
+        print(f"  parse_serial_line, {nome:9s}: {taxa:>10,.0f} linhas/s")
+
+    print("API, payload MQTT -> registros para gravação")
+    payloads_texto = [f"({linha},{registro.status})".encode() for linha, registro in zip(linhas_texto, registros)]
+    payloads_binarios = [telemetria.encode(registro) for registro in registros]
+    lotes = [telemetria.encode_batch(registros[indice:indice + args.modulos]) for indice in range(0, len(registros), args.modulos)]
+    texto = vazao(API.interpretar_payload, payloads_texto, args.repeticoes)
+    binario = vazao(API.interpretar_payload, payloads_binarios, args.repeticoes)
+    em_lote = vazao(API.interpretar_payload, lotes, args.repeticoes // args.modulos) * args.modulos
+    decodificacao = vazao(telemetria.decode_batch, lotes, args.repeticoes // args.modulos) * args.modulos
+    print(f"  texto, 1 por publish        : {texto:>10,.0f} registros/s")
+    print(f"  binário, 1 por publish      : {binario:>10,.0f} registros/s")
+    print(f"  binário, {args.modulos:3d} por publish    : {em_lote:>10,.0f} registros/s "
+          f"(só decode_batch: {decodificacao:,.0f}/s)")
+
+    print("Tamanho e tempo no ar")
+    lora_texto = len(f"[A,{registros[0].lat:.6f}{registros[0].lon:.6f}]")
+    for nome, tamanho in (("LoRa texto '[A,latlon]' (sem sensores)", lora_texto),
+                          ("LoRa binário (com sensores e seq)", telemetria.RECORD_SIZE)):
+        tempos = ", ".join(f"SF{sf} {tempo_no_ar_ms(tamanho, sf):6.1f} ms" for sf in (7, 10, 12))
+        print(f"  {nome:40s}: {tamanho:3d} bytes | {tempos}")
+    # Cada PUBLISH QoS 0 leva 2 bytes de cabeçalho fixo + 2 + tamanho do tópico
+    cabecalho = 2 + 2 + len(TOPICO)
+    mqtt_texto = sum(len(payload) + cabecalho for payload in payloads_texto[:args.modulos])
+    mqtt_binario = len(lotes[0]) + cabecalho
+    print(f"  MQTT, {args.modulos} módulos: texto {mqtt_texto} bytes em {args.modulos} publishes | "
+          f"binário {mqtt_binario} bytes em 1 publish")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Broker MQTT 3.1.1 mínimo, em processo, para benchmarks sem mosquitto instalado.
+
+Atende CONNECT, SUBSCRIBE/UNSUBSCRIBE (com curingas + e #), PUBLISH QoS 0 e 1
+(responde PUBACK ao publicador e repassa aos assinantes em QoS 0), PINGREQ e DISCONNECT.
+Como o mosquitto, não deixa um assinante lento acumular memória sem limite: se o buffer
+de saída dele passar de 'limite_buffer' bytes, as mensagens para ele são descartadas e contadas.
+
+Uso em um script:
+    broker = BrokerLocal()
+    porta = broker.iniciar_em_thread()
+    ...
+    broker.parar()
+"""
+import asyncio
+import struct
+import threading
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+
+def codificar_tamanho(tamanho):
+    saida = bytearray()
+    while True:
+        byte, tamanho = tamanho % 128, tamanho // 128
+        saida.append(byte | (0x80 if tamanho else 0))
+        if not tamanho:
+            return bytes(saida)
+
+
+def pacote(tipo, corpo=b'', flags=0):
+    return bytes([(tipo << 4) | flags]) + codificar_tamanho(len(corpo)) + corpo
+
+
+def topico_corresponde(filtro, topico):
+    partes_filtro, partes_topico = filtro.split('/'), topico.split('/')
+    for indice, parte in enumerate(partes_filtro):
+        if parte == '#':
+            return True
+        if indice >= len(partes_topico) or (parte != '+' and parte != partes_topico[indice]):
+            return False
+    return len(partes_filtro) == len(partes_topico)
+
+
+class _Cliente:
+    def __init__(self, writer):
+        self.writer = writer
+        self.filtros = set()
+
+
+class BrokerLocal:
+    def __init__(self, host='127.0.0.1', porta=0, limite_buffer=8 * 1024 * 1024):
+        self.host = host
+        self.porta = porta
+        self.limite_buffer = limite_buffer
+        self.clientes = set()
+        self.publicacoes = 0
+        self.entregas = 0
+        self.descartes = 0
+        self._loop = None
+        self._servidor = None
+        self._thread = None
+
+    async def iniciar(self):
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        return self.porta
+
+    def iniciar_em_thread(self):
+        """Roda o broker no seu próprio loop asyncio, em uma thread. Retorna a porta."""
+        pronto = threading.Event()
+
+        def executar():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.iniciar())
+            pronto.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=executar, name="broker-local", daemon=True)
+        self._thread.start()
+        pronto.wait()
+        return self.porta
+
+    def parar(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    async def _ler_pacote(self, reader):
+        cabecalho = await reader.readexactly(1)
+        tamanho, multiplicador = 0, 1
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            tamanho += (byte & 0x7F) * multiplicador
+            multiplicador *= 128
+            if not byte & 0x80:
+                break
+        return cabecalho[0] >> 4, cabecalho[0] & 0x0F, await reader.readexactly(tamanho)
+
+    async def _atender(self, reader, writer):
+        cliente = _Cliente(writer)
+        self.clientes.add(cliente)
+        try:
+            while True:
+                tipo, flags, corpo = await self._ler_pacote(reader)
+                if tipo == CONNECT:
+                    writer.write(pacote(CONNACK, b'\x00\x00'))
+                elif tipo == PUBLISH:
+                    self._publicar(flags, corpo, writer)
+                elif tipo == PUBREL:
+                    writer.write(pacote(PUBCOMP, corpo[:2]))
+                elif tipo == SUBSCRIBE:
+                    writer.write(pacote(SUBACK, corpo[:2] + self._assinar(cliente, corpo[2:])))
+                elif tipo == UNSUBSCRIBE:
+                    posicao = 2
+                    while posicao < len(corpo):
+                        (tamanho,) = struct.unpack_from('!H', corpo, posicao)
+                        cliente.filtros.discard(corpo[posicao + 2:posicao + 2 + tamanho].decode())
+                        posicao += 2 + tamanho
+                    writer.write(pacote(UNSUBACK, corpo[:2]))
+                elif tipo == PINGREQ:
+                    writer.write(pacote(PINGRESP))
+                elif tipo == DISCONNECT:
+                    break
+                # PUBACK/PUBREC/PUBCOMP vindos do cliente não precisam de resposta (repasse é em QoS 0)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clientes.discard(cliente)
+            writer.close()
+
+    @staticmethod
+    def _assinar(cliente, corpo):
+        concedidos, posicao = bytearray(), 0
+        while posicao < len(corpo):
+            (tamanho,) = struct.unpack_from('!H', corpo, posicao)
+            cliente.filtros.add(corpo[posicao + 2:posicao + 2 + tamanho].decode())
+            concedidos.append(min(corpo[posicao + 2 + tamanho], 1))
+            posicao += 3 + tamanho
+        return bytes(concedidos)
+
+    def _publicar(self, flags, corpo, writer):
+        qos = (flags >> 1) & 0x03
+        (tamanho,) = struct.unpack_from('!H', corpo, 0)
+        topico = corpo[2:2 + tamanho].decode()
+        inicio_dados = 2 + tamanho
+        if qos:
+            identificador = corpo[inicio_dados:inicio_dados + 2]
+            inicio_dados += 2
+            writer.write(pacote(PUBACK if qos == 1 else PUBREC, identificador))
+        self.publicacoes += 1
+
+        saida = pacote(PUBLISH, corpo[:2 + tamanho] + corpo[inicio_dados:])
+        for cliente in self.clientes:
+            if any(topico_corresponde(filtro, topico) for filtro in cliente.filtros):
+                if cliente.writer.transport.get_write_buffer_size() > self.limite_buffer:
+                    self.descartes += 1
+                    continue
+                cliente.writer.write(saida)
+                self.entregas += 1
@@ -0,0 +1,123 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import Response, make_response, request
+
+EntradaCache = namedtuple('EntradaCache', ['versao', 'criado_em', 'corpo', 'mimetype', 'etag'])
+
+
+class LeitorVersao:
+    """
+    Fornece a versão dos dados (contador incrementado pela ingestão a cada lote gravado).
+    A leitura no banco é feita no máximo uma vez a cada 'intervalo' segundos, para todas as
+    requisições juntas; avisar() permite que a ingestão no mesmo processo invalide na hora.
+    """
+
+    def __init__(self, ler_versao, intervalo=1.0):
+        self._ler_versao = ler_versao
+        self.intervalo = intervalo
+        self._versao = None
+        self._local = 0
+        self._lido_em = 0.0
+        self._lock = threading.Lock()
+
+    def avisar(self):
+        """Marca que houve escrita neste processo; a próxima chamada já retorna uma versão nova."""
+        with self._lock:
+            self._local += 1
+
+    def __call__(self):
+        agora = time.monotonic()
+        with self._lock:
+            if self._versao is None or agora - self._lido_em >= self.intervalo:
+                self._versao = self._ler_versao()
+                self._lido_em = agora
+            return self._versao, self._local
+
+
+class CacheRespostas:
+    """
+    Cache em memória (TTL + LRU) de respostas das views do Flask, invalidado pela versão dos dados.
+    Cada resposta leva um ETag; requisições com If-None-Match igual recebem 304 sem executar a view.
+    """
+
+    def __init__(self, obter_versao, ttl=30.0, max_entradas=128, ativo=True):
+        self.obter_versao = obter_versao
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.ativo = ativo
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.respostas_304 = 0
+        self.remocoes = 0
+
+    def em_cache(self, view):
+        """Decorador para views GET cujo conteúdo só muda quando a ingestão grava dados novos."""
+        @functools.wraps(view)
+        def envoltorio(*args, **kwargs):
+            if not self.ativo:
+                return view(*args, **kwargs)
+
+            chave = request.full_path
+            versao = self.obter_versao()
+            entrada = self._buscar(chave, versao)
+            if entrada is None:
+                resposta = make_response(view(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+                corpo = resposta.get_data()
+                entrada = EntradaCache(versao, time.monotonic(), corpo, resposta.mimetype,
+                                       hashlib.md5(corpo).hexdigest())
+                self._guardar(chave, entrada)
+
+            if request.if_none_match.contains(entrada.etag):
+                with self._lock:
+                    self.respostas_304 += 1
+                resposta = Response(status=304)
+            else:
+                resposta = Response(entrada.corpo, mimetype=entrada.mimetype)
+            resposta.set_etag(entrada.etag)
+            # O navegador sempre revalida, enviando o ETag que já tem
+            resposta.headers['Cache-Control'] = 'no-cache'
+            return resposta
+        return envoltorio
+
+    def _buscar(self, chave, versao):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada and entrada.versao == versao and time.monotonic() - entrada.criado_em < self.ttl:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return entrada
+            self.faltas += 1
+            return None
+
+    def _guardar(self, chave, entrada):
+        with self._lock:
+            self._entradas[chave] = entrada
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.remocoes += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def metricas(self):
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                'ativo': self.ativo,
+                'entradas': len(self._entradas),
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'taxa_acerto': round(self.acertos / total, 3) if total else 0.0,
+                'respostas_304': self.respostas_304,
+                'remocoes': self.remocoes,
+            }
@@ -0,0 +1,358 @@
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+import numpy as np
+
+import metricas
+
+# Frame capturado: imagem BGR, instante da captura (time.monotonic) e número sequencial
+CapturedFrame = namedtuple('CapturedFrame', ['image', 'timestamp', 'seq'])
+
+CAPTURE_READ_SECONDS = metricas.histogram('firewatcher_capture_read_seconds', "Duração de cada read() da fonte de vídeo")
+FRAMES_DROPPED = metricas.counter('firewatcher_frames_dropped_total', "Frames descartados antes de serem processados")
+FRAME_AGE_SECONDS = metricas.histogram('firewatcher_frame_age_seconds', "Tempo entre a captura e o fim do processamento do frame")
+
+
+class RateMeter:
+    """Mede eventos por segundo numa janela deslizante."""
+
+    def __init__(self, window_seconds=5.0):
+        self.window_seconds = window_seconds
+        self._events = deque()
+        self._lock = threading.Lock()
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._events.append(now)
+            self._trim(now)
+
+    def rate(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._trim(now)
+            if len(self._events) < 2:
+                return 0.0
+            elapsed = now - self._events[0]
+            return (len(self._events) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def _trim(self, now):
+        while self._events and now - self._events[0] > self.window_seconds:
+            self._events.popleft()
+
+
+class CpuMeter:
+    """Uso de CPU do processo (100% = um núcleo inteiro) desde a leitura anterior."""
+
+    def __init__(self):
+        self._last_wall = time.monotonic()
+        self._last_cpu = time.process_time()
+
+    def usage(self):
+        wall, cpu = time.monotonic(), time.process_time()
+        elapsed = wall - self._last_wall
+        percent = 100.0 * (cpu - self._last_cpu) / elapsed if elapsed > 0 else 0.0
+        self._last_wall, self._last_cpu = wall, cpu
+        return percent
+
+
+class SyntheticFrameSource:
+    """
+    Fonte de frames sintéticos com a mesma interface do cv2.VideoCapture (read/isOpened/release).
+    Gera um quadrado em movimento sobre fundo com ruído, no ritmo de 'fps'.
+    """
+
+    def __init__(self, width=640, height=480, fps=25.0, max_frames=None, seed=0):
+        self.width, self.height, self.fps = width, height, fps
+        self.max_frames = max_frames
+        self._rng = np.random.default_rng(seed)
+        self._background = self._rng.integers(0, 60, (height, width, 3), dtype=np.uint8)
+        self._count = 0
+        self._next_time = time.monotonic()
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        if not self._opened or (self.max_frames is not None and self._count >= self.max_frames):
+            return False, None
+        if self.fps:
+            delay = self._next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_time = max(self._next_time + 1.0 / self.fps, time.monotonic() - 1.0 / self.fps)
+
+        frame = self._background.copy()
+        size = max(8, self.height // 8)
+        x = (self._count * 4) % max(1, self.width - size)
+        y = self.height // 2 - size // 2
+        frame[y:y + size, x:x + size] = (0, 80, 255)
+        self._count += 1
+        return True, frame
+
+    def release(self):
+        self._opened = False
+
+
+class VideoFileSource:
+    """
+    Lê um arquivo de vídeo local como se fosse uma câmera ao vivo.
+    Com realtime=True os frames são entregues no FPS do arquivo; com loop=True o vídeo reinicia ao final.
+    """
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self._cap = cv2.VideoCapture(path)
+        file_fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.fps = file_fps if file_fps and file_fps > 0 else 25.0
+        self._next_time = time.monotonic()
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def read(self):
+        ret, frame = self._cap.read()
+        if not ret and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read()
+        if ret and self.realtime:
+            delay = self._next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_time = max(self._next_time + 1.0 / self.fps, time.monotonic() - 1.0 / self.fps)
+        return ret, frame
+
+    def release(self):
+        self._cap.release()
+
+
+class ImageFolderSource:
+    """
+    Lê as imagens de uma pasta (ordem alfabética) como se fossem frames de uma câmera a 'fps' quadros
+    por segundo. Com realtime=False entrega os frames o mais rápido possível.
+    """
+
+    EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+    def __init__(self, directory, fps=10.0, realtime=True):
+        self.directory = directory
+        self.fps = fps
+        self.realtime = realtime
+        self.paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                            if name.lower().endswith(self.EXTENSIONS))
+        self._index = 0
+        self._next_time = time.monotonic()
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        while self._index < len(self.paths):
+            frame = cv2.imread(self.paths[self._index])
+            self._index += 1
+            if frame is None:
+                continue
+            if self.realtime:
+                delay = self._next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self._next_time = max(self._next_time + 1.0 / self.fps, time.monotonic() - 1.0 / self.fps)
+            return True, frame
+        return False, None
+
+    def release(self):
+        self._index = len(self.paths)
+
+
+def make_source_factory(spec):
+    """
+    Retorna uma função que abre a fonte de vídeo descrita por 'spec':
+    - None ou '' : câmera local (índice 0);
+    - 'synthetic' ou 'synthetic:<fps>' : SyntheticFrameSource;
+    - caminho de arquivo existente : VideoFileSource em tempo real;
+    - pasta existente : ImageFolderSource em tempo real;
+    - qualquer outra string (ex: URL RTSP) : cv2.VideoCapture.
+    """
+    if not spec:
+        return lambda: cv2.VideoCapture(0)
+    if spec.startswith('synthetic'):
+        fps = float(spec.split(':', 1)[1]) if ':' in spec else 25.0
+        return lambda: SyntheticFrameSource(fps=fps)
+    if os.path.isfile(spec):
+        return lambda: VideoFileSource(spec)
+    if os.path.isdir(spec):
+        return lambda: ImageFolderSource(spec)
+
+    def open_stream():
+        cap = cv2.VideoCapture(spec)
+        # Reduz o buffer interno quando o backend permite; a thread de captura já descarta o excesso
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+    return open_stream
+
+
+class LatestFrameGrabber:
+    """
+    Thread produtora que lê a fonte de vídeo continuamente e mantém apenas o frame mais recente.
+    Frames que não foram consumidos antes de chegar um novo são descartados (e contados),
+    de modo que a inferência sempre roda sobre a imagem mais atual em vez de esvaziar o buffer do RTSP.
+    """
+
+    def __init__(self, source_factory, reconnect=True, reconnect_delay=5.0, on_frame=None):
+        self._source_factory = source_factory
+        self.reconnect = reconnect
+        self.reconnect_delay = reconnect_delay
+        # Chamado (fora do lock) a cada frame novo; usado pelo escalonador de várias câmeras
+        self.on_frame = on_frame
+        self.source = None
+        self._cond = threading.Condition()
+        self._latest = None
+        self._last_taken_seq = 0
+        self.last_taken = None  # Último CapturedFrame entregue (para medir a idade do frame após read())
+        self._running = False
+        self._thread = None
+        self.finished = False
+
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self.capture_rate = RateMeter()
+
+    def start(self):
+        """Abre a fonte e inicia a thread de captura. Retorna False se a fonte não abrir."""
+        self.source = self._source_factory()
+        if not self.source or not self.source.isOpened():
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="captura-frames", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=self.reconnect_delay + 1.0)
+            self._thread = None
+        if self.source:
+            self.source.release()
+            self.source = None
+
+    def _run(self):
+        while self._running:
+            read_start = time.perf_counter()
+            ret, image = self.source.read()
+            CAPTURE_READ_SECONDS.observe(time.perf_counter() - read_start)
+            if not ret:
+                self.read_failures += 1
+                if not self.reconnect:
+                    break
+                print("\nErro ao ler frame, tentando reconectar...")
+                self.source.release()
+                time.sleep(self.reconnect_delay)
+                self.source = self._source_factory()
+                continue
+
+            now = time.monotonic()
+            self.capture_rate.tick(now)
+            with self._cond:
+                self.frames_captured += 1
+                if self._latest is not None and self._latest.seq > self._last_taken_seq:
+                    self.frames_dropped += 1
+                    FRAMES_DROPPED.inc()
+                self._latest = CapturedFrame(image, now, self.frames_captured)
+                self._cond.notify_all()
+            if self.on_frame:
+                self.on_frame()
+
+        with self._cond:
+            self.finished = True
+            self._cond.notify_all()
+        if self.on_frame:
+            self.on_frame()
+
+    def read(self):
+        """Interface de cv2.VideoCapture: espera o próximo frame; (False, None) quando a fonte terminar."""
+        while True:
+            captured = self.get_latest(timeout=1.0)
+            if captured is not None:
+                return True, captured.image
+            if self.finished or not self._running:
+                return False, None
+
+    def has_new_frame(self):
+        """Indica, sem bloquear, se há um frame ainda não consumido."""
+        latest = self._latest
+        return latest is not None and latest.seq > self._last_taken_seq
+
+    def get_latest(self, timeout=None):
+        """
+        Aguarda um frame ainda não consumido e o retorna.
+        Retorna None se o tempo esgotar ou se a fonte tiver terminado sem frames novos.
+        """
+        with self._cond:
+            has_new = lambda: self._latest is not None and self._latest.seq > self._last_taken_seq
+            self._cond.wait_for(lambda: has_new() or self.finished or not self._running, timeout)
+            if not has_new():
+                return None
+            self._last_taken_seq = self._latest.seq
+            self.last_taken = self._latest
+            return self._latest
+
+
+class PipelineStats:
+    """Estatísticas do estágio de inferência: FPS de captura e de inferência, descartes e idade do frame."""
+
+    def __init__(self, grabber, age_smoothing=0.1):
+        self.grabber = grabber
+        self.inference_rate = RateMeter()
+        self.frames_processed = 0
+        self.last_frame_age = 0.0
+        self.avg_frame_age = 0.0
+        self.max_frame_age = 0.0
+        self._age_smoothing = age_smoothing
+
+    def record_processed(self, captured_frame, now=None):
+        """Registra que o frame terminou de ser processado (fim da inferência e pós-processamento)."""
+        now = time.monotonic() if now is None else now
+        age = now - captured_frame.timestamp
+        FRAME_AGE_SECONDS.observe(age)
+        self.inference_rate.tick(now)
+        self.frames_processed += 1
+        self.last_frame_age = age
+        self.max_frame_age = max(self.max_frame_age, age)
+        if self.frames_processed == 1:
+            self.avg_frame_age = age
+        else:
+            self.avg_frame_age += self._age_smoothing * (age - self.avg_frame_age)
+
+    @property
+    def capture_fps(self):
+        return self.grabber.capture_rate.rate()
+
+    @property
+    def inference_fps(self):
+        return self.inference_rate.rate()
+
+    @property
+    def frames_dropped(self):
+        return self.grabber.frames_dropped
+
+    def summary(self):
+        return {
+            'capture_fps': round(self.capture_fps, 2),
+            'inference_fps': round(self.inference_fps, 2),
+            'frames_captured': self.grabber.frames_captured,
+            'frames_processed': self.frames_processed,
+            'frames_dropped': self.frames_dropped,
+            'frame_age_ms': round(self.last_frame_age * 1000, 1),
+            'avg_frame_age_ms': round(self.avg_frame_age * 1000, 1),
+            'max_frame_age_ms': round(self.max_frame_age * 1000, 1),
+        }
@@ -0,0 +1,132 @@
+"""
+Deduplicação dos alertas na ingestão: um evento aberto por módulo em vez de uma linha por mensagem.
+
+O nó LoRa repete o mesmo alerta a cada 500 ms por 10 s e o Pi reenvia o status de cada módulo e um
+keep-alive a cada 5 min. Mensagens com o mesmo nível e descrição do evento aberto do módulo, chegando
+até JANELA_EVENTO depois da anterior, só estendem o evento (ultima_vez, repeticoes). Vira linha nova em
+'alertas' apenas a transição: mudança de status, primeiro alerta do módulo, repetição depois da janela
+ou evento aberto há mais de DURACAO_MAXIMA_EVENTO.
+
+As extensões de eventos já gravados são acumuladas em memória e gravadas no máximo a cada
+INTERVALO_ATUALIZACAO segundos (ou quando o evento é fechado por uma transição). Se a ingestão parar sem
+descarregar, perde-se no máximo esse intervalo de ultima_vez/repeticoes; depois de um reinício o
+primeiro alerta de cada módulo abre um evento novo.
+"""
+import time
+from datetime import timedelta
+
+JANELA_EVENTO = timedelta(seconds=600)  # Maior que o keep-alive do Pi (MQTT_KEEPALIVE_INTERVAL = 300 s)
+INTERVALO_ATUALIZACAO = 30.0            # Frequência máxima de gravação das extensões (segundos)
+# Um módulo saudável repete o status 0 para sempre: o evento é fechado e vira linha nova depois disso,
+# bem antes de API.RETENCAO_ALERTAS_DIAS, para o arquivamento nunca pegar um evento ainda aberto
+DURACAO_MAXIMA_EVENTO = timedelta(days=1)
+
+
+class DeduplicadorAlertas:
+    """
+    Estado dos eventos abertos, indexado pelo nome do módulo. Usado por uma única thread (o gravador):
+    processar() recebe um lote de registros (API.interpretar_payload) e devolve o que gravar.
+    """
+
+    def __init__(self, janela=JANELA_EVENTO, intervalo_atualizacao=INTERVALO_ATUALIZACAO,
+                 duracao_maxima=DURACAO_MAXIMA_EVENTO):
+        self.janela = janela
+        self.intervalo_atualizacao = intervalo_atualizacao
+        self.duracao_maxima = duracao_maxima
+        self._abertos = {}      # nome_modulo -> linha do evento aberto (com ultima_vez e repeticoes)
+        self._alterados = set()  # módulos cujo evento já gravado foi estendido desde a última gravação
+        self._contadas = {}     # nome_modulo -> repetições do evento aberto já levadas ao banco (e aos agregados)
+        self._ultima_atualizacao = None  # Definido no primeiro processar()
+        self.eventos = 0
+        self.repetidos = 0
+
+    def processar(self, registros, agora=None):
+        """
+        Retorna (novos, atualizacoes) para API.gravar_lote: as linhas dos eventos abertos neste lote (já com
+        as repetições do próprio lote) e as extensões de eventos gravados que devem ir ao banco agora.
+        'novos' são os próprios eventos abertos: API.gravar_lote preenche o 'id' de cada um, que identifica
+        o evento nas extensões seguintes. 'agora' (time.monotonic() por padrão) só marca o intervalo de atualização.
+        """
+        if self._ultima_atualizacao is None:
+            self._ultima_atualizacao = time.monotonic() if agora is None else agora
+        novos, atualizacoes, abertos_no_lote = [], [], set()
+        for registro in registros:
+            nome = registro['nome_modulo']
+            evento = self._abertos.get(nome)
+            if (evento is not None and evento['nivel'] == registro['nivel']
+                    and evento['descricao'] == registro['descricao']
+                    and registro['data_hora'] - evento['ultima_vez'] <= self.janela
+                    and registro['data_hora'] - evento['data_hora'] < self.duracao_maxima):
+                evento['ultima_vez'] = max(evento['ultima_vez'], registro['data_hora'])
+                evento['repeticoes'] += 1
+                self.repetidos += 1
+                if nome not in abertos_no_lote:
+                    self._alterados.add(nome)
+                continue
+
+            # Transição: o evento anterior é fechado com o estado final
+            if nome in self._alterados:
+                self._alterados.discard(nome)
+                atualizacoes.append(self._extensao(evento))
+            evento = dict(registro, ultima_vez=registro['data_hora'], repeticoes=1)
+            self._abertos[nome] = evento
+            abertos_no_lote.add(nome)
+            novos.append(evento)
+            self.eventos += 1
+
+        for evento in novos:
+            self._contadas[evento['nome_modulo']] = evento['repeticoes']
+        if self.pendente(agora):
+            atualizacoes.extend(self.descarregar(agora))
+        return novos, atualizacoes
+
+    def pendente(self, agora=None):
+        """True se há extensões a gravar e o intervalo de atualização já passou."""
+        agora = time.monotonic() if agora is None else agora
+        return bool(self._alterados) and agora - self._ultima_atualizacao >= self.intervalo_atualizacao
+
+    def descarregar(self, agora=None):
+        """Todas as extensões pendentes, independentemente do intervalo (ex: ao encerrar a ingestão)."""
+        atualizacoes = [self._extensao(self._abertos[nome]) for nome in self._alterados]
+        self._alterados.clear()
+        self._ultima_atualizacao = time.monotonic() if agora is None else agora
+        return atualizacoes
+
+    def fechar(self, atualizacoes):
+        """
+        Fecha os eventos das extensões que não acharam a linha em 'alertas' (API.gravar_lote), ex: arquivada
+        enquanto aberta: a próxima repetição do módulo abre um evento novo.
+        """
+        for atualizacao in atualizacoes:
+            nome = atualizacao['nome_modulo']
+            evento = self._abertos.get(nome)
+            if evento is not None and evento.get('id') == atualizacao['id']:
+                del self._abertos[nome]
+                self._contadas.pop(nome, None)
+                self._alterados.discard(nome)
+
+    def reiniciar(self):
+        """Esquece os eventos abertos (ex: depois de um lote que falhou: o que estava em memória não foi gravado)."""
+        self._abertos.clear()
+        self._alterados.clear()
+        self._contadas.clear()
+
+    def _extensao(self, evento):
+        nome = evento['nome_modulo']
+        novas = evento['repeticoes'] - self._contadas.get(nome, evento['repeticoes'])
+        self._contadas[nome] = evento['repeticoes']
+        return _atualizacao(evento, novas)
+
+    def metricas(self):
+        return {'eventos_abertos': len(self._abertos), 'eventos': self.eventos, 'repetidos': self.repetidos,
+                'atualizacoes_pendentes': len(self._alterados)}
+
+
+def _atualizacao(evento, repeticoes_novas):
+    """
+    Extensão de um evento gravado, identificado pelo id da linha em 'alertas'. 'repeticoes_novas' são as
+    repetições desde a gravação anterior do evento, que API.gravar_lote soma aos agregados por hora e por dia.
+    """
+    return {'id': evento.get('id'), 'nome_modulo': evento['nome_modulo'], 'data_hora': evento['data_hora'], 'nivel': evento['nivel'],
+            'descricao': evento['descricao'], 'latitude': evento['latitude'], 'longitude': evento['longitude'],
+            'ultima_vez': evento['ultima_vez'], 'repeticoes': evento['repeticoes'], 'repeticoes_novas': repeticoes_novas}
@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+from functools import lru_cache
+
+# Rótulos tratados como fundo, além da classe 0
+BACKGROUND_LABELS = ('background', 'uncertain')
+
+# Margens padrão descartadas nas bordas da grade (apenas para o modelo 1)
+MARGIN_HORIZONTAL = 0.05
+MARGIN_VERTICAL = 0.05
+
+
+@lru_cache(maxsize=32)
+def _build_masks(grid_h, grid_w, num_classes, labels, apply_margin, margin_horizontal, margin_vertical):
+    """
+    Pré-calcula, uma única vez por formato de grade e modelo:
+    - a máscara de células dentro das margens (grid_h x grid_w);
+    - a tabela de classes que contam como detecção (num_classes).
+    """
+    region_mask = np.ones((grid_h, grid_w), dtype=bool)
+    if apply_margin:
+        margin_x_start, margin_x_end = int(grid_w * margin_horizontal), int(grid_w * (1 - margin_horizontal))
+        margin_y_start, margin_y_end = int(grid_h * margin_vertical), int(grid_h * (1 - margin_vertical))
+        region_mask[:] = False
+        region_mask[margin_y_start:margin_y_end, margin_x_start:margin_x_end] = True
+
+    # Classes fora da lista de rótulos, a classe 0 e os rótulos de fundo nunca contam
+    class_mask = np.zeros(num_classes, dtype=bool)
+    for class_id, label in enumerate(labels[:num_classes]):
+        class_mask[class_id] = class_id != 0 and label.lower() not in BACKGROUND_LABELS
+
+    region_mask.setflags(write=False)
+    class_mask.setflags(write=False)
+    return region_mask, class_mask
+
+
+def detection_mask(output_grid, labels, threshold, model_index=0,
+                   margin_horizontal=MARGIN_HORIZONTAL, margin_vertical=MARGIN_VERTICAL):
+    """
+    Máscara (grid_h x grid_w) das células da grade FOMO cuja classe vencedora não é fundo e cuja
+    confiança supera o limiar. As margens da imagem são ignoradas apenas para o modelo 1 (model_index == 0).
+    """
+    squeezed_grid = np.squeeze(output_grid)
+    grid_h, grid_w, num_classes = squeezed_grid.shape
+    region_mask, class_mask = _build_masks(grid_h, grid_w, num_classes, tuple(labels), model_index == 0,
+                                           margin_horizontal, margin_vertical)
+
+    class_ids = np.argmax(squeezed_grid, axis=-1)
+    confidences = np.max(squeezed_grid, axis=-1)
+    return class_mask[class_ids] & (confidences > threshold) & region_mask
+
+
+def count_detections(output_grid, labels, threshold, model_index=0,
+                     margin_horizontal=MARGIN_HORIZONTAL, margin_vertical=MARGIN_VERTICAL):
+    """Conta as células marcadas por detection_mask."""
+    return int(np.count_nonzero(detection_mask(output_grid, labels, threshold, model_index,
+                                               margin_horizontal, margin_vertical)))
+
+
+def flagged_regions(mask, frame_width, frame_height, margin_cells=1, max_regions=4):
+    """
+    Converte as células marcadas na grade em regiões (x0, y0, x1, y1) do frame em resolução original.
+    Células vizinhas formam uma só região; cada região ganha 'margin_cells' células de contexto em volta
+    e é ajustada para um quadrado (a entrada dos modelos é quadrada). As maiores regiões vêm primeiro.
+    """
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+    grid_h, grid_w = mask.shape
+    cell_w, cell_h = frame_width / grid_w, frame_height / grid_h
+    largest = sorted(range(1, count), key=lambda label: stats[label, cv2.CC_STAT_AREA], reverse=True)
+
+    regions = []
+    for label in largest[:max_regions]:
+        x, y, w, h = stats[label, :4]
+        x0, x1 = (x - margin_cells) * cell_w, (x + w + margin_cells) * cell_w
+        y0, y1 = (y - margin_cells) * cell_h, (y + h + margin_cells) * cell_h
+        side = min(max(x1 - x0, y1 - y0), frame_width, frame_height)
+        left = min(max((x0 + x1 - side) / 2, 0), frame_width - side)
+        top = min(max((y0 + y1 - side) / 2, 0), frame_height - side)
+        regions.append((int(left), int(top), int(left + side), int(top + side)))
+    return regions
@@ -0,0 +1,134 @@
+"""
+Geohash e distâncias para as consultas espaciais do site, sem dependências.
+
+O geohash de cada módulo é gravado pela ingestão (API.gravar_lote) com PRECISAO_GEOHASH caracteres.
+Cada caractere a mais divide a célula em 32; todos os pontos de uma célula têm o mesmo prefixo, então
+"módulos dentro da célula X" é uma faixa no índice da coluna (X <= geohash < proxima_celula(X)) e o
+agrupamento em clusters é um GROUP BY no prefixo.
+"""
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_INDICE_BASE32 = {caractere: indice for indice, caractere in enumerate(BASE32)}
+
+PRECISAO_GEOHASH = 9        # ~4,8 m x 4,8 m no equador
+RAIO_TERRA_KM = 6371.0088
+KM_POR_GRAU_LAT = 111.32
+
+
+def codificar_geohash(latitude, longitude, precisao=PRECISAO_GEOHASH):
+    """Geohash de (latitude, longitude) com 'precisao' caracteres."""
+    lat_min, lat_max, lon_min, lon_max = -90.0, 90.0, -180.0, 180.0
+    caracteres, bits, valor, longitude_agora = [], 0, 0, True
+    while len(caracteres) < precisao:
+        if longitude_agora:
+            meio = (lon_min + lon_max) / 2
+            if longitude >= meio:
+                valor, lon_min = (valor << 1) | 1, meio
+            else:
+                valor, lon_max = valor << 1, meio
+        else:
+            meio = (lat_min + lat_max) / 2
+            if latitude >= meio:
+                valor, lat_min = (valor << 1) | 1, meio
+            else:
+                valor, lat_max = valor << 1, meio
+        longitude_agora = not longitude_agora
+        bits += 1
+        if bits == 5:
+            caracteres.append(BASE32[valor])
+            bits, valor = 0, 0
+    return ''.join(caracteres)
+
+
+def caixa_geohash(geohash):
+    """(sul, oeste, norte, leste) da célula."""
+    lat_min, lat_max, lon_min, lon_max = -90.0, 90.0, -180.0, 180.0
+    longitude_agora = True
+    for caractere in geohash:
+        valor = _INDICE_BASE32[caractere]
+        for deslocamento in range(4, -1, -1):
+            bit = (valor >> deslocamento) & 1
+            if longitude_agora:
+                meio = (lon_min + lon_max) / 2
+                lon_min, lon_max = (meio, lon_max) if bit else (lon_min, meio)
+            else:
+                meio = (lat_min + lat_max) / 2
+                lat_min, lat_max = (meio, lat_max) if bit else (lat_min, meio)
+            longitude_agora = not longitude_agora
+    return lat_min, lon_min, lat_max, lon_max
+
+
+def tamanho_celula(precisao):
+    """(altura, largura) em graus de uma célula com 'precisao' caracteres."""
+    bits = 5 * precisao
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def proxima_celula(prefixo):
+    """Menor geohash maior que todos os que começam com 'prefixo' (None se não houver)."""
+    while prefixo and prefixo[-1] == BASE32[-1]:
+        prefixo = prefixo[:-1]
+    if not prefixo:
+        return None
+    return prefixo[:-1] + BASE32[_INDICE_BASE32[prefixo[-1]] + 1]
+
+
+def cobrir_caixa(sul, oeste, norte, leste, precisao):
+    """Células de 'precisao' caracteres que cobrem a caixa (sem atravessar o antimeridiano)."""
+    sul, norte = max(sul, -90.0), min(norte, 90.0)
+    oeste, leste = max(oeste, -180.0), min(leste, 180.0)
+    altura, largura = tamanho_celula(precisao)
+    celulas = set()
+    latitude = sul
+    while True:
+        longitude = oeste
+        while True:
+            celulas.add(codificar_geohash(min(latitude, norte), min(longitude, leste), precisao))
+            if longitude >= leste:
+                break
+            longitude += largura
+        if latitude >= norte:
+            break
+        latitude += altura
+    return sorted(celulas)
+
+
+def cobertura(sul, oeste, norte, leste, maximo_celulas=16, precisao_maxima=PRECISAO_GEOHASH):
+    """Cobertura da caixa com a maior precisão que usa no máximo 'maximo_celulas' células."""
+    altura_caixa, largura_caixa = max(norte - sul, 0.0), max(leste - oeste, 0.0)
+    for precisao in range(precisao_maxima, 1, -1):
+        altura, largura = tamanho_celula(precisao)
+        if (altura_caixa / altura + 1) * (largura_caixa / largura + 1) > maximo_celulas:
+            continue  # Mesmo alinhada à grade, a caixa ocupa células demais
+        celulas = cobrir_caixa(sul, oeste, norte, leste, precisao)
+        if len(celulas) <= maximo_celulas:
+            return celulas
+    return cobrir_caixa(sul, oeste, norte, leste, 1)
+
+
+def precisao_para_zoom(zoom, pixels_por_cluster=60, precisao_maxima=PRECISAO_GEOHASH):
+    """
+    Precisão do geohash cujas células têm ~'pixels_por_cluster' pixels de largura no nível de zoom
+    do mapa (Leaflet/OSM: 256 px por tile, 360 / 2^zoom graus por tile).
+    """
+    graus_por_cluster = pixels_por_cluster * 360.0 / (256 * 2 ** zoom)
+    precisao = 1
+    while precisao < precisao_maxima and tamanho_celula(precisao + 1)[1] >= graus_por_cluster:
+        precisao += 1
+    return precisao
+
+
+def caixa_do_raio(latitude, longitude, raio_km):
+    """(sul, oeste, norte, leste) que contém o círculo de 'raio_km' em volta do ponto."""
+    delta_lat = raio_km / KM_POR_GRAU_LAT
+    delta_lon = raio_km / (KM_POR_GRAU_LAT * max(math.cos(math.radians(latitude)), 1e-6))
+    return latitude - delta_lat, longitude - delta_lon, latitude + delta_lat, longitude + delta_lon
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distância pela fórmula de haversine."""
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    delta_fi, delta_lambda = fi2 - fi1, math.radians(lon2 - lon1)
+    a = math.sin(delta_fi / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(delta_lambda / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(math.sqrt(min(1.0, a)))
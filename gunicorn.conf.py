@@ -0,0 +1,41 @@
+"""
+Configuração do gunicorn para servir o site3 em produção com vários processos:
+
+    gunicorn -c gunicorn.conf.py 'site3:criar_app()'
+
+Cada worker é um processo com sua própria engine e pool de conexões (API.obter_engine), criados depois
+do fork, e atende várias requisições ao mesmo tempo em threads (uma sessão por requisição). O cache
+de respostas e o monitor do SSE também são por worker; a versão dos dados vem do banco, então todos
+enxergam os mesmos lotes gravados. Variáveis de ambiente: SITE_BIND, SITE_WORKERS, SITE_THREADS, SITE_MAX_SSE.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('SITE_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('SITE_WORKERS', multiprocessing.cpu_count()))
+# Cada cliente SSE (/eventos) ocupa uma thread enquanto estiver conectado. Para não prender todas as
+# threads, o site3 aceita no máximo SITE_MAX_SSE clientes SSE por worker (padrão: metade de SITE_THREADS)
+# e recusa os demais com 503, que passam a consultar /modulos.json periodicamente. Dashboards ao vivo
+# simultâneos: até workers x SITE_MAX_SSE.
+worker_class = 'gthread'
+threads = int(os.environ.get('SITE_THREADS', '8'))
+# O app é importado uma vez no processo mestre e os workers herdam o código já carregado
+preload_app = True
+# Conexões SSE ficam abertas indefinidamente; o keep-alive delas é enviado a cada 15 s
+timeout = 60
+graceful_timeout = 10
+keepalive = 5
+accesslog = os.environ.get('SITE_ACCESSLOG')
+
+# A ingestão embutida (INGESTAO_EMBUTIDA=1) assina o MQTT: com vários workers cada alerta seria
+# gravado várias vezes. Para escalar, rode API.py à parte e deixe o site só com as leituras.
+if os.environ.get('INGESTAO_EMBUTIDA', '0') == '1' and workers > 1:
+    print(f"INGESTAO_EMBUTIDA=1: usando 1 worker em vez de {workers}.")
+    workers = 1
+
+
+def post_worker_init(worker):
+    # Threads não sobrevivem ao fork: a ingestão embutida é iniciada dentro do worker
+    if os.environ.get('INGESTAO_EMBUTIDA', '0') == '1':
+        import site3
+        site3.iniciar_ingestao_embutida()
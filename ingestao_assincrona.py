@@ -0,0 +1,384 @@
+"""
+Ingestão dos alertas MQTT em asyncio.
+
+No modo original (API.main) o loop do paho e a gravação dividem threads do mesmo processo;
+aqui tudo roda em um único loop asyncio: o cliente MQTT (aiomqtt) recebe as mensagens e as
+coloca em uma fila limitada, e uma tarefa separada grava os lotes com o driver assíncrono do
+banco (asyncpg / aiosqlite) usando um pool de conexões. Um commit lento nunca atrasa a leitura
+do socket MQTT; se a gravação não acompanhar, a fila enche e a política escolhida decide o que fazer.
+
+Estatísticas (profundidade da fila, descartes, atraso entre recebimento e commit) são
+impressas periodicamente e servidas em JSON em http://<host>:PORTA_ESTATISTICAS/estatisticas.json;
+na mesma porta, /metrics traz as métricas no formato do Prometheus (metricas.py).
+
+Uso:
+    python ingestao_assincrona.py
+    python ingestao_assincrona.py --tamanho-fila 20000 --porta-estatisticas 8081
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import aiomqtt
+import numpy as np
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import API
+import metricas
+from deduplicacao import DeduplicadorAlertas
+
+# --- Configurações da ingestão assíncrona ---
+# O que fazer quando a fila de gravação está cheia:
+# - 'bloquear': o recebimento espera espaço na fila (as mensagens se acumulam na fila interna do
+#   aiomqtt, também limitada ao tamanho da fila; acima disso o próprio aiomqtt descarta e isso é contado);
+# - 'descartar_novos': a mensagem que acabou de chegar é descartada;
+# - 'descartar_antigos': a mais antiga da fila é descartada.
+# As duas políticas de descarte não olham o conteúdo: a mensagem perdida pode ser o único Crítico de
+# outro módulo. Por isso o padrão é 'bloquear', que só perde mensagens quando a fila do aiomqtt também enche.
+POLITICAS_FILA = ('bloquear', 'descartar_novos', 'descartar_antigos')
+POLITICA_FILA = 'bloquear'
+# Com a fila acumulada o lote cresce até este limite: um banco lento grava mais por commit
+TAMANHO_MAXIMO_LOTE = 5000
+INTERVALO_ESTATISTICAS = 10.0   # Frequência da linha de estatísticas no log (segundos)
+PORTA_ESTATISTICAS = 8081        # None desativa o endpoint de estatísticas
+INTERVALO_RECONEXAO = 5.0
+ATRASOS_GUARDADOS = 10000        # Amostras de atraso usadas nos percentis
+
+# Driver assíncrono equivalente a cada banco; ASYNC_DATABASE_URL permite informar a URL diretamente
+DRIVERS_ASSINCRONOS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def url_assincrona(url):
+    """Troca o driver da URL do SQLAlchemy pelo equivalente assíncrono (ex: postgresql:// -> postgresql+asyncpg://)."""
+    esquema, resto = url.split('://', 1)
+    banco = esquema.split('+', 1)[0]
+    return f"{DRIVERS_ASSINCRONOS.get(banco, esquema)}://{resto}"
+
+
+class _ContadorFilaCheia(logging.Filter):
+    """Conta (e silencia) os avisos do aiomqtt de mensagem descartada por fila interna cheia."""
+
+    def __init__(self):
+        super().__init__()
+        self.descartes = 0
+
+    def filter(self, record):
+        if record.getMessage().startswith('Message queue is full'):
+            self.descartes += 1
+            return False
+        return True
+
+
+class FilaIngestao:
+    """Fila limitada entre o recebimento MQTT e a gravação, com a política de POLITICAS_FILA para quando enche."""
+
+    def __init__(self, tamanho=API.TAMANHO_MAXIMO_FILA, politica=POLITICA_FILA):
+        if politica not in POLITICAS_FILA:
+            raise ValueError(f"Política de fila desconhecida: {politica!r} (use uma de {', '.join(POLITICAS_FILA)})")
+        self.tamanho = tamanho
+        self.politica = politica
+        self._fila = asyncio.Queue(maxsize=tamanho)
+        self.descartados = 0
+        self.maior_profundidade = 0
+        # Quem monta o lote espera por este evento em vez de acordar a cada mensagem
+        self._lote_completo = asyncio.Event()
+        self._faltam = 0
+
+    def __len__(self):
+        return self._fila.qsize()
+
+    async def colocar(self, item):
+        """Coloca um item na fila. Retorna False se ele (ou outro, mais antigo) tiver sido descartado."""
+        descartou = False
+        if self.politica == 'bloquear':
+            await self._fila.put(item)
+        else:
+            if self._fila.full():
+                self.descartados += 1
+                descartou = True
+                if self.politica == 'descartar_novos':
+                    return False
+                self._fila.get_nowait()
+            self._fila.put_nowait(item)
+        profundidade = self._fila.qsize()
+        self.maior_profundidade = max(self.maior_profundidade, profundidade)
+        if self._faltam and profundidade >= self._faltam:
+            self._lote_completo.set()
+        return not descartou
+
+    async def lote(self, tamanho_lote, latencia_maxima, espera=0.5):
+        """
+        Retira até 'tamanho_lote' itens: espera o primeiro por até 'espera' segundos (retorna [] se não vier)
+        e depois junta os que chegarem até a latência máxima do lote.
+        """
+        try:
+            lote = [await asyncio.wait_for(self._fila.get(), espera)]
+        except asyncio.TimeoutError:
+            return []
+        prazo = time.monotonic() + latencia_maxima
+        while True:
+            while len(lote) < tamanho_lote and not self._fila.empty():
+                lote.append(self._fila.get_nowait())
+            restante = prazo - time.monotonic()
+            if len(lote) >= tamanho_lote or restante <= 0:
+                return lote
+            self._faltam = tamanho_lote - len(lote)
+            self._lote_completo.clear()
+            try:
+                await asyncio.wait_for(self._lote_completo.wait(), restante)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._faltam = 0
+
+
+class IngestaoAssincrona:
+    """
+    Serviço de ingestão: recebe do broker, enfileira e grava em lote (API.gravar_lote) pelo driver assíncrono.
+    Cada função em 'ouvintes' é chamada com o lote logo após o commit, como no GravadorAlertas.
+    """
+
+    def __init__(self, broker_host=API.BROKER_HOST, broker_port=API.BROKER_PORT, topico=API.TOPICO_DADOS,
+                 database_url=None, tamanho_lote=API.TAMANHO_LOTE, latencia_maxima=API.LATENCIA_MAXIMA_LOTE,
+                 tamanho_fila=API.TAMANHO_MAXIMO_FILA, politica=POLITICA_FILA,
+                 porta_estatisticas=PORTA_ESTATISTICAS, ouvintes=None, deduplicar=API.DEDUPLICAR_ALERTAS):
+        self.broker_host = broker_host
+        self.broker_port = broker_port
+        self.topico = topico
+        self.database_url = database_url or os.environ.get('ASYNC_DATABASE_URL') or url_assincrona(API.DATABASE_URL)
+        self.tamanho_lote = tamanho_lote
+        self.latencia_maxima = latencia_maxima
+        self.tamanho_fila = tamanho_fila
+        self.politica = politica
+        self.porta_estatisticas = porta_estatisticas
+        self.ouvintes = list(ouvintes or [])
+        self.deduplicador = DeduplicadorAlertas() if deduplicar else None
+        self.fila = None
+        self.engine = None
+        self._Session = None
+        self._parar = None
+        self.conectado = False
+        self._descartes_mqtt = _ContadorFilaCheia()
+        self._logger_mqtt = logging.getLogger(f"{__name__}.mqtt.{id(self)}")
+        self._logger_mqtt.addFilter(self._descartes_mqtt)
+
+        self.recebidas = 0
+        self.invalidas = 0
+        self.registros_gravados = 0
+        self.registros_repetidos = 0
+        self.lotes_gravados = 0
+        self.lotes_com_erro = 0
+        self.alertas_arquivados = 0
+        self.metricas = API.metricas_ingestao('asyncio')
+        self._atrasos = deque(maxlen=ATRASOS_GUARDADOS)
+        self._inicio = time.monotonic()
+        self._ultimo_arquivamento = time.monotonic()
+
+    def parar(self):
+        """Pede o encerramento; o que já estiver na fila ainda é gravado. Deve ser chamado no loop do serviço."""
+        if self._parar:
+            self._parar.set()
+
+    async def executar(self):
+        """Executa o serviço até parar() ser chamado."""
+        # Criação das tabelas e reconstruções usam o caminho síncrono, uma única vez
+        await asyncio.to_thread(API.preparar_banco)
+        self.engine = create_async_engine(self.database_url, pool_pre_ping=True)
+        self._Session = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.fila = FilaIngestao(self.tamanho_fila, self.politica)
+        self._parar = asyncio.Event()
+        self._inicio = time.monotonic()
+
+        servidor = None
+        if self.porta_estatisticas is not None:
+            servidor = await asyncio.start_server(self._atender_estatisticas, '0.0.0.0', self.porta_estatisticas)
+        recebimento = asyncio.create_task(self._receber())
+        gravacao = asyncio.create_task(self._gravar_continuamente())
+        log = asyncio.create_task(self._registrar_estatisticas())
+        try:
+            await self._parar.wait()
+        finally:
+            recebimento.cancel()
+            log.cancel()
+            self._parar.set()
+            await gravacao
+            if servidor:
+                servidor.close()
+            await self.engine.dispose()
+
+    async def _receber(self):
+        while True:
+            try:
+                async with aiomqtt.Client(self.broker_host, self.broker_port, keepalive=60,
+                                          max_queued_incoming_messages=self.tamanho_fila,
+                                          logger=self._logger_mqtt) as client:
+                    await client.subscribe(self.topico, qos=1)
+                    self.conectado = True
+                    print("Conectado ao broker MQTT com sucesso! (ingestão assíncrona)")
+                    # O recebimento só enfileira; a interpretação é feita pela tarefa de gravação
+                    async for msg in client.messages:
+                        self.recebidas += 1
+                        self.metricas['mensagens'].inc()
+                        if not await self.fila.colocar((time.monotonic(), datetime.now(), msg.payload)):
+                            self.metricas['descartados'].inc()
+            except aiomqtt.MqttError as e:
+                self.conectado = False
+                print(f"Sem conexão com o broker MQTT ({e}); nova tentativa em {INTERVALO_RECONEXAO:.0f}s.")
+                await asyncio.sleep(INTERVALO_RECONEXAO)
+
+    async def _gravar_continuamente(self):
+        while not (self._parar.is_set() and len(self.fila) == 0):
+            if time.monotonic() - self._ultimo_arquivamento >= API.INTERVALO_ARQUIVAMENTO:
+                await self._arquivar()
+            tamanho = min(max(self.tamanho_lote, len(self.fila)), TAMANHO_MAXIMO_LOTE)
+            lote = await self.fila.lote(tamanho, self.latencia_maxima)
+            if lote or (self.deduplicador and self.deduplicador.pendente()):
+                await self._gravar(lote)
+        if self.deduplicador:
+            await self._gravar([], descarregar=True)
+
+    def _interpretar(self, lote):
+        """Converte os payloads do lote em registros, com a data e hora em que cada mensagem chegou."""
+        registros = []
+        for _, recebido_em, payload in lote:
+            try:
+                registros_mensagem = API.interpretar_payload(payload)
+            except Exception as e:
+                self.invalidas += 1
+                print(f"Ocorreu um erro ao processar a mensagem: {e}")
+                continue
+            for registro in registros_mensagem:
+                registro['data_hora'] = recebido_em
+            registros.extend(registros_mensagem)
+        return registros
+
+    async def _gravar(self, lote, descarregar=False):
+        recebidos = self._interpretar(lote)
+        registros, atualizacoes = recebidos, []
+        if self.deduplicador:
+            # Repetições do mesmo status só estendem o evento aberto do módulo (deduplicacao.py)
+            registros, atualizacoes = self.deduplicador.processar(recebidos)
+            if descarregar:
+                atualizacoes += self.deduplicador.descarregar()
+        if not (registros or atualizacoes):
+            self.registros_gravados += len(recebidos)
+            self.registros_repetidos += len(recebidos)
+            self.metricas['gravados'].inc(len(recebidos))
+            self.metricas['repetidos'].inc(len(recebidos))
+            return
+        inicio = time.perf_counter()
+        async with self._Session() as session:
+            try:
+                perdidos = await session.run_sync(API.gravar_lote, registros, atualizacoes)
+                await session.commit()
+                if perdidos:
+                    self.deduplicador.fechar(perdidos)
+            except Exception as e:
+                await session.rollback()
+                if self.deduplicador:
+                    self.deduplicador.reiniciar()  # Os eventos em memória não chegaram ao banco
+                self.lotes_com_erro += 1
+                self.metricas['lotes_com_erro'].inc()
+                print(f"Ocorreu um erro ao gravar o lote de {len(recebidos)} alerta(s): {e}")
+                return
+
+        repetidos = len(recebidos) - len(registros)
+        self.metricas['commit'].observe(time.perf_counter() - inicio)
+        self.metricas['gravados'].inc(len(recebidos))
+        self.metricas['repetidos'].inc(repetidos)
+        self.metricas['fila'].set(len(self.fila))
+        agora = time.monotonic()
+        self._atrasos.extend(agora - recebido_em for recebido_em, _, _ in lote)
+        self.registros_gravados += len(recebidos)
+        self.registros_repetidos += repetidos
+        self.lotes_gravados += 1
+        for ouvinte in self.ouvintes:
+            try:
+                ouvinte(registros + atualizacoes)
+            except Exception as e:
+                print(f"Erro em um ouvinte da gravação: {e}")
+
+    async def _arquivar(self):
+        self._ultimo_arquivamento = time.monotonic()
+        antes_de = datetime.now() - timedelta(days=API.RETENCAO_ALERTAS_DIAS)
+        async with self._Session() as session:
+            try:
+                movidos = await session.run_sync(API.arquivar_alertas, antes_de)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                print(f"Ocorreu um erro ao arquivar alertas antigos: {e}")
+                return
+        self.alertas_arquivados += movidos
+        if movidos == API.LOTE_ARQUIVAMENTO:
+            self._ultimo_arquivamento -= API.INTERVALO_ARQUIVAMENTO
+
+    def estatisticas(self):
+        decorrido = time.monotonic() - self._inicio
+        atrasos = np.fromiter(self._atrasos, dtype=float) * 1000
+        percentil = lambda p: round(float(np.percentile(atrasos, p)), 1) if len(atrasos) else 0.0
+        return {
+            'conectado': self.conectado,
+            'politica': self.politica,
+            'fila': len(self.fila) if self.fila is not None else 0,
+            'maior_fila': self.fila.maior_profundidade if self.fila is not None else 0,
+            'recebidas': self.recebidas,
+            'invalidas': self.invalidas,
+            'descartadas': self.fila.descartados if self.fila is not None else 0,
+            'descartadas_cliente_mqtt': self._descartes_mqtt.descartes,
+            'gravadas': self.registros_gravados,
+            'repetidas': self.registros_repetidos,
+            'lotes': self.lotes_gravados,
+            'lotes_com_erro': self.lotes_com_erro,
+            'gravadas_por_segundo': round(self.registros_gravados / decorrido, 1) if decorrido > 0 else 0.0,
+            'atraso_ms': {'p50': percentil(50), 'p95': percentil(95), 'max': percentil(100)},
+        }
+
+    async def _registrar_estatisticas(self):
+        while True:
+            await asyncio.sleep(INTERVALO_ESTATISTICAS)
+            e = self.estatisticas()
+            print(f"Ingestão: fila {e['fila']}/{self.tamanho_fila} (máx {e['maior_fila']}) | recebidas {e['recebidas']} "
+                  f"| gravadas {e['gravadas']} | descartadas {e['descartadas'] + e['descartadas_cliente_mqtt']} "
+                  f"| atraso p50 {e['atraso_ms']['p50']} ms, p95 {e['atraso_ms']['p95']} ms")
+
+    async def _atender_estatisticas(self, reader, writer):
+        """Endpoint HTTP mínimo: GET /metrics recebe as métricas do Prometheus; qualquer outro GET, o JSON de estatisticas()."""
+        try:
+            requisicao = await reader.readuntil(b'\r\n\r\n')
+            if requisicao.split(b' ', 2)[1:2] == [b'/metrics']:
+                corpo, tipo = metricas.REGISTRY.render().encode('utf-8'), metricas.CONTENT_TYPE.encode()
+            else:
+                corpo, tipo = json.dumps(self.estatisticas()).encode('utf-8'), b'application/json'
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: %s\r\n"
+                         b"Content-Length: %d\r\nConnection: close\r\n\r\n" % (tipo, len(corpo)) + corpo)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--politica', choices=POLITICAS_FILA, default=POLITICA_FILA)
+    parser.add_argument('--tamanho-fila', type=int, default=API.TAMANHO_MAXIMO_FILA)
+    parser.add_argument('--porta-estatisticas', type=int, default=PORTA_ESTATISTICAS)
+    args = parser.parse_args()
+
+    ingestao = IngestaoAssincrona(tamanho_fila=args.tamanho_fila, politica=args.politica,
+                                  porta_estatisticas=args.porta_estatisticas)
+    print("Aguardando alertas da IA...")
+    try:
+        asyncio.run(ingestao.executar())
+    except KeyboardInterrupt:
+        print("Interrompido pelo usuário.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Inicialização do Pi com etapas em paralelo e registro do tempo até a primeira inferência.
+
+Depois de religar a caixa em campo, o que importa é quanto tempo passa até o primeiro frame ser
+analisado. Carregar os modelos e abrir a câmera (conexão RTSP) são independentes e rodam ao mesmo tempo
+(run_concurrently); os módulos seriais são registrados em segundo plano pela thread do SerialReader.
+StartupTimeline guarda o instante de cada etapa contado do início do processo, incluindo as importações.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metricas
+
+TIME_TO_FIRST_INFERENCE = metricas.gauge('firewatcher_time_to_first_inference_seconds',
+                                         "Segundos entre o início do processo e o primeiro frame analisado")
+
+_IMPORTED_AT = time.monotonic()
+
+
+def process_uptime():
+    """Segundos desde o início do processo (de /proc no Linux; senão, desde a importação deste módulo)."""
+    try:
+        with open('/proc/self/stat') as stat_file:
+            # O nome do processo (campo 2) pode ter espaços: os campos seguintes começam depois do ')'
+            fields = stat_file.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as uptime_file:
+            system_uptime = float(uptime_file.read().split()[0])
+        return system_uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _IMPORTED_AT
+
+
+class StartupTimeline:
+    """Instantes (segundos desde o início do processo) em que cada etapa da inicialização terminou."""
+
+    def __init__(self):
+        self.marks = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        elapsed = process_uptime()
+        with self._lock:
+            self.marks.setdefault(name, round(elapsed, 3))
+        return elapsed
+
+    def timed(self, name, function, *args, **kwargs):
+        """Executa function(*args, **kwargs) e marca 'name' quando terminar."""
+        result = function(*args, **kwargs)
+        self.mark(name)
+        return result
+
+    def first_inference(self):
+        """Marca o primeiro frame analisado e publica a métrica. Retorna os segundos desde o início do processo."""
+        if 'first_inference' not in self.marks:
+            TIME_TO_FIRST_INFERENCE.set(self.mark('first_inference'))
+        return self.marks['first_inference']
+
+    def summary(self):
+        with self._lock:
+            return dict(self.marks)
+
+
+def run_concurrently(**tasks):
+    """
+    Executa cada tarefa (função sem argumentos) em uma thread e espera todas terminarem.
+    Retorna {nome: resultado}; se alguma falhar, a exceção é levantada depois que todas terminarem.
+    """
+    with ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="inicializacao") as executor:
+        futures = {name: executor.submit(task) for name, task in tasks.items()}
+    return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,240 @@
+"""
+Leitura da serial do gateway LoRa em uma thread própria.
+
+A thread lê tudo o que estiver disponível na porta (não uma linha por frame), separa as linhas,
+responde PING com ACK_PI na hora e atualiza o ModuleRegistry, que guarda o último registro de
+cada módulo requerido com o instante e a taxa de atualização. O laço de detecção só lê o registro.
+
+O enquadramento (feed) e o tratamento das linhas (handle_line) não dependem da porta, então o
+replay alimenta o mesmo código com linhas falsas e benchmarks/bench_serial.py o testa com um pty.
+"""
+import threading
+import time
+
+import metricas
+import telemetria
+from captura import RateMeter
+from configuracao import SERIAL_PORT, BAUD_RATE, REQUIRED_MODULES
+
+MAX_LINE_LENGTH = 1024  # Sem '\n' por mais que isso, o buffer é descartado (ruído na linha)
+
+SERIAL_LINES = {kind: metricas.counter('firewatcher_serial_lines_total', "Linhas lidas da serial, por tipo", kind=kind)
+                for kind in ('module', 'command', 'unrecognized')}
+
+
+def parse_serial_line(serial_line, required_modules=REQUIRED_MODULES):
+    """
+    Interpreta uma linha da serial. Retorna ('command', None, None) para PING,
+    ('module', 'Modulo_A', TelemetryRecord) para um módulo requerido (binário '#<hex>' ou texto
+    'Modulo_A,lat,lon') ou (None, None, None) se a linha não for reconhecida.
+    """
+    if "PING" in serial_line:
+        return 'command', None, None
+
+    # Registro binário repassado pelo gateway LoRa como '#<hex>' (ver telemetria.py)
+    if serial_line.startswith(telemetria.SERIAL_PREFIX):
+        record = telemetria.decode_serial(serial_line)
+        module_id = f"Modulo_{telemetria.module_letter(record.module_id)}"
+        if module_id in required_modules:
+            return 'module', module_id, record
+        return None, None, None
+
+    # Formato texto antigo: 'Modulo_A,lat,lon'
+    parts = serial_line.replace('(', '').replace(')', '').replace('"', '').strip().split(',')
+    if len(parts) == 3:
+        module_id = parts[0].strip()
+        if module_id in required_modules:
+            lat, lon = float(parts[1]), float(parts[2])
+            return 'module', module_id, telemetria.TelemetryRecord(telemetria.module_id_from_name(module_id), lat, lon)
+    return None, None, None
+
+
+class ModuleRegistry:
+    """Último registro de cada módulo, com instante e taxa de atualização. Seguro entre threads."""
+
+    def __init__(self):
+        self._records = {}
+        self._first_seen = {}
+        self._last_seen = {}
+        self._updates = {}
+        self._rates = {}
+        self._cond = threading.Condition()
+
+    def update(self, module_id, record, now=None):
+        """Guarda o registro. Retorna True se for a primeira vez que o módulo aparece."""
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            first = module_id not in self._records
+            if first:
+                self._first_seen[module_id] = now
+                self._updates[module_id] = 0
+                self._rates[module_id] = RateMeter(window_seconds=30.0)
+            self._records[module_id] = record
+            self._last_seen[module_id] = now
+            self._updates[module_id] += 1
+            self._rates[module_id].tick(now)
+            self._cond.notify_all()
+        return first
+
+    def records(self):
+        """Cópia de {'Modulo_A': TelemetryRecord}."""
+        with self._cond:
+            return dict(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, module_id):
+        return module_id in self._records
+
+    def missing(self, required_modules):
+        with self._cond:
+            return [module_id for module_id in required_modules if module_id not in self._records]
+
+    def wait_for(self, required_modules, timeout=None):
+        """Espera até todos os módulos requeridos terem chegado. Retorna False se o tempo esgotar."""
+        with self._cond:
+            return self._cond.wait_for(lambda: all(module_id in self._records for module_id in required_modules),
+                                       timeout)
+
+    def summary(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            return {module_id: {
+                'lat': record.lat,
+                'lon': record.lon,
+                'updates': self._updates[module_id],
+                'last_seen_s': round(now - self._last_seen[module_id], 3),
+                'rate_per_s': round(self._rates[module_id].rate(now), 2),
+            } for module_id, record in self._records.items()}
+
+
+class SerialReader:
+    """
+    Thread que lê a porta serial, separa as linhas e atualiza 'registry'. A porta é aberta com
+    timeout curto e reaberta a cada 'reconnect_delay' segundos se cair ou não existir.
+    """
+
+    def __init__(self, port=SERIAL_PORT, baud_rate=BAUD_RATE, registry=None, required_modules=REQUIRED_MODULES,
+                 reconnect_delay=5.0, read_timeout=0.1, verbose=True):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.registry = registry if registry is not None else ModuleRegistry()
+        self.required_modules = list(required_modules)
+        self.reconnect_delay = reconnect_delay
+        self.read_timeout = read_timeout
+        self.verbose = verbose
+        self.serial = None
+        self._buffer = bytearray()
+        self._write_lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self.lines = 0
+        self.commands = 0
+        self.unrecognized = 0
+        self.bytes_read = 0
+        self.overflows = 0
+
+    def _log(self, message, **kwargs):
+        if self.verbose:
+            print(message, **kwargs)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="leitor-serial", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=self.read_timeout + 1.0)
+            self._thread = None
+        self._close()
+
+    def _close(self):
+        if self.serial is not None:
+            try:
+                self.serial.close()
+                self._log("Porta serial fechada.")
+            except OSError:
+                pass
+            self.serial = None
+
+    def _open(self):
+        import serial
+        try:
+            self.serial = serial.Serial(self.port, self.baud_rate, timeout=self.read_timeout)
+            self._log(f"Conectado à porta serial {self.port}.")
+            return True
+        except (serial.SerialException, OSError):
+            self._log(f"AVISO: Porta serial '{self.port}' não encontrada. Tentando novamente em {self.reconnect_delay:.0f}s...", end='\r')
+            return False
+
+    def _run(self):
+        while self._running:
+            if self.serial is None and not self._open():
+                self._sleep(self.reconnect_delay)
+                continue
+            try:
+                # Bloqueia até chegar 1 byte (ou read_timeout) e depois leva tudo o que já estiver no buffer
+                data = self.serial.read(max(1, self.serial.in_waiting))
+            except (OSError, TypeError) as e:  # pyserial levanta SerialException (OSError) ou TypeError ao desconectar
+                self._log(f"\nErro na porta serial: {e}. Reconectando...")
+                self._close()
+                self._sleep(self.reconnect_delay)
+                continue
+            if data:
+                self.feed(data)
+
+    def _sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        while self._running and time.monotonic() < deadline:
+            time.sleep(min(0.1, deadline - time.monotonic()))
+
+    def write(self, data):
+        with self._write_lock:
+            if self.serial is not None:
+                self.serial.write(data)
+
+    def feed(self, data):
+        """Acrescenta bytes recebidos ao buffer e trata cada linha completa."""
+        self.bytes_read += len(data)
+        self._buffer += data
+        if b'\n' not in data:
+            if len(self._buffer) > MAX_LINE_LENGTH:
+                self.overflows += 1
+                self._buffer.clear()
+            return
+        *lines, rest = self._buffer.split(b'\n')
+        self._buffer = bytearray(rest)
+        for raw_line in lines:
+            line = raw_line.decode('utf-8', errors='ignore').strip()
+            if line:
+                self.handle_line(line)
+
+    def handle_line(self, serial_line, now=None):
+        """Trata uma linha já separada. Retorna o tipo: 'command', 'module' ou None."""
+        self.lines += 1
+        try:
+            kind, module_id, record = parse_serial_line(serial_line, self.required_modules)
+        except Exception as e:
+            self._log(f"\nErro ao processar linha de dados serial '{serial_line}': {e}")
+            kind = module_id = record = None
+
+        if kind == 'command':
+            self.write(b"ACK_PI\n")
+            self.commands += 1
+            self._log(f"\n[SERIAL] Comando 'PING' recebido. Respondido com 'ACK_PI'.")
+        elif kind == 'module':
+            if self.registry.update(module_id, record, now):
+                missing = self.registry.missing(self.required_modules)
+                self._log(f"\nMódulo '{module_id}' recebido! Faltam {len(missing)}.")
+        else:
+            self.unrecognized += 1
+            self._log(f"\n[SERIAL RAW] Dado não reconhecido recebido: '{serial_line}'")
+        SERIAL_LINES[kind or 'unrecognized'].inc()
+        return kind
+
+    def summary(self):
+        return {'lines': self.lines, 'commands': self.commands, 'unrecognized': self.unrecognized,
+                'bytes': self.bytes_read, 'overflows': self.overflows, 'modules': self.registry.summary()}
@@ -7,6 +7,10 @@
 
 bool loraConnected = false;
 
+// Registro binário de telemetria (ver telemetria.py): primeiro byte 0xF1, 18 bytes
+#define VERSAO_TELEMETRIA 0xF1
+#define TAMANHO_REGISTRO 18
+
 void setupLoRa() {
   Serial.print("Status LoRa: ");
   if (LoRa.begin(433E6)) {
@@ -36,10 +40,26 @@ void loop() {
   int packetSize = LoRa.parsePacket();
   
   if (packetSize) {
-    String receivedData = "";
+    uint8_t buffer[256];
+    int length = 0;
+    while (LoRa.available() && length < (int)sizeof(buffer)) {
+      buffer[length++] = LoRa.read();
+    }
 
-    while (LoRa.available()) {
-      receivedData += (char)LoRa.read();
+    // Registro binário: repassa ao Pi como '#' + hexadecimal, para o readline não quebrar em bytes '\n'
+    if (length == TAMANHO_REGISTRO && buffer[0] == VERSAO_TELEMETRIA) {
+      Serial.print('#');
+      for (int i = 0; i < length; i++) {
+        if (buffer[i] < 0x10) Serial.print('0');
+        Serial.print(buffer[i], HEX);
+      }
+      Serial.println();
+      return;
+    }
+
+    String receivedData = "";
+    for (int i = 0; i < length; i++) {
+      receivedData += (char)buffer[i];
     }
 
     if(receivedData.charAt(0)=='[' && receivedData.charAt(receivedData.length()-1)==']')
@@ -0,0 +1,86 @@
+import time
+
+from configuracao import TRIGGER_COUNT_THRESHOLD, TRIGGER_COUNT_RESET_SECONDS, COOLDOWN_SECONDS
+
+# --- ESTADOS DO PIPELINE ---
+MONITORANDO = 'MONITORANDO'   # Modelo 1 (fogo) acumulando detecções
+CONFIRMANDO = 'CONFIRMANDO'   # Modelo 2 (fumaça) confirmando o alvo
+RESETANDO = 'RESETANDO'       # Cooldown após um alerta confirmado
+
+# --- EVENTOS RETORNADOS POR update() ---
+PIPELINE_ATIVADO = 'PIPELINE_ATIVADO'
+ALVO_CONFIRMADO = 'ALVO_CONFIRMADO'
+CICLO_COMPLETO = 'CICLO_COMPLETO'
+
+
+class DetectionStateMachine:
+    """
+    Máquina de estados MONITORANDO -> CONFIRMANDO -> RESETANDO de uma câmera.
+    Não executa modelos nem publica nada: recebe a contagem de objetos do modelo ativo
+    e retorna o evento ocorrido (ou None), deixando os efeitos colaterais para quem chama.
+    """
+
+    def __init__(self, trigger_threshold=TRIGGER_COUNT_THRESHOLD, reset_seconds=TRIGGER_COUNT_RESET_SECONDS,
+                 cooldown_seconds=COOLDOWN_SECONDS, now=None):
+        self.trigger_threshold = trigger_threshold
+        self.reset_seconds = reset_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.state = MONITORANDO
+        self.m1_streak_count, self.m2_streak_count = 0, 0
+        self.m1_last_detection_time = 0
+        self.cooldown_start_time = 0
+        self.last_detection_activity_time = time.time() if now is None else now
+
+    @property
+    def active_model(self):
+        """Modelo que deve rodar no próximo frame: 1, 2 ou None (cooldown)."""
+        if self.state == MONITORANDO:
+            return 1
+        if self.state == CONFIRMANDO:
+            return 2
+        return None
+
+    def update(self, objects_found=0, now=None, m1_objects_found=None):
+        """
+        Avança a máquina com o resultado do modelo ativo. Retorna o evento ocorrido ou None.
+        m1_objects_found é o resultado do modelo 1 quando ele também roda em CONFIRMANDO (modos 'dual'
+        e 'cascade'): fogo visto durante a confirmação conta como atividade de detecção.
+        """
+        now = time.time() if now is None else now
+
+        if self.state == MONITORANDO:
+            if objects_found > 0:
+                self.last_detection_activity_time = now
+                self.m1_streak_count += objects_found
+                self.m1_last_detection_time = now
+            elif now - self.m1_last_detection_time > self.reset_seconds:
+                self.m1_streak_count = 0
+
+            if self.m1_streak_count >= self.trigger_threshold:
+                self.state = CONFIRMANDO
+                return PIPELINE_ATIVADO
+
+        elif self.state == CONFIRMANDO:
+            if m1_objects_found:
+                self.last_detection_activity_time = now
+                self.m1_last_detection_time = now
+            if objects_found > 0:
+                self.last_detection_activity_time = now
+                self.m2_streak_count += objects_found
+
+            if self.m2_streak_count >= self.trigger_threshold:
+                self.state = RESETANDO
+                self.cooldown_start_time = now
+                return ALVO_CONFIRMADO
+
+        elif self.state == RESETANDO:
+            if (now - self.cooldown_start_time) >= self.cooldown_seconds:
+                self.state = MONITORANDO
+                self.m1_streak_count, self.m2_streak_count = 0, 0
+                return CICLO_COMPLETO
+
+        return None
+
+    def cooldown_remaining(self, now=None):
+        now = time.time() if now is None else now
+        return max(0, self.cooldown_seconds - (now - self.cooldown_start_time))
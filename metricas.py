@@ -0,0 +1,207 @@
+"""
+Métricas no formato texto do Prometheus, sem dependências, para o Pi e para a API.
+
+Contadores, gauges e histogramas são criados uma vez na importação do módulo que os usa e
+atualizados no caminho quente; render() gera o texto servido em /metrics (start_http_server no Pi e
+na API, rota /metrics no site). Cada atualização custa um teste de flag, um lock sem disputa e, nos
+histogramas, uma busca binária nos limites dos buckets (ver benchmarks/bench_metricas.py).
+
+Liga/desliga: FIREWATCHER_METRICAS=0 no ambiente, ou REGISTRY.enabled = False em tempo de execução.
+Desligadas, as atualizações retornam logo no teste da flag e /metrics fica vazio.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get('FIREWATCHER_METRICAS', '1') != '0'
+
+# Segundos: de 100 us (pré-processamento no PC) a 2,5 s (commit lento no banco)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in items) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labels):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(sorted(labels.items()))
+        self._lock = threading.Lock()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, registry, name, documentation, labels):
+        super().__init__(registry, name, documentation, labels)
+        self.value = 0
+
+    def inc(self, amount=1):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        return [(self.name, self.labels, None, self.value)]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, registry, name, documentation, labels):
+        super().__init__(registry, name, documentation, labels)
+        self.value = 0
+
+    def set(self, value):
+        if self.registry.enabled:
+            self.value = value
+
+    def samples(self):
+        return [(self.name, self.labels, None, self.value)]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labels, buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # último = acima do maior limite
+        self.sum = 0.0
+
+    def observe(self, value):
+        if not self.registry.enabled:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager que observa a duração do bloco."""
+        return _Timer(self)
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        result, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            result.append((self.name + '_bucket', self.labels, ('le', _format_value(bound)), cumulative))
+        result.append((self.name + '_sum', self.labels, None, total))
+        result.append((self.name + '_count', self.labels, None, cumulative))
+        return result
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Registry:
+    """Conjunto de métricas de um processo. Métricas com o mesmo nome diferem pelos rótulos."""
+
+    def __init__(self, enabled=ENABLED):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, documentation, labels, **kwargs):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = cls(self, name, documentation, labels, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Métrica {name!r} já registrada como {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, **labels):
+        return self._get(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, **labels):
+        return self._get(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS, **labels):
+        return self._get(Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self):
+        """Texto de exposição do Prometheus (versão 0.0.4)."""
+        if not self.enabled:
+            return ''
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: (metric.name, metric.labels))
+        lines, described = [], set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels, extra)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host='0.0.0.0', registry=REGISTRY):
+    """Serve GET /metrics numa thread daemon. Retorna o servidor (server_address traz a porta real)."""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metricas-http", daemon=True).start()
+    return server
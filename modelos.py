@@ -0,0 +1,331 @@
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+from tflite_runtime.interpreter import Interpreter, OpResolverType # Biblioteca otimizada para Pi
+
+import metricas
+
+from configuracao import (INTERPRETER_NUM_THREADS, INTERPRETER_USE_XNNPACK, WARMUP_INVOKES, LAZY_MODEL_2,
+                          LAZY_MODEL_2_MIN_AVAILABLE_MB, MARGIN_HORIZONTAL, MARGIN_VERTICAL,
+                          PIPELINE_MODE, CASCADE_MAX_CROPS, CASCADE_CROP_MARGIN)
+from deteccao import count_detections, detection_mask, flagged_regions
+
+PIPELINE_MODES = ('sequential', 'dual', 'cascade')
+
+# Resultado de um frame: contagens (None se o modelo não rodou), tempos de inferência, regiões da cascata e
+# se a contagem do modelo 1 foi reaproveitada pelo filtro de movimento (movimento.MotionGate)
+FrameResult = namedtuple('FrameResult', ['m1_objects', 'm2_objects', 'm1_time', 'm2_time', 'regions', 'reused'],
+                         defaults=(False,))
+
+
+class ModelRunner:
+    """Um interpretador TFLite já alocado, com o pré-processamento e a contagem de detecções do seu modelo."""
+
+    def __init__(self, model_path, labels, threshold, model_index, num_threads=INTERPRETER_NUM_THREADS,
+                 use_xnnpack=INTERPRETER_USE_XNNPACK):
+        self.model_path = model_path
+        self.labels = labels
+        self.threshold = threshold
+        self.model_index = model_index
+        start_time = time.perf_counter()
+        # AUTO aplica os delegates padrão do tflite_runtime (XNNPACK nos builds para ARM e x86)
+        op_resolver = OpResolverType.AUTO if use_xnnpack else OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads,
+                                       experimental_op_resolver_type=op_resolver)
+        self.interpreter.allocate_tensors()
+        self.load_time = time.perf_counter() - start_time
+        self.warmup_time = 0.0
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.input_size = (self.input_details[0]['shape'][2], self.input_details[0]['shape'][1])
+        self.input_dtype = self.input_details[0]['dtype']
+        self.last_inference_time = 0.0
+        # Tempo total gasto em pré-processamento desde a criação (o motor mede a diferença por frame)
+        self.preprocess_time = 0.0
+        model_label = str(model_index + 1)
+        self._inference_metric = metricas.histogram('firewatcher_inference_seconds',
+                                                    "Duração de cada invoke() do interpretador", model=model_label)
+        self._preprocess_metric = metricas.histogram('firewatcher_preprocess_seconds',
+                                                     "Pré-processamento de uma imagem no tensor de entrada", model=model_label)
+        # Lote atual do tensor de entrada; vira False em supports_batch se o modelo não aceitar redimensionar
+        self._batch_size = 1
+        self.supports_batch = True
+        self._input_index = self.input_details[0]['index']
+        self._output_index = self.output_details[0]['index']
+        # Buffer reaproveitado a cada frame: o resize e a conversão de cor não alocam arrays novos
+        self._resized = np.empty((self.input_size[1], self.input_size[0], 3), dtype=np.uint8)
+        self._lut = self._input_lut()
+
+    def warmup(self, invokes=WARMUP_INVOKES):
+        """
+        Executa 'invokes' vezes sobre a entrada zerada, fora das métricas: o primeiro invoke paga o preparo
+        do delegate e a leitura das páginas do modelo, que assim não caem no primeiro frame real.
+        """
+        start_time = time.perf_counter()
+        if invokes:
+            self.interpreter.tensor(self._input_index)()[...] = 0
+            for _ in range(invokes):
+                self.interpreter.invoke()
+        self.warmup_time = time.perf_counter() - start_time
+        return self.warmup_time
+
+    def _input_lut(self):
+        """
+        Tabela de 256 entradas pixel uint8 -> valor do tensor de entrada. None em modelos uint8, que
+        recebem o pixel como está. Em float32 dá exatamente o mesmo valor de astype(np.float32) / 255.0;
+        em int8 aplica a quantização da entrada sobre essa mesma escala 0..1.
+        """
+        if self.input_dtype == np.uint8:
+            return None
+        values = np.arange(256, dtype=np.float32) / 255.0
+        if self.input_dtype == np.float32:
+            return values
+        scale, zero_point = self.input_details[0]['quantization']
+        limits = np.iinfo(self.input_dtype)
+        return np.clip(np.round(values / scale + zero_point), limits.min, limits.max).astype(self.input_dtype)
+
+    def prepare(self, frame):
+        """Redimensiona e converte um frame BGR para o tensor de entrada do modelo (cópia nova, fora do interpretador)."""
+        input_image = cv2.cvtColor(cv2.resize(frame, self.input_size), cv2.COLOR_BGR2RGB)
+        if self._lut is not None:
+            input_image = cv2.LUT(input_image, self._lut)
+        return np.expand_dims(input_image, axis=0)
+
+    def _load_slot(self, image, slot):
+        # O view de tensor() não pode sobreviver até o invoke(): é pego e solto dentro desta função
+        start_time = time.perf_counter()
+        cv2.resize(image, self.input_size, dst=self._resized)
+        input_view = self.interpreter.tensor(self._input_index)()
+        if self._lut is None:
+            cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=input_view[slot])
+        else:
+            cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._resized)
+            cv2.LUT(self._resized, self._lut, dst=input_view[slot])
+        elapsed = time.perf_counter() - start_time
+        self.preprocess_time += elapsed
+        self._preprocess_metric.observe(elapsed)
+
+    def load(self, frame):
+        """Pré-processa um frame BGR direto no tensor de entrada do interpretador, sem alocar arrays."""
+        self._resize_batch(1)
+        self._load_slot(frame, 0)
+
+    def copy_input_from(self, other):
+        """Copia para a entrada deste modelo o frame já pré-processado na entrada de 'other' (mesmo formato)."""
+        start_time = time.perf_counter()
+        self._resize_batch(1)
+        self.interpreter.tensor(self._input_index)()[...] = other.interpreter.tensor(other._input_index)()[:1]
+        self.preprocess_time += time.perf_counter() - start_time
+
+    def _resize_batch(self, batch_size):
+        """Ajusta a dimensão de lote da entrada. Retorna False se o modelo não permitir."""
+        if batch_size == self._batch_size:
+            return True
+        if not self.supports_batch:
+            return False
+        shape = self.input_details[0]['shape']
+        try:
+            self.interpreter.resize_tensor_input(self._input_index, [batch_size, *shape[1:]])
+            self.interpreter.allocate_tensors()
+        except (ValueError, RuntimeError):
+            self.supports_batch = False
+            self.interpreter.resize_tensor_input(self._input_index, shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = 1
+            return batch_size == 1
+        self._batch_size = batch_size
+        return True
+
+    def _invoke_loaded(self):
+        start_time = time.time()
+        self.interpreter.invoke()
+        output_data = self.interpreter.get_tensor(self._output_index)
+        elapsed = time.time() - start_time
+        self._inference_metric.observe(elapsed)
+        return output_data, elapsed
+
+    def run(self):
+        """Executa o modelo sobre o que já está no tensor de entrada (ver load) e retorna a saída."""
+        output_data, self.last_inference_time = self._invoke_loaded()
+        return output_data
+
+    def invoke(self, input_data):
+        """Executa o modelo sobre um tensor já pré-processado (N, altura, largura, 3)."""
+        if self._resize_batch(len(input_data)):
+            self.interpreter.set_tensor(self._input_index, input_data)
+            return self.run()
+        outputs, self.last_inference_time = [], 0.0
+        for i in range(len(input_data)):
+            self.interpreter.set_tensor(self._input_index, input_data[i:i + 1])
+            output_data, elapsed = self._invoke_loaded()
+            outputs.append(output_data)
+            self.last_inference_time += elapsed
+        return np.concatenate(outputs)
+
+    def run_images(self, images):
+        """
+        Pré-processa e executa o modelo sobre várias imagens BGR: uma única chamada em lote se o modelo
+        aceitar, senão uma por imagem. last_inference_time soma só o tempo de inferência.
+        """
+        if self._resize_batch(len(images)):
+            for slot, image in enumerate(images):
+                self._load_slot(image, slot)
+            return self.run()
+        outputs, self.last_inference_time = [], 0.0
+        for image in images:
+            self._load_slot(image, 0)
+            output_data, elapsed = self._invoke_loaded()
+            outputs.append(output_data)
+            self.last_inference_time += elapsed
+        return np.concatenate(outputs)
+
+    def count(self, output_data):
+        return count_detections(output_data, self.labels, self.threshold, self.model_index,
+                                MARGIN_HORIZONTAL, MARGIN_VERTICAL)
+
+    def mask(self, output_data):
+        return detection_mask(output_data, self.labels, self.threshold, self.model_index,
+                              MARGIN_HORIZONTAL, MARGIN_VERTICAL)
+
+    def detect(self, frame):
+        """Executa o modelo sobre um frame. Retorna (objetos_encontrados, tempo_de_inferencia)."""
+        self.load(frame)
+        objects_found = self.count(self.run())
+        return objects_found, self.last_inference_time
+
+
+def available_memory_mb():
+    """MemAvailable de /proc/meminfo em MB, ou None se não houver (fora do Linux)."""
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def should_lazy_load(setting=LAZY_MODEL_2, min_available_mb=LAZY_MODEL_2_MIN_AVAILABLE_MB):
+    """Decide se o modelo 2 fica para o primeiro CONFIRMANDO (ver LAZY_MODEL_2 em configuracao.py)."""
+    if setting == 'auto':
+        available = available_memory_mb()
+        return available is not None and available < min_available_mb
+    return setting == '1'
+
+
+class LazyModelRunner:
+    """
+    ModelRunner criado (e aquecido) só no primeiro uso, com a mesma interface: até lá o interpretador
+    e seus tensores não ocupam memória. Usado para o modelo 2, que só roda em CONFIRMANDO.
+    on_load(runner) é chamado logo depois da carga.
+    """
+
+    def __init__(self, model_path, labels, threshold, model_index, num_threads=INTERPRETER_NUM_THREADS,
+                 use_xnnpack=INTERPRETER_USE_XNNPACK, warmup_invokes=WARMUP_INVOKES, on_load=None):
+        self._args = (model_path, labels, threshold, model_index, num_threads, use_xnnpack)
+        self._warmup_invokes = warmup_invokes
+        self._on_load = on_load
+        self._runner = None
+        self.model_path = model_path
+        self.model_index = model_index
+
+    @property
+    def loaded(self):
+        return self._runner is not None
+
+    @property
+    def runner(self):
+        if self._runner is None:
+            self._runner = ModelRunner(*self._args)
+            self._runner.warmup(self._warmup_invokes)
+            if self._on_load:
+                self._on_load(self._runner)
+        return self._runner
+
+    @property
+    def preprocess_time(self):
+        # Lido pelo motor a cada frame: não pode forçar a carga
+        return self._runner.preprocess_time if self._runner is not None else 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.runner, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_') or name in ('model_path', 'model_index'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.runner, name, value)
+
+
+class DetectionPipeline:
+    """
+    Decide quais modelos rodam em cada frame, conforme o modelo ativo da máquina de estados e o modo
+    (ver PIPELINE_MODE em configuracao.py). Em MONITORANDO todos os modos rodam apenas o modelo 1;
+    em CONFIRMANDO 'dual' e 'cascade' mantêm o modelo 1 rodando junto com o modelo 2.
+    """
+
+    def __init__(self, model_1, model_2, mode=PIPELINE_MODE, max_crops=CASCADE_MAX_CROPS, crop_margin=CASCADE_CROP_MARGIN):
+        if mode not in PIPELINE_MODES:
+            raise ValueError(f"Modo de pipeline desconhecido: {mode!r} (use um de {', '.join(PIPELINE_MODES)})")
+        self.model_1 = model_1
+        self.model_2 = model_2
+        self.mode = mode
+        self.max_crops = max_crops
+        self.crop_margin = crop_margin
+        self._shared_input = None
+
+    @property
+    def shared_input(self):
+        """
+        Os dois modelos do projeto têm a mesma entrada: o frame é pré-processado uma única vez e copiado.
+        Calculado no primeiro uso, para não carregar um modelo 2 sob demanda (LazyModelRunner) antes da hora.
+        """
+        if self._shared_input is None:
+            self._shared_input = (self.model_1.input_size == self.model_2.input_size
+                                  and self.model_1.input_dtype == self.model_2.input_dtype)
+        return self._shared_input
+
+    def run(self, frame, active_model, gate=None, now=None):
+        """
+        Roda os modelos do estado atual sobre o frame. Com 'gate' (um MotionGate por câmera), em
+        MONITORANDO o modelo 1 só roda se a cena mudou; fora de MONITORANDO o filtro é reiniciado.
+        """
+        if gate is not None and active_model != 1:
+            gate.reset()
+        if active_model is None:
+            return FrameResult(None, None, 0.0, 0.0, ())
+        if self.mode == 'sequential' and active_model == 2:
+            m2_objects, m2_time = self.model_2.detect(frame)
+            return FrameResult(None, m2_objects, 0.0, m2_time, ())
+
+        if gate is not None and active_model == 1 and not gate.should_infer(frame, now):
+            return FrameResult(gate.last_objects, None, 0.0, 0.0, (), True)
+
+        self.model_1.load(frame)
+        output_1 = self.model_1.run()
+        m1_objects, m1_time = self.model_1.count(output_1), self.model_1.last_inference_time
+        if active_model == 1:
+            if gate is not None:
+                gate.last_objects = m1_objects
+            return FrameResult(m1_objects, None, m1_time, 0.0, ())
+
+        if self.mode == 'dual':
+            if self.shared_input:
+                self.model_2.copy_input_from(self.model_1)
+            else:
+                self.model_2.load(frame)
+            m2_objects = self.model_2.count(self.model_2.run())
+            return FrameResult(m1_objects, m2_objects, m1_time, self.model_2.last_inference_time, ())
+
+        # Cascata: o modelo 2 só olha as regiões onde o modelo 1 viu fogo, em resolução original
+        frame_height, frame_width = frame.shape[:2]
+        regions = flagged_regions(self.model_1.mask(output_1), frame_width, frame_height,
+                                  self.crop_margin, self.max_crops)
+        if not regions:
+            return FrameResult(m1_objects, 0, m1_time, 0.0, ())
+        outputs = self.model_2.run_images([frame[y0:y1, x0:x1] for x0, y0, x1, y1 in regions])
+        m2_objects = sum(self.model_2.count(output) for output in outputs)
+        return FrameResult(m1_objects, m2_objects, m1_time, self.model_2.last_inference_time, tuple(regions))
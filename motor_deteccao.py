@@ -0,0 +1,262 @@
+"""
+Motor de detecção do Pi, importável e sem efeitos colaterais na importação.
+
+DetectionEngine junta o pipeline de modelos, a máquina de estados, os módulos recebidos pela serial e
+a publicação MQTT. O que depende de hardware entra por interfaces pequenas, para que o mesmo código
+rode no Pi (Firewatcher_Raspi.py) e no replay offline (replay.py):
+- fonte de frames: read() -> (ok, frame), como cv2.VideoCapture e as fontes de captura.py;
+- módulos: leitor_serial.ModuleRegistry, atualizado pela thread do SerialReader no Pi ou preenchido
+  direto pelo replay;
+- publicador: publish(topic, payload), que não pode bloquear; no Pi é o
+  publicador_mqtt.SpoolingMqttPublisher.
+"""
+import time
+from collections import deque
+
+import numpy as np
+
+import metricas
+import telemetria
+from configuracao import REQUIRED_MODULES, MQTT_TOPIC, MQTT_KEEPALIVE_INTERVAL, MQTT_PAYLOAD_FORMAT
+from leitor_serial import ModuleRegistry
+from maquina_estados import (DetectionStateMachine, MONITORANDO, PIPELINE_ATIVADO, ALVO_CONFIRMADO,
+                             CICLO_COMPLETO)
+
+STAGES = ('decode', 'preprocess', 'invoke', 'postprocess', 'total')
+
+FRAME_SECONDS = metricas.histogram('firewatcher_frame_seconds', "Tempo total de um frame no motor (leitura a publicação)")
+ALERTS = metricas.counter('firewatcher_alerts_total', "Alvos confirmados (ALVO_CONFIRMADO)")
+
+
+class RecordingPublisher:
+    """Publicador falso: guarda (tópico, payload) em 'messages'."""
+
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, topic, payload):
+        self.messages.append((topic, payload))
+
+    def close(self):
+        pass
+
+
+class StageStats:
+    """Latência por estágio do frame, numa janela das últimas 'history' medições."""
+
+    def __init__(self, history=10000):
+        self.samples = {stage: deque(maxlen=history) for stage in STAGES}
+
+    def add(self, **durations):
+        for stage, seconds in durations.items():
+            self.samples[stage].append(seconds)
+
+    def summary(self):
+        result = {}
+        for stage, values in self.samples.items():
+            if not values:
+                result[stage] = {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+                continue
+            array = np.fromiter(values, dtype=float) * 1000
+            p50, p95, p99 = np.percentile(array, (50, 95, 99))
+            result[stage] = {'p50_ms': round(float(p50), 3), 'p95_ms': round(float(p95), 3),
+                             'p99_ms': round(float(p99), 3), 'max_ms': round(float(array.max()), 3)}
+        return result
+
+
+class DetectionEngine:
+    """
+    Um laço de detecção: lê frames, roda o pipeline do estado atual, avança a máquina de estados e
+    publica o status dos módulos nos alertas, no fim do cooldown e no keep-alive.
+
+    process() recebe o instante 'now' de cada frame; no replay ele vem do relógio do vídeo, então
+    cooldown, TRIGGER_COUNT_RESET_SECONDS e tempo até o alerta não dependem da velocidade da máquina.
+    """
+
+    def __init__(self, pipeline, frame_source=None, modules=None, publisher=None, state_machine=None,
+                 motion_gate=None, required_modules=REQUIRED_MODULES, topic=MQTT_TOPIC,
+                 payload_format=MQTT_PAYLOAD_FORMAT, keepalive_interval=MQTT_KEEPALIVE_INTERVAL,
+                 on_event=None, verbose=True, history=10000):
+        self.pipeline = pipeline
+        self.frame_source = frame_source
+        self.modules = modules if modules is not None else ModuleRegistry()
+        self.publisher = publisher
+        self.state_machine = state_machine or DetectionStateMachine()
+        self.motion_gate = motion_gate
+        self.required_modules = list(required_modules)
+        self.topic = topic
+        self.payload_format = payload_format
+        self.keepalive_interval = keepalive_interval
+        self.on_event = on_event
+        self.verbose = verbose
+
+        self.mqtt_seq = 0
+        self.last_mqtt_send_time = None
+        self.pending_statuses = []  # Status gerados antes dos módulos (detecção sem esperar o registro), em ordem
+        self.last_result = None
+        self.stage_stats = StageStats(history)
+        self.frames = 0
+        self.busy_time = 0.0
+        self.events = []  # (instante, evento)
+        self.alert_times = []
+        self.time_to_alert = []  # segundos entre a primeira detecção do modelo 1 no ciclo e o alerta
+        self._cycle_start_time = None
+        self._start_time = None
+        self._last_time = None
+
+    def _log(self, message, **kwargs):
+        if self.verbose:
+            print(message, **kwargs)
+
+    @property
+    def modules_ready(self):
+        return not self.modules.missing(self.required_modules)
+
+    def wait_for_modules(self, timeout=None):
+        """Espera o leitor serial entregar todos os módulos requeridos. Retorna False se o tempo esgotar."""
+        return self.modules.wait_for(self.required_modules, timeout)
+
+    # --- MQTT ---
+
+    def publish_status(self, detection_status, now=None):
+        """Publica o status da detecção junto com os dados dos módulos."""
+        now = time.time() if now is None else now
+        if not self.publisher:
+            return
+        modules = self.modules.records()
+        if not modules:
+            # Guardados em ordem e publicados pelo process() assim que o leitor serial registrar os módulos:
+            # um alerta (1) seguido do fim do cooldown (0) chega ao servidor como os dois status
+            if not self.pending_statuses or self.pending_statuses[-1] != detection_status:
+                self.pending_statuses.append(detection_status)
+                self._log(f"\n[MQTT] Aviso: Nenhuma data de módulo serial para enviar. Status {detection_status} pendente.")
+            self.last_mqtt_send_time = now
+            return
+
+        self._log(f"\n--- Preparando para enviar Status MQTT (Status: {detection_status}) ---")
+        self.mqtt_seq = (self.mqtt_seq + 1) & 0xFFFF
+        records = {module_key: record._replace(status=detection_status, seq=self.mqtt_seq)
+                   for module_key, record in modules.items()}
+        if self.payload_format == 'binary':
+            # Todos os módulos em um único publish de RECORD_SIZE bytes por módulo
+            output_payload = telemetria.encode_batch(records.values())
+            self.publisher.publish(self.topic, output_payload)
+            self._log(f"[MQTT] Publicado para {', '.join(records)}: {len(output_payload)} bytes (seq {self.mqtt_seq})")
+        else:
+            for module_key, record in records.items():
+                output_payload = f"({module_key},{record.lat},{record.lon},{detection_status})"
+                self.publisher.publish(self.topic, output_payload)
+                self._log(f"[MQTT] Publicado para {module_key}: {output_payload}")
+        self.last_mqtt_send_time = now
+
+    def publish_pending(self, now=None):
+        """Publica, em ordem, os status gerados antes de o leitor serial registrar os módulos."""
+        if self.pending_statuses and self.modules.records():
+            pending, self.pending_statuses = self.pending_statuses, []
+            self._log(f"\n[MQTT] Módulos registrados: enviando os status pendentes {pending}.")
+            for detection_status in pending:
+                self.publish_status(detection_status, now)
+
+    def publish_keepalive(self, now, last_detection_activity_time):
+        """Keep-alive: status 0 quando nada é enviado nem detectado há keepalive_interval."""
+        if (now - self.last_mqtt_send_time > self.keepalive_interval
+                and now - last_detection_activity_time > self.keepalive_interval):
+            self._log(f"\n[MQTT Keep-Alive] Sem atividade. Enviando status (0).")
+            self.publish_status(0, now)
+
+    # --- Frames ---
+
+    def process(self, frame, now=None, decode_time=0.0):
+        """Roda um frame pelo pipeline e pela máquina de estados. Retorna (evento ou None, FrameResult)."""
+        now = time.time() if now is None else now
+        if self._start_time is None:
+            self._start_time = now
+        self._last_time = now
+        if self.last_mqtt_send_time is None:
+            self.last_mqtt_send_time = now
+        self.publish_pending(now)
+        machine = self.state_machine
+        models = (self.pipeline.model_1, self.pipeline.model_2)
+
+        start = time.perf_counter()
+        preprocess_before = sum(model.preprocess_time for model in models)
+        active_model = machine.active_model
+        result = self.pipeline.run(frame, active_model, self.motion_gate, now)
+        preprocess = sum(model.preprocess_time for model in models) - preprocess_before
+        invoke = result.m1_time + result.m2_time
+
+        m1_objects_found = result.m1_objects or 0
+        objects_found = m1_objects_found if active_model == 1 else (result.m2_objects or 0)
+        if machine.state == MONITORANDO and machine.m1_streak_count == 0 and m1_objects_found > 0:
+            self._cycle_start_time = now
+
+        event = machine.update(objects_found, now=now, m1_objects_found=result.m1_objects)
+        if event == PIPELINE_ATIVADO:
+            self._log(f"\n[PIPELINE ATIVADO] Motivo: Acumulo ({machine.m1_streak_count} objs).")
+        elif event == ALVO_CONFIRMADO:
+            self._log(f"\n[ALVO CONFIRMADO] Modelo 2 detectou {machine.m2_streak_count} objs.")
+            self.alert_times.append(now)
+            ALERTS.inc()
+            if self._cycle_start_time is not None:
+                self.time_to_alert.append(now - self._cycle_start_time)
+            self.publish_status(1, now)
+        elif event == CICLO_COMPLETO:
+            self._log("\n[CICLO COMPLETO] Resetando sistema.")
+            self._cycle_start_time = None
+            self.publish_status(0, now)  # Envia status 0 ao final do cooldown
+
+        self.publish_keepalive(now, machine.last_detection_activity_time)
+
+        elapsed = time.perf_counter() - start
+        self.stage_stats.add(decode=decode_time, preprocess=preprocess, invoke=invoke,
+                             postprocess=max(0.0, elapsed - preprocess - invoke), total=decode_time + elapsed)
+        FRAME_SECONDS.observe(decode_time + elapsed)
+        self.frames += 1
+        self.busy_time += decode_time + elapsed
+        self.last_result = result
+        if event:
+            self.events.append((now, event))
+            if self.on_event:
+                self.on_event(self, event)
+        return event, result
+
+    def run(self, max_frames=None, fps=None, on_frame=None):
+        """
+        Lê a fonte de frames até ela terminar (ou até 'max_frames').
+        Com 'fps' o relógio é simulado (frame n no instante n / fps); sem ele, é o relógio real.
+        on_frame(engine, event, result) é chamado depois de cada frame.
+        """
+        index = 0
+        while max_frames is None or index < max_frames:
+            start = time.perf_counter()
+            ok, frame = self.frame_source.read()
+            decode_time = time.perf_counter() - start
+            if not ok:
+                break
+            now = index / fps if fps else None
+            event, result = self.process(frame, now, decode_time)
+            if on_frame:
+                on_frame(self, event, result)
+            index += 1
+        return index
+
+    def summary(self):
+        """Métricas do que já foi processado, serializáveis em JSON."""
+        start = self._start_time or 0.0
+        event_counts = {}
+        for _, event in self.events:
+            event_counts[event] = event_counts.get(event, 0) + 1
+        summary = {
+            'frames': self.frames,
+            'fps': round(self.frames / self.busy_time, 2) if self.busy_time else 0.0,
+            'alerts': len(self.alert_times),
+            'first_alert_s': round(self.alert_times[0] - start, 3) if self.alert_times else None,
+            'time_to_alert_s': [round(seconds, 3) for seconds in self.time_to_alert],
+            'events': event_counts,
+            'final_state': self.state_machine.state,
+            'latency': self.stage_stats.summary(),
+        }
+        if self.motion_gate:
+            # No mesmo relógio dos frames (o do vídeo, no replay)
+            summary['motion_gate'] = self.motion_gate.summary(self._last_time)
+        return summary
@@ -0,0 +1,99 @@
+"""
+Filtro de movimento antes da inferência do modelo 1.
+
+Câmeras de mata ficam quase sempre paradas: em vez de rodar o modelo 1 em todo frame, o frame é
+reduzido para tons de cinza em MOTION_GATE_SIZE e comparado com o último frame que foi inferido.
+Se a fração de pixels mudados ficar abaixo de MOTION_CHANGED_FRACTION, o resultado anterior de
+count_detections é reaproveitado.
+
+Regras para não mudar o comportamento da máquina de estados:
+- só pula quando o último resultado foi 0 objetos. Reaproveitar uma contagem positiva somaria o
+  mesmo fogo em m1_streak_count a cada frame pulado; com 0, update() recebe o mesmo valor que a
+  inferência daria e o zeramento por TRIGGER_COUNT_RESET_SECONDS acontece no mesmo instante;
+- a comparação é com o frame da última inferência, não com o frame anterior, então mudanças lentas
+  (fumaça crescendo devagar) se acumulam até passar do limite;
+- mesmo sem mudança, o modelo roda de novo a cada MOTION_MAX_SKIP_SECONDS.
+"""
+import time
+
+import cv2
+import numpy as np
+
+from captura import RateMeter
+from configuracao import (MOTION_GATE_SIZE, MOTION_PIXEL_THRESHOLD, MOTION_CHANGED_FRACTION,
+                          MOTION_MAX_SKIP_SECONDS)
+
+
+class MotionGate:
+    """Decide, frame a frame, se o modelo 1 precisa rodar. Um por câmera."""
+
+    def __init__(self, size=MOTION_GATE_SIZE, pixel_threshold=MOTION_PIXEL_THRESHOLD,
+                 changed_fraction=MOTION_CHANGED_FRACTION, max_skip_seconds=MOTION_MAX_SKIP_SECONDS):
+        self.size = tuple(size)
+        self.pixel_threshold = pixel_threshold
+        self.changed_fraction = changed_fraction
+        self.max_skip_seconds = max_skip_seconds
+        # Redução em dois passos: bilinear até o dobro do tamanho final e média 2x2 (INTER_AREA). Dá a
+        # média de área contra ruído de sensor por uma fração do custo de INTER_AREA sobre o frame inteiro.
+        self._half = np.empty((self.size[1] * 2, self.size[0] * 2, 3), dtype=np.uint8)
+        self._small = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+        self._gray = np.empty((self.size[1], self.size[0]), dtype=np.uint8)
+        self._diff = np.empty_like(self._gray)
+        self._reference = np.empty_like(self._gray)
+        self._has_reference = False
+        self._reference_time = 0.0
+        self._last_time = None  # Instante do último frame, no relógio de quem chama should_infer()
+        self.last_objects = 0
+        self.last_change = 0.0
+        self.frames, self.inferences, self.skipped, self.forced = 0, 0, 0, 0
+        self.inference_rate = RateMeter()
+
+    def reset(self):
+        """Esquece o frame de referência: o próximo frame sempre é inferido."""
+        self._has_reference = False
+
+    def should_infer(self, frame, now=None):
+        """
+        Retorna True se o frame deve passar pelo modelo 1 (e passa a ser a nova referência) ou False se
+        o resultado anterior (last_objects) pode ser reaproveitado.
+        """
+        now = time.monotonic() if now is None else now
+        self._last_time = now
+        self.frames += 1
+        cv2.resize(frame, (self.size[0] * 2, self.size[1] * 2), dst=self._half, interpolation=cv2.INTER_LINEAR)
+        cv2.resize(self._half, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        if self._has_reference and self.last_objects == 0:
+            if now - self._reference_time >= self.max_skip_seconds:
+                self.forced += 1
+            else:
+                cv2.absdiff(self._gray, self._reference, dst=self._diff)
+                self.last_change = np.count_nonzero(self._diff > self.pixel_threshold) / self._diff.size
+                if self.last_change < self.changed_fraction:
+                    self.skipped += 1
+                    return False
+
+        self._reference[...] = self._gray
+        self._has_reference = True
+        self._reference_time = now
+        self.inferences += 1
+        self.inference_rate.tick(now)
+        return True
+
+    def inference_fps(self, now=None):
+        """
+        Inferências do modelo 1 por segundo. Sem 'now', usa o instante do último frame: o relógio é o mesmo
+        dos ticks (time.time() do DetectionEngine, time.monotonic() por padrão, ou o do vídeo no replay).
+        """
+        return self.inference_rate.rate(self._last_time if now is None else now)
+
+    def summary(self, now=None):
+        return {
+            'frames': self.frames,
+            'inferences': self.inferences,
+            'skipped': self.skipped,
+            'forced': self.forced,
+            'skip_ratio': round(self.skipped / self.frames, 3) if self.frames else 0.0,
+            'inference_fps': round(self.inference_fps(now), 2),
+        }
@@ -10,6 +10,23 @@
 HardwareSerial gpsSerial(2);
 TinyGPSPlus gps;
 
+// Registro binário de telemetria v1 (18 bytes, little-endian). O layout é o mesmo de telemetria.py.
+#define VERSAO_TELEMETRIA 0xF1
+#define ID_MODULO 1  // 1 = 'A'
+
+struct __attribute__((packed)) RegistroTelemetria {
+  uint8_t versao;
+  uint16_t modulo;
+  int32_t lat;     // graus * 1e7
+  int32_t lon;     // graus * 1e7
+  uint8_t status;  // 1 = pico detectado
+  uint16_t mq2;
+  uint16_t mq7;
+  uint16_t seq;
+};
+
+uint16_t sequencia = 0;
+
 void setup() {
   Serial.begin(9600);
   pinMode(33, INPUT);
@@ -57,11 +74,19 @@ void loop() {
         Serial.print(", Lon=");
         Serial.println(gps.location.lng(), 6);
 
+        // 18 bytes em vez do texto '[A,lat,lon]', e leva também os sensores e a sequência
+        RegistroTelemetria registro;
+        registro.versao = VERSAO_TELEMETRIA;
+        registro.modulo = ID_MODULO;
+        registro.lat = (int32_t)lround(gps.location.lat() * 1e7);
+        registro.lon = (int32_t)lround(gps.location.lng() * 1e7);
+        registro.status = 1;
+        registro.mq2 = analogRead(33);
+        registro.mq7 = analogRead(32);
+        registro.seq = sequencia++;
+
         LoRa.beginPacket();
-        LoRa.print("[A,");
-        LoRa.print(gps.location.lat(), 6);
-        LoRa.print(gps.location.lng(), 6);
-        LoRa.print("]");
+        LoRa.write((const uint8_t *)&registro, sizeof(registro));
         LoRa.endPacket();
 
         delay(500); // Intervalo entre os envios
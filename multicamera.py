@@ -0,0 +1,311 @@
+"""
+Monitoramento de várias câmeras na mesma caixa.
+
+Cada câmera tem sua própria thread de captura e sua própria máquina de estados
+(MONITORANDO/CONFIRMANDO/RESETANDO). Um conjunto de workers de inferência, cada um com
+seu par de interpretadores TFLite, atende as câmeras: as que estão em CONFIRMANDO têm
+prioridade e as demais são atendidas em rodízio.
+
+Os alertas saem como no Firewatcher_Raspi.py (SharedAlerts): status 1 com os módulos do leitor serial
+quando qualquer câmera confirma o alvo, 0 quando a última termina o cooldown, e keep-alive.
+
+Uso:
+    python multicamera.py                       # câmeras de configuracao.CAMERA_SOURCES
+    python multicamera.py video1.mp4 video2.mp4 --workers 2 --num-threads 2
+"""
+import argparse
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+from captura import LatestFrameGrabber, PipelineStats, CpuMeter, make_source_factory
+from configuracao import (CAMERA_SOURCES, INFERENCE_WORKERS, INTERPRETER_NUM_THREADS, MODEL_PATH_1, MODEL_PATH_2,
+                          LABELS_1, LABELS_2, DETECTION_THRESHOLD_1, DETECTION_THRESHOLD_2, PIPELINE_MODE,
+                          MOTION_GATE_ENABLED, MQTT_BROKER, MQTT_PORT, SERIAL_PORT, BAUD_RATE)
+from leitor_serial import SerialReader
+from maquina_estados import DetectionStateMachine, CONFIRMANDO, ALVO_CONFIRMADO, CICLO_COMPLETO
+from motor_deteccao import DetectionEngine, ALERTS
+from movimento import MotionGate
+from modelos import ModelRunner, DetectionPipeline, PIPELINE_MODES
+from publicador_mqtt import SpoolingMqttPublisher
+
+
+class CameraStream:
+    """Uma câmera: captura, máquina de estados e estatísticas de latência."""
+
+    def __init__(self, name, source_factory, state_machine=None, on_frame=None, reconnect=True, history=1000,
+                 motion_gate=None):
+        self.name = name
+        self.grabber = LatestFrameGrabber(source_factory, reconnect=reconnect, on_frame=on_frame)
+        self.state_machine = state_machine or DetectionStateMachine()
+        self.stats = PipelineStats(self.grabber)
+        self.motion_gate = motion_gate
+        self.busy = False
+        # Tempo entre a captura e o início da inferência, e tempo de inferência, em segundos
+        self.queue_wait = deque(maxlen=history)
+        self.inference_time = deque(maxlen=history)
+        self.frame_age = deque(maxlen=history)
+
+    def latency_summary(self):
+        def percentiles(values):
+            if not values:
+                return {'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+            array = np.fromiter(values, dtype=float) * 1000
+            return {'p50_ms': round(float(np.percentile(array, 50)), 1),
+                    'p95_ms': round(float(np.percentile(array, 95)), 1),
+                    'max_ms': round(float(array.max()), 1)}
+
+        summary = self.stats.summary()
+        summary['state'] = self.state_machine.state
+        summary['queue_wait'] = percentiles(list(self.queue_wait))
+        summary['inference'] = percentiles(list(self.inference_time))
+        summary['frame_age'] = percentiles(list(self.frame_age))
+        if self.motion_gate:
+            summary['motion_gate'] = self.motion_gate.summary()
+        return summary
+
+
+class SharedAlerts:
+    """
+    Status MQTT da caixa com várias câmeras. A publicação é a do DetectionEngine (módulos do registro
+    serial, status pendentes até eles chegarem, keep-alive); o status é 1 enquanto alguma câmera estiver
+    em alerta e só volta a 0 quando a última terminar o cooldown. Chamado pelos workers de inferência.
+    """
+
+    def __init__(self, modules, publisher, verbose=True):
+        self.engine = DetectionEngine(None, modules=modules, publisher=publisher, verbose=verbose)
+        self.alerting = set()
+        self._lock = threading.Lock()
+
+    def on_event(self, stream, event, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if event == ALVO_CONFIRMADO:
+                self.alerting.add(stream.name)
+                ALERTS.inc()
+                self.engine.publish_status(1, now)
+            elif event == CICLO_COMPLETO:
+                self.alerting.discard(stream.name)
+                if not self.alerting:
+                    self.engine.publish_status(0, now)  # Status 0 só quando nenhuma câmera está em alerta
+
+    def tick(self, streams, now=None):
+        """Status pendentes e keep-alive; o keep-alive só sai sem detecção em nenhuma câmera."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.engine.last_mqtt_send_time is None:
+                self.engine.last_mqtt_send_time = now
+            self.engine.publish_pending(now)
+            if not self.alerting and streams:
+                last_activity = max(stream.state_machine.last_detection_activity_time for stream in streams)
+                self.engine.publish_keepalive(now, last_activity)
+
+
+class InferenceScheduler:
+    """
+    Distribui os frames das câmeras entre os workers de inferência.
+    Interpretadores TFLite não podem ser usados por duas threads ao mesmo tempo, então cada worker
+    cria o seu par (modelo 1 e modelo 2); 'workers' e 'num_threads' controlam o uso dos núcleos.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, num_threads=INTERPRETER_NUM_THREADS,
+                 model_path_1=MODEL_PATH_1, model_path_2=MODEL_PATH_2, on_event=None, pipeline_mode=PIPELINE_MODE,
+                 motion_gate=MOTION_GATE_ENABLED, alerts=None):
+        self.workers = workers
+        self.num_threads = num_threads
+        self.pipeline_mode = pipeline_mode
+        self.motion_gate = motion_gate
+        self.model_path_1 = model_path_1
+        self.model_path_2 = model_path_2
+        self.on_event = on_event or self._print_event
+        self.alerts = alerts  # SharedAlerts; None só mostra os eventos
+        self.streams = []
+        self._cond = threading.Condition()
+        self._rr_next = 0
+        self._running = False
+        self._threads = []
+
+    def add_stream(self, name, source_factory, state_machine=None, reconnect=True):
+        stream = CameraStream(name, source_factory, state_machine, on_frame=self._notify, reconnect=reconnect,
+                              motion_gate=MotionGate() if self.motion_gate else None)
+        self.streams.append(stream)
+        return stream
+
+    def start(self):
+        """Abre as câmeras e inicia os workers. Retorna a lista de câmeras que não abriram."""
+        failed = [stream.name for stream in self.streams if not stream.grabber.start()]
+        self.streams = [stream for stream in self.streams if stream.name not in failed]
+
+        # Os modelos são carregados antes de iniciar as threads para que erros apareçam aqui
+        pipelines = [self._load_models() for _ in range(self.workers)]
+        self._running = True
+        for index, pipeline in enumerate(pipelines):
+            thread = threading.Thread(target=self._worker_loop, args=(pipeline,), name=f"inferencia-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return failed
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        for stream in self.streams:
+            stream.grabber.stop()
+
+    @property
+    def finished(self):
+        """Verdadeiro quando todas as fontes terminaram (ex: arquivos de vídeo sem loop) e não há frames pendentes."""
+        return all(stream.grabber.finished and not stream.grabber.has_new_frame() for stream in self.streams)
+
+    def _load_models(self):
+        return DetectionPipeline(ModelRunner(self.model_path_1, LABELS_1, DETECTION_THRESHOLD_1, 0, self.num_threads),
+                                 ModelRunner(self.model_path_2, LABELS_2, DETECTION_THRESHOLD_2, 1, self.num_threads),
+                                 self.pipeline_mode)
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _pick_stream(self):
+        """Escolhe a próxima câmera com frame novo: primeiro as em CONFIRMANDO, depois rodízio entre as demais."""
+        count = len(self.streams)
+        order = [(self._rr_next + offset) % count for offset in range(count)]
+        ready = [index for index in order
+                 if not self.streams[index].busy and self.streams[index].grabber.has_new_frame()]
+        if not ready:
+            return None
+
+        confirming = [index for index in ready if self.streams[index].state_machine.state == CONFIRMANDO]
+        index = confirming[0] if confirming else ready[0]
+        self._rr_next = (index + 1) % count
+        return self.streams[index]
+
+    def _next_job(self, timeout=0.5):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            stream = self._pick_stream()
+            while stream is None and self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+                stream = self._pick_stream()
+            if stream is None:
+                return None, None
+            stream.busy = True
+        return stream, stream.grabber.get_latest(timeout=0)
+
+    def _worker_loop(self, pipeline):
+        while self._running:
+            stream, captured = self._next_job()
+            if stream is None:
+                continue
+            try:
+                if captured is not None:
+                    self._process(stream, captured, pipeline)
+                if self.alerts:
+                    self.alerts.tick(self.streams)
+            finally:
+                with self._cond:
+                    stream.busy = False
+                    self._cond.notify()
+
+    def _process(self, stream, captured, pipeline):
+        machine = stream.state_machine
+        active_model = machine.active_model
+        if active_model is not None:
+            stream.queue_wait.append(time.monotonic() - captured.timestamp)
+        result = pipeline.run(captured.image, active_model, stream.motion_gate)
+        if active_model is not None and not result.reused:
+            stream.inference_time.append(result.m1_time + result.m2_time)
+
+        objects_found = (result.m1_objects if active_model == 1 else result.m2_objects) or 0
+        event = machine.update(objects_found, m1_objects_found=result.m1_objects)
+        stream.stats.record_processed(captured)
+        if active_model is not None:
+            stream.frame_age.append(stream.stats.last_frame_age)
+        if event:
+            self.on_event(stream, event)
+            if self.alerts:
+                self.alerts.on_event(stream, event)
+
+    @staticmethod
+    def _print_event(stream, event):
+        machine = stream.state_machine
+        print(f"\n[{stream.name}] {event} (Estado: {machine.state} | M1: {machine.m1_streak_count} | M2: {machine.m2_streak_count})")
+
+    def summary(self):
+        return {stream.name: stream.latency_summary() for stream in self.streams}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='*', help="Fontes de vídeo (padrão: configuracao.CAMERA_SOURCES)")
+    parser.add_argument('--workers', type=int, default=INFERENCE_WORKERS)
+    parser.add_argument('--num-threads', type=int, default=INTERPRETER_NUM_THREADS)
+    parser.add_argument('--modo', choices=PIPELINE_MODES, default=PIPELINE_MODE)
+    parser.add_argument('--filtro-movimento', action='store_true', default=MOTION_GATE_ENABLED,
+                        help="Pula o modelo 1 em frames sem mudança de cena (movimento.py)")
+    parser.add_argument('--sem-alertas', action='store_true',
+                        help="Só mostra os eventos, sem leitor serial nem MQTT (ex: testes com vídeos)")
+    args = parser.parse_args()
+
+    serial_reader = publisher = alerts = None
+    if not args.sem_alertas:
+        # Mesma comunicação do Firewatcher_Raspi.py: módulos pela serial e status pelo MQTT com spool
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
+        try:
+            client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
+            client.loop_start()
+        except Exception as e:
+            print(f"AVISO: Não foi possível iniciar a conexão com o Broker MQTT. {e}")
+            client = None
+        serial_reader = SerialReader(SERIAL_PORT, BAUD_RATE)
+        serial_reader.start()
+        publisher = SpoolingMqttPublisher(client)
+        alerts = SharedAlerts(serial_reader.registry, publisher)
+
+    sources = {f"camera_{i + 1}": source for i, source in enumerate(args.sources)} if args.sources else CAMERA_SOURCES
+    scheduler = InferenceScheduler(workers=args.workers, num_threads=args.num_threads, pipeline_mode=args.modo,
+                                   motion_gate=args.filtro_movimento, alerts=alerts)
+    for name, source in sources.items():
+        scheduler.add_stream(name, make_source_factory(source))
+
+    failed = scheduler.start()
+    for name in failed:
+        print(f"AVISO: Não foi possível abrir a câmera '{name}'.")
+    if not scheduler.streams:
+        print("ERRO FATAL: Nenhuma fonte de vídeo pôde ser aberta.")
+        if serial_reader:
+            serial_reader.stop()
+            publisher.close()
+        return
+
+    print(f"Monitorando {len(scheduler.streams)} câmera(s) com {args.workers} worker(s). Pressione CTRL+C para sair.")
+    cpu_meter = CpuMeter()
+    try:
+        while not scheduler.finished:
+            time.sleep(1.0)
+            status = " | ".join(f"{s.name}: {s.state_machine.state} {s.stats.inference_fps:.1f}fps" for s in scheduler.streams)
+            print(f"{status} | CPU: {cpu_meter.usage():.0f}%   ", end='\r')
+    except KeyboardInterrupt:
+        print("\n\nPrograma interrompido pelo usuário.")
+    finally:
+        scheduler.stop()
+        for name, summary in scheduler.summary().items():
+            print(f"{name}: {summary}")
+        if serial_reader:
+            serial_reader.stop()
+            print(f"Serial: {serial_reader.summary()}")
+            publisher.close()
+            print(f"MQTT: {publisher.summary()}")
+
+
+if __name__ == '__main__':
+    main()
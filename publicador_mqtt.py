@@ -0,0 +1,263 @@
+"""
+Publicação MQTT do Pi sem bloquear o laço de detecção e sem perder alertas quando o enlace cai.
+
+publish() só coloca a mensagem numa fila em memória. Uma thread grava cada mensagem no spool em
+disco (SQLite) antes de publicá-la com QoS 1 e só a apaga quando o broker responde o PUBACK. Com o
+enlace fora, as mensagens se acumulam no spool, que também sobrevive a um reinício do Pi; na volta,
+o spool é drenado em ordem, com no máximo 'drain_rate' publishes por segundo e 'max_inflight'
+publishes aguardando PUBACK ao mesmo tempo. Payloads binários (telemetria.py) pendentes para o
+mesmo tópico são concatenados em um único publish de até 'max_payload_bytes'.
+
+A entrega é "pelo menos uma vez": um publish confirmado pelo broker mas cujo PUBACK se perdeu na
+queda é reenviado.
+"""
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import metricas
+import telemetria
+from configuracao import (MQTT_QOS, MQTT_MAX_INFLIGHT, MQTT_SPOOL_PATH, MQTT_SPOOL_MAX_MESSAGES, MQTT_DRAIN_RATE,
+                          MQTT_MAX_PAYLOAD_BYTES)
+
+MQTT_ERR_NO_CONN = 4  # paho.mqtt.client.MQTT_ERR_NO_CONN
+
+# Segundos entre publish() e o PUBACK: de um enlace local (ms) a quedas de vários minutos
+DELIVERY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+MQTT_PUBLISH_SECONDS = metricas.histogram('firewatcher_mqtt_publish_seconds', "Duração de cada publish() no cliente MQTT")
+MQTT_PUBLISH_FAILURES = metricas.counter('firewatcher_mqtt_publish_failures_total', "Publishes recusados pelo cliente MQTT")
+MQTT_DELIVERY_SECONDS = metricas.histogram('firewatcher_mqtt_delivery_seconds', "Tempo entre publish() e o PUBACK do broker",
+                                           buckets=DELIVERY_BUCKETS)
+MQTT_SPOOLED = metricas.gauge('firewatcher_mqtt_spool_messages', "Mensagens no spool aguardando PUBACK")
+MQTT_INFLIGHT = metricas.gauge('firewatcher_mqtt_inflight_messages', "Publishes aguardando PUBACK")
+MQTT_DROPPED = metricas.counter('firewatcher_mqtt_dropped_total', "Mensagens descartadas com a fila ou o spool cheios")
+
+
+class MessageSpool:
+    """Fila em disco (SQLite) de (tópico, payload) na ordem de chegada, limitada a 'max_messages'."""
+
+    def __init__(self, path=MQTT_SPOOL_PATH, max_messages=MQTT_SPOOL_MAX_MESSAGES):
+        self.path = path
+        self.max_messages = max_messages
+        self.dropped = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS spool (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                "topic TEXT NOT NULL, payload BLOB NOT NULL, created REAL NOT NULL)")
+        self._count, last_id = self.connection.execute("SELECT COUNT(*), MAX(id) FROM spool").fetchone()
+        self.last_id = last_id or 0
+
+    def put(self, topic, payload, created=None):
+        """Acrescenta uma mensagem. Se o spool passar do limite, as mais antigas são descartadas."""
+        created = time.time() if created is None else created
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        cursor = self.connection.execute("INSERT INTO spool (topic, payload, created) VALUES (?, ?, ?)",
+                                         (topic, payload, created))
+        self.last_id = cursor.lastrowid
+        self._count += 1
+        excess = self._count - self.max_messages
+        if excess > 0:
+            self.connection.execute("DELETE FROM spool WHERE id IN (SELECT id FROM spool ORDER BY id LIMIT ?)", (excess,))
+            self._count -= excess
+            self.dropped += excess
+        return max(0, excess)
+
+    def peek(self, after_id=0, limit=100):
+        """Até 'limit' mensagens (id, tópico, payload, criada em) com id maior que 'after_id', em ordem."""
+        return self.connection.execute("SELECT id, topic, payload, created FROM spool WHERE id > ? ORDER BY id LIMIT ?",
+                                       (after_id, limit)).fetchall()
+
+    def delete(self, ids):
+        ids = list(ids)
+        if ids:
+            cursor = self.connection.execute(f"DELETE FROM spool WHERE id IN ({','.join('?' * len(ids))})", ids)
+            self._count -= cursor.rowcount
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self.connection.close()
+
+
+class SpoolingMqttPublisher:
+    """
+    Publicador do DetectionEngine sobre um cliente paho-mqtt já criado (ou None, sem broker: as
+    mensagens só vão para o spool). O cliente deve estar com loop_start() e reconexão automática
+    (connect_async); o estado da conexão vem de client.is_connected().
+    """
+
+    def __init__(self, client, spool=None, qos=MQTT_QOS, max_inflight=MQTT_MAX_INFLIGHT, drain_rate=MQTT_DRAIN_RATE,
+                 max_payload_bytes=MQTT_MAX_PAYLOAD_BYTES, queue_size=1000, verbose=True):
+        self.client = client
+        self.spool = spool if spool is not None else MessageSpool()
+        self.qos = qos
+        self.max_inflight = max_inflight
+        self.drain_rate = drain_rate
+        self.max_payload_bytes = max_payload_bytes
+        self.queue_size = queue_size
+        self.verbose = verbose
+        self._queue = deque()  # (tópico, payload, instante), do laço de detecção para a thread
+        self._acked = deque()  # mids confirmados, do callback do paho para a thread
+        self._inflight = {}  # mid -> (ids no spool, criada em); só a thread mexe
+        self._last_spooled_id = 0  # maior id já entregue ao cliente
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+        self.enqueued = 0
+        self.published = 0
+        self.delivered = 0
+        self.batches = 0
+        self.dropped = 0
+        if client:
+            # A janela é controlada aqui; a do paho (20 por padrão) só precisa ser maior que max_inflight
+            client.on_publish = self._on_publish
+        self.start()
+
+    def _log(self, message, **kwargs):
+        if self.verbose:
+            print(message, **kwargs)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="publicador-mqtt", daemon=True)
+        self._thread.start()
+
+    def publish(self, topic, payload):
+        """Enfileira a mensagem e retorna na hora; nunca toca na rede nem no disco."""
+        if len(self._queue) >= self.queue_size:
+            self.dropped += 1
+            MQTT_DROPPED.inc()
+            return
+        self._queue.append((topic, payload, time.time()))
+        self.enqueued += 1
+        self._wake.set()
+
+    def _on_publish(self, client, userdata, mid, *args):
+        # Chamado pelo paho com o lock interno de mensagens preso: só registra o mid e acorda a thread
+        self._acked.append(mid)
+        self._wake.set()
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self._next_wait())
+            self._wake.clear()
+            self._step()
+        self._spool_queue()
+
+    def _next_wait(self):
+        if self.spool.last_id > self._last_spooled_id:  # Há o que publicar: espera a conexão ou a próxima ficha
+            if self.drain_rate and self._tokens < 1.0:
+                return max(0.005, (1.0 - self._tokens) / self.drain_rate)
+            return 0.1
+        return 0.5
+
+    def _step(self, now=None):
+        """Grava a fila no spool, processa os PUBACKs e publica o que a janela e a taxa permitirem."""
+        self._spool_queue()
+        now = time.time() if now is None else now
+        while self._acked:
+            entry = self._inflight.pop(self._acked.popleft(), None)
+            if entry is not None:
+                ids, created = entry
+                self.spool.delete(ids)
+                self.delivered += len(ids)
+                MQTT_DELIVERY_SECONDS.observe(now - created)
+        if self.client and self.client.is_connected():
+            self._drain()
+        MQTT_SPOOLED.set(len(self.spool))
+        MQTT_INFLIGHT.set(len(self._inflight))
+
+    def _spool_queue(self):
+        while self._queue:
+            topic, payload, created = self._queue.popleft()
+            dropped = self.spool.put(topic, payload, created)
+            if dropped:
+                self.dropped += dropped
+                MQTT_DROPPED.inc(dropped)
+
+    def _drain(self):
+        monotonic = time.monotonic()
+        if self.drain_rate:
+            burst = max(1.0, float(self.max_inflight))
+            self._tokens = min(burst, self._tokens + (monotonic - self._last_refill) * self.drain_rate)
+        else:
+            self._tokens = float('inf')
+        self._last_refill = monotonic
+        while self._tokens >= 1.0 and len(self._inflight) < self.max_inflight:
+            rows = self.spool.peek(self._last_spooled_id, limit=max(1, self.max_payload_bytes // telemetria.RECORD_SIZE))
+            if not rows:
+                return
+            topic, payload, ids, created = self._coalesce(rows)
+            start = time.perf_counter()
+            info = self.client.publish(topic, payload, qos=self.qos)
+            MQTT_PUBLISH_SECONDS.observe(time.perf_counter() - start)
+            # QoS > 0 sem conexão: o paho guarda a mensagem e a envia na reconexão (o PUBACK chega depois)
+            if info.rc != 0 and not (self.qos and info.rc == MQTT_ERR_NO_CONN):
+                MQTT_PUBLISH_FAILURES.inc()
+                return
+            self._last_spooled_id = ids[-1]
+            self._tokens -= 1.0
+            self.published += 1
+            if len(ids) > 1:
+                self.batches += 1
+            if self.qos:
+                self._inflight[info.mid] = (ids, created)
+            else:
+                self.spool.delete(ids)
+                self.delivered += len(ids)
+
+    def _coalesce(self, rows):
+        """Junta os payloads binários consecutivos do mesmo tópico em um publish de até max_payload_bytes."""
+        _, topic, payload, created = rows[0]
+        ids, parts, size = [rows[0][0]], [payload], len(payload)
+        if telemetria.is_binary(payload):
+            for row_id, row_topic, row_payload, _ in rows[1:]:
+                if row_topic != topic or not telemetria.is_binary(row_payload) or size + len(row_payload) > self.max_payload_bytes:
+                    break
+                ids.append(row_id)
+                parts.append(row_payload)
+                size += len(row_payload)
+        return topic, b''.join(parts), ids, created
+
+    @property
+    def pending(self):
+        """Mensagens ainda sem PUBACK (na fila em memória ou no spool)."""
+        return len(self._queue) + len(self.spool)
+
+    def flush(self, timeout=5.0):
+        """Espera o spool esvaziar (ou o tempo esgotar). Retorna True se tudo foi confirmado."""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            self._wake.set()
+            time.sleep(0.01)
+        return not self.pending
+
+    def summary(self):
+        return {'enqueued': self.enqueued, 'published': self.published, 'delivered': self.delivered,
+                'coalesced_batches': self.batches, 'spooled': len(self.spool), 'inflight': len(self._inflight),
+                'dropped': self.dropped}
+
+    def close(self, timeout=2.0):
+        """Tenta entregar o que falta por até 'timeout' segundos; o resto fica no spool para a próxima execução."""
+        if self.client and self.client.is_connected():
+            self.flush(timeout)
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self.client:
+            self.client.loop_stop()
+            self.client.disconnect()
+            self._log("Desconectado do Broker MQTT.")
+        if len(self.spool):
+            self._log(f"{len(self.spool)} mensagem(ns) MQTT ficaram no spool {self.spool.path}.")
+        self.spool.close()
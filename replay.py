@@ -0,0 +1,154 @@
+"""
+Replay offline do pipeline de detecção (motor_deteccao.DetectionEngine), sem câmera, serial nem broker.
+
+Cada vídeo (ou pasta de imagens) passa por um motor novo, com os módulos requeridos entregues pelo
+mesmo tratamento de linhas do leitor serial (sem porta) e um publicador MQTT que só grava as mensagens. O relógio é o do vídeo (frame n no instante
+n / fps), então cooldown, TRIGGER_COUNT_RESET_SECONDS e tempo até o alerta saem iguais em qualquer
+máquina; a latência de cada estágio (decode, preprocess, invoke, postprocess) é a real.
+
+O resultado sai em JSON: FPS, latência por estágio (p50/p95/p99/max), alertas, tempo até cada alerta
+e eventos, por vídeo e no total. Limiares e gatilhos podem ser trocados pela linha de comando para
+ajustar TRIGGER_COUNT_THRESHOLD e os limiares dos modelos sem hardware.
+
+Uso:
+    python replay.py gravacoes/                       # vídeos e pastas de imagens dentro da pasta
+    python replay.py incendio.mp4 --gatilho 6 --limiar-1 0.6 --saida resultado.json
+    python replay.py frames/ --fps 5 --modo cascade --filtro-movimento
+"""
+import argparse
+import json
+import os
+import sys
+
+from captura import ImageFolderSource, VideoFileSource
+from configuracao import (MODEL_PATH_1, MODEL_PATH_2, LABELS_1, LABELS_2, DETECTION_THRESHOLD_1, DETECTION_THRESHOLD_2,
+                          TRIGGER_COUNT_THRESHOLD, TRIGGER_COUNT_RESET_SECONDS, COOLDOWN_SECONDS, REQUIRED_MODULES,
+                          INTERPRETER_NUM_THREADS, PIPELINE_MODE, MOTION_GATE_ENABLED)
+from maquina_estados import DetectionStateMachine
+from modelos import ModelRunner, DetectionPipeline, PIPELINE_MODES
+from leitor_serial import SerialReader
+from motor_deteccao import DetectionEngine, RecordingPublisher, StageStats
+from movimento import MotionGate
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.h264')
+
+
+def find_sources(paths):
+    """Expande os caminhos em (nome, caminho): vídeos, pastas de imagens e vídeos/pastas dentro de pastas."""
+    sources = []
+    for path in paths:
+        if os.path.isfile(path):
+            sources.append((os.path.basename(path), path))
+        elif os.path.isdir(path):
+            if ImageFolderSource(path).isOpened():
+                sources.append((os.path.basename(os.path.normpath(path)), path))
+            for name in sorted(os.listdir(path)):
+                child = os.path.join(path, name)
+                if (os.path.isfile(child) and name.lower().endswith(VIDEO_EXTENSIONS)) or \
+                        (os.path.isdir(child) and ImageFolderSource(child).isOpened()):
+                    sources.append((name, child))
+        else:
+            print(f"AVISO: '{path}' não encontrado.", file=sys.stderr)
+    return sources
+
+
+def open_source(path, fps):
+    if os.path.isdir(path):
+        return ImageFolderSource(path, fps=fps or 10.0, realtime=False)
+    return VideoFileSource(path, realtime=False)
+
+
+def fake_serial_lines(required_modules):
+    """Uma linha no formato texto para cada módulo requerido, como se todos já tivessem chegado."""
+    return [f"{module},{-23.55 - 0.01 * index:.6f},{-46.63 - 0.01 * index:.6f}" for index, module in enumerate(required_modules)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help="Vídeos, pastas de imagens ou pastas com vídeos")
+    parser.add_argument('--fps', type=float, default=None, help="FPS do relógio simulado (padrão: o do vídeo; 10 para imagens)")
+    parser.add_argument('--max-frames', type=int, default=None, help="Limite de frames por vídeo")
+    parser.add_argument('--modo', choices=PIPELINE_MODES, default=PIPELINE_MODE)
+    parser.add_argument('--num-threads', type=int, default=INTERPRETER_NUM_THREADS)
+    parser.add_argument('--modelo-1', default=MODEL_PATH_1)
+    parser.add_argument('--modelo-2', default=MODEL_PATH_2)
+    parser.add_argument('--limiar-1', type=float, default=DETECTION_THRESHOLD_1)
+    parser.add_argument('--limiar-2', type=float, default=DETECTION_THRESHOLD_2)
+    parser.add_argument('--gatilho', type=int, default=TRIGGER_COUNT_THRESHOLD, help="TRIGGER_COUNT_THRESHOLD")
+    parser.add_argument('--reset-segundos', type=float, default=TRIGGER_COUNT_RESET_SECONDS)
+    parser.add_argument('--cooldown', type=float, default=COOLDOWN_SECONDS)
+    parser.add_argument('--filtro-movimento', action='store_true', default=MOTION_GATE_ENABLED)
+    parser.add_argument('--serial', help="Arquivo com linhas da serial a entregar (padrão: um registro por módulo requerido)")
+    parser.add_argument('--saida', help="Grava o JSON neste arquivo em vez de imprimir")
+    args = parser.parse_args()
+
+    sources = find_sources(args.paths)
+    if not sources:
+        print("ERRO: nenhum vídeo ou pasta de imagens encontrado.", file=sys.stderr)
+        sys.exit(1)
+
+    model_1 = ModelRunner(args.modelo_1, LABELS_1, args.limiar_1, 0, args.num_threads)
+    model_2 = ModelRunner(args.modelo_2, LABELS_2, args.limiar_2, 1, args.num_threads)
+    pipeline = DetectionPipeline(model_1, model_2, args.modo)
+    if args.serial:
+        with open(args.serial, encoding='utf-8') as file:
+            serial_lines = [line.strip() for line in file if line.strip()]
+    else:
+        serial_lines = fake_serial_lines(REQUIRED_MODULES)
+
+    results, total_stats = {}, StageStats()
+    total_frames = total_busy = total_alerts = 0
+    time_to_alert = []
+    for name, path in sources:
+        source = open_source(path, args.fps)
+        if not source.isOpened():
+            print(f"AVISO: não foi possível abrir '{path}'.", file=sys.stderr)
+            continue
+        fps = args.fps or source.fps
+        serial_reader, publisher = SerialReader(port=None, verbose=False), RecordingPublisher()
+        serial_reader.feed(('\n'.join(serial_lines) + '\n').encode('utf-8'))
+        machine = DetectionStateMachine(args.gatilho, args.reset_segundos, args.cooldown, now=0.0)
+        engine = DetectionEngine(pipeline, source, serial_reader.registry, publisher, machine,
+                                 MotionGate() if args.filtro_movimento else None, verbose=False)
+        if not engine.modules_ready:
+            print(f"AVISO: as linhas da serial não trazem os módulos {engine.modules.missing(REQUIRED_MODULES)}", file=sys.stderr)
+        engine.run(max_frames=args.max_frames, fps=fps)
+        source.release()
+
+        summary = engine.summary()
+        summary['video_fps'] = round(fps, 2)
+        summary['mqtt_messages'] = len(publisher.messages)
+        results[name] = summary
+        for stage, values in engine.stage_stats.samples.items():
+            total_stats.samples[stage].extend(values)
+        total_frames += engine.frames
+        total_busy += engine.busy_time
+        total_alerts += summary['alerts']
+        time_to_alert += summary['time_to_alert_s']
+
+    report = {
+        'config': {
+            'mode': args.modo, 'num_threads': args.num_threads,
+            'threshold_1': args.limiar_1, 'threshold_2': args.limiar_2,
+            'trigger_count_threshold': args.gatilho, 'trigger_count_reset_seconds': args.reset_segundos,
+            'cooldown_seconds': args.cooldown, 'motion_gate': args.filtro_movimento,
+        },
+        'videos': results,
+        'total': {
+            'frames': total_frames,
+            'fps': round(total_frames / total_busy, 2) if total_busy else 0.0,
+            'alerts': total_alerts,
+            'time_to_alert_s': time_to_alert,
+            'latency': total_stats.summary(),
+        },
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,70 +1,373 @@
-from flask import Flask, render_template, jsonify
-from sqlalchemy import desc
-from API import criar_sessao, Alertas, Modulos
-from datetime import datetime
-
-app = Flask(__name__)
-
-@app.route('/')
-def homepage():
-    """Página inicial com alertas críticos recentes."""
-    session = criar_sessao()
-    alertas_recentes = (session.query(Alertas)
-                        .filter_by(nivel='Crítico')
-                        .order_by(desc(Alertas.data_hora))
-                        .limit(5)
-                        .all())
-    session.close()
-
-    alertas_para_html = []
-    for alerta in alertas_recentes:
-        alertas_para_html.append({
-            'nome_modulo': alerta.nome_modulo,
-            'descricao': alerta.descricao,
-            'latitude': alerta.latitude,
-            'longitude': alerta.longitude,
-            'data_hora': alerta.data_hora
-        })
-
-    return render_template("homepage3.html", alertas=alertas_para_html)
-
-@app.route('/leituras')
-def dashboard_leituras():
-    """Dashboard de leituras. O HTML buscará os dados via JSON."""
-    return render_template("leituras.html")
-
-@app.route('/modulos.json')
-def modulos_json():
-    """Retorna todos os módulos com status, coordenadas e última atualização."""
-    session = criar_sessao()
-    todos_modulos = session.query(Modulos).all()
-
-    # Se não houver módulos no banco, cria módulos de teste
-    if not todos_modulos:
-        todos_modulos = [
-            type('M', (), {'nome': 'A', 'latitude': -23.55, 'longitude': -46.63})(),
-            type('M', (), {'nome': 'B', 'latitude': -23.551, 'longitude': -46.634})()
-        ]
-
-    modulos_lista = []
-    for m in todos_modulos:
-        alerta = (session.query(Alertas)
-                  .filter_by(nome_modulo=m.nome_modulo)
-                  .order_by(desc(Alertas.data_hora))
-                  .first())
-        status = 'Não Detectado' if not alerta or alerta.nivel == 'Informativo' else 'Detectado'
-        ultima_atualizacao = alerta.data_hora.strftime('%d/%m/%Y %H:%M:%S') if alerta else 'N/A'
-
-        modulos_lista.append({
-            'nome_modulo': m.nome_modulo,
-            'latitude': m.latitude,
-            'longitude': m.longitude,
-            'status': status,
-            'ultima_atualizacao': ultima_atualizacao
-        })
-
-    session.close()
-    return jsonify(modulos_lista)
-
-if __name__ == '__main__':
-    app.run(debug=True)
+import os
+from flask import Blueprint, Flask, Response, render_template, jsonify, request
+from sqlalchemy import and_, desc, func, or_
+from API import (criar_sessao, sessao_escopo, remover_sessao_escopo, ler_versao_dados,
+                 iniciar_ingestao_em_segundo_plano, Alertas, AlertasPorDia, AlertasPorHora, Modulos, StatusModulos)
+from cache import CacheRespostas, LeitorVersao
+import geografia
+import metricas
+from transmissao import Transmissor, MonitorMudancas
+from datetime import datetime, timedelta
+
+# --- Configurações do cache de respostas ---
+CACHE_ATIVO = os.environ.get('SITE_CACHE', '1') != '0'
+CACHE_TTL = 30.0                 # Validade máxima de uma resposta em cache (segundos)
+CACHE_MAX_ENTRADAS = 128
+INTERVALO_VERSAO = 1.0           # Frequência máxima de leitura da versão dos dados no banco (segundos)
+
+# --- Configurações das atualizações ao vivo (SSE) ---
+INTERVALO_EVENTOS = 0.5          # Frequência de verificação de mudanças para os clientes SSE (segundos)
+TAMANHO_FILA_CLIENTE = 64        # Eventos pendentes por cliente antes de pedir ressincronização
+INTERVALO_KEEPALIVE_SSE = 15.0   # Comentário enviado a clientes ociosos para manter a conexão aberta
+# Cada cliente SSE ocupa uma thread do worker enquanto estiver conectado (gunicorn.conf.py). Acima do
+# limite /eventos responde 503 e a página volta a consultar /modulos.json periodicamente, deixando
+# threads livres para as outras rotas. Padrão: metade das SITE_THREADS do worker.
+MAX_CLIENTES_SSE = int(os.environ.get('SITE_MAX_SSE', max(1, int(os.environ.get('SITE_THREADS', '8')) // 2)))
+# --- Configurações do mapa (clusters e busca por raio) ---
+MAX_CELULAS_COBERTURA = 16       # Células de geohash consultadas por caixa (faixas no índice)
+RAIO_PADRAO_KM = 5.0
+RAIO_MAXIMO_KM = 200.0
+LIMITE_ALERTAS_PROXIMOS = 100
+
+# Com INGESTAO_EMBUTIDA=1 o site também assina o MQTT e grava os alertas (sem rodar API.py à parte),
+# e os clientes SSE são avisados logo após cada lote gravado.
+INGESTAO_EMBUTIDA = os.environ.get('INGESTAO_EMBUTIDA', '0') == '1'
+
+# Pasta dos templates (homepage3.html, leituras.html)
+PASTA_TEMPLATES = os.environ.get('SITE_TEMPLATES', 'templates')
+
+rotas = Blueprint('site', __name__)
+
+
+def _ler_versao():
+    session = criar_sessao()
+    versao = ler_versao_dados(session)
+    session.close()
+    return versao
+
+
+versao_dados = LeitorVersao(_ler_versao, INTERVALO_VERSAO)
+cache = CacheRespostas(versao_dados, ttl=CACHE_TTL, max_entradas=CACHE_MAX_ENTRADAS, ativo=CACHE_ATIVO)
+
+@rotas.route('/')
+@cache.em_cache
+def homepage():
+    """Página inicial com alertas críticos recentes."""
+    session = sessao_escopo()
+    alertas_recentes = (session.query(Alertas)
+                        .filter_by(nivel='Crítico')
+                        .order_by(desc(Alertas.data_hora))
+                        .limit(5)
+                        .all())
+
+    alertas_para_html = []
+    for alerta in alertas_recentes:
+        alertas_para_html.append({
+            'nome_modulo': alerta.nome_modulo,
+            'descricao': alerta.descricao,
+            'latitude': alerta.latitude,
+            'longitude': alerta.longitude,
+            'data_hora': alerta.data_hora
+        })
+
+    return render_template("homepage3.html", alertas=alertas_para_html)
+
+@rotas.route('/leituras')
+def dashboard_leituras():
+    """Dashboard de leituras. O HTML buscará os dados via JSON."""
+    return render_template("leituras.html")
+
+def consultar_modulos(session):
+    """
+    Todos os módulos com status, coordenadas e última atualização, em uma única consulta:
+    o último alerta de cada módulo vem da tabela status_modulos mantida pela ingestão.
+    """
+    linhas = (session.query(Modulos.nome_modulo, Modulos.latitude, Modulos.longitude,
+                            StatusModulos.nivel, StatusModulos.data_hora)
+              .outerjoin(StatusModulos, StatusModulos.nome_modulo == Modulos.nome_modulo)
+              .all())
+
+    # Se não houver módulos no banco, cria módulos de teste
+    if not linhas:
+        linhas = [('A', -23.55, -46.63, None, None), ('B', -23.551, -46.634, None, None)]
+
+    modulos_lista = []
+    for nome_modulo, latitude, longitude, nivel, data_hora in linhas:
+        status = 'Não Detectado' if not nivel or nivel == 'Informativo' else 'Detectado'
+        ultima_atualizacao = data_hora.strftime('%d/%m/%Y %H:%M:%S') if data_hora else 'N/A'
+
+        modulos_lista.append({
+            'nome_modulo': nome_modulo,
+            'latitude': latitude,
+            'longitude': longitude,
+            'status': status,
+            'ultima_atualizacao': ultima_atualizacao
+        })
+    return modulos_lista
+
+def _estado_modulos():
+    """Estado atual indexado pelo nome do módulo, usado para calcular os deltas enviados por SSE."""
+    session = criar_sessao()
+    estado = {modulo['nome_modulo']: modulo for modulo in consultar_modulos(session)}
+    session.close()
+    return estado
+
+
+transmissor = Transmissor(tamanho_fila=TAMANHO_FILA_CLIENTE, max_clientes=MAX_CLIENTES_SSE)
+monitor = MonitorMudancas(_ler_versao, _estado_modulos, transmissor, INTERVALO_EVENTOS)
+
+@rotas.route('/modulos.json')
+@cache.em_cache
+def modulos_json():
+    """Retorna todos os módulos com status, coordenadas e última atualização."""
+    session = sessao_escopo()
+    modulos_lista = consultar_modulos(session)
+    return jsonify(modulos_lista)
+
+def _ler_data(texto, padrao):
+    """Aceita 'AAAA-MM-DD' ou 'AAAA-MM-DDTHH:MM[:SS]'."""
+    return datetime.fromisoformat(texto) if texto else padrao
+
+def consultar_historico(session, inicio, fim, granularidade, modulo=None):
+    """
+    Contagens de alertas por módulo e intervalo (hora ou dia), lidas dos agregados mantidos pela ingestão.
+    Retorna os intervalos que começam entre 'inicio' (inclusive) e 'fim' (exclusive).
+    """
+    tabela = AlertasPorHora if granularidade == 'hora' else AlertasPorDia
+    consulta = (session.query(tabela)
+                .filter(tabela.inicio >= inicio, tabela.inicio < fim)
+                .order_by(tabela.nome_modulo, tabela.inicio))
+    if modulo:
+        consulta = consulta.filter(tabela.nome_modulo == modulo)
+
+    return [{
+        'nome_modulo': linha.nome_modulo,
+        'inicio': linha.inicio.isoformat(),
+        'criticos': linha.criticos,
+        'informativos': linha.informativos,
+        'primeira_vez': linha.primeira_vez.isoformat(),
+        'ultima_vez': linha.ultima_vez.isoformat()
+    } for linha in consulta.all()]
+
+@rotas.route('/historico.json')
+@cache.em_cache
+def historico_json():
+    """
+    Histórico de alertas em um intervalo de tempo, agregado por hora ou por dia.
+    Parâmetros: inicio, fim (ISO 8601; padrão: últimos 7 dias), modulo (opcional)
+    e granularidade ('hora' ou 'dia'; padrão: 'hora' até 2 dias de intervalo, senão 'dia').
+    """
+    try:
+        fim = _ler_data(request.args.get('fim'), datetime.now())
+        inicio = _ler_data(request.args.get('inicio'), fim - timedelta(days=7))
+    except ValueError:
+        return jsonify({'erro': "Datas devem estar no formato AAAA-MM-DD ou AAAA-MM-DDTHH:MM."}), 400
+    if inicio >= fim:
+        return jsonify({'erro': "'inicio' deve ser anterior a 'fim'."}), 400
+
+    granularidade = request.args.get('granularidade') or ('hora' if fim - inicio <= timedelta(days=2) else 'dia')
+    if granularidade not in ('hora', 'dia'):
+        return jsonify({'erro': "'granularidade' deve ser 'hora' ou 'dia'."}), 400
+
+    session = sessao_escopo()
+    historico = consultar_historico(session, inicio, fim, granularidade, request.args.get('modulo'))
+    return jsonify({'inicio': inicio.isoformat(), 'fim': fim.isoformat(),
+                    'granularidade': granularidade, 'intervalos': historico})
+
+def _filtro_caixa(sul, oeste, norte, leste):
+    """
+    Módulos dentro da caixa: faixas do índice de geohash que cobrem a caixa (células vizinhas viram
+    uma faixa só) mais o filtro exato em latitude/longitude para as bordas das células.
+    """
+    faixas = []
+    for celula in geografia.cobertura(sul, oeste, norte, leste, MAX_CELULAS_COBERTURA):
+        proxima = geografia.proxima_celula(celula)
+        if faixas and faixas[-1][1] == celula:
+            faixas[-1][1] = proxima
+        else:
+            faixas.append([celula, proxima])
+    condicoes = [and_(Modulos.geohash >= inicio, Modulos.geohash < fim) if fim else Modulos.geohash >= inicio
+                 for inicio, fim in faixas]
+    return and_(or_(*condicoes), Modulos.latitude.between(sul, norte), Modulos.longitude.between(oeste, leste))
+
+def consultar_clusters(session, sul, oeste, norte, leste, zoom):
+    """
+    Módulos da caixa agrupados pelo prefixo do geohash com a precisão do nível de zoom: quantidade,
+    posição média, número de módulos em estado crítico e a severidade máxima de cada grupo.
+    Os críticos vêm de uma segunda consulta que parte do índice de status_modulos.nivel, em vez de
+    juntar o status de todos os módulos da caixa.
+    """
+    precisao = geografia.precisao_para_zoom(zoom)
+    celula = func.substr(Modulos.geohash, 1, precisao).label('celula')
+    filtro = _filtro_caixa(sul, oeste, norte, leste)
+    grupos = (session.query(celula, func.count(), func.avg(Modulos.latitude), func.avg(Modulos.longitude),
+                            func.min(Modulos.nome_modulo))
+              .filter(filtro)
+              .group_by(celula)
+              .all())
+    criticos_por_celula = dict(session.query(celula, func.count())
+                               .join(StatusModulos, StatusModulos.nome_modulo == Modulos.nome_modulo)
+                               .filter(StatusModulos.nivel == 'Crítico', filtro)
+                               .group_by(celula)
+                               .all())
+
+    clusters = []
+    for geohash, quantidade, latitude, longitude, nome_modulo in grupos:
+        criticos = criticos_por_celula.get(geohash, 0)
+        cluster = {
+            'geohash': geohash,
+            'quantidade': quantidade,
+            'criticos': criticos,
+            'severidade_maxima': 'Crítico' if criticos else 'Informativo',
+            'latitude': latitude,
+            'longitude': longitude,
+        }
+        if quantidade == 1:
+            cluster['nome_modulo'] = nome_modulo
+        clusters.append(cluster)
+    return {'precisao': precisao, 'clusters': clusters}
+
+def consultar_alertas_proximos(session, latitude, longitude, raio_km, limite=LIMITE_ALERTAS_PROXIMOS):
+    """Módulos em estado crítico a até 'raio_km' do ponto, do mais próximo ao mais distante."""
+    linhas = (session.query(Modulos.nome_modulo, Modulos.latitude, Modulos.longitude,
+                            StatusModulos.descricao, StatusModulos.data_hora)
+              .join(StatusModulos, StatusModulos.nome_modulo == Modulos.nome_modulo)
+              .filter(StatusModulos.nivel == 'Crítico',
+                      _filtro_caixa(*geografia.caixa_do_raio(latitude, longitude, raio_km)))
+              .all())
+
+    alertas = []
+    for nome_modulo, lat_modulo, lon_modulo, descricao, data_hora in linhas:
+        distancia = geografia.distancia_km(latitude, longitude, lat_modulo, lon_modulo)
+        if distancia <= raio_km:
+            alertas.append({
+                'nome_modulo': nome_modulo,
+                'latitude': lat_modulo,
+                'longitude': lon_modulo,
+                'distancia_km': round(distancia, 3),
+                'descricao': descricao,
+                'data_hora': data_hora.isoformat()
+            })
+    alertas.sort(key=lambda alerta: alerta['distancia_km'])
+    return alertas[:limite]
+
+def _ler_numero(nome, padrao=None):
+    texto = request.args.get(nome)
+    if texto is None or texto == '':
+        if padrao is None:
+            raise ValueError(f"Parâmetro '{nome}' é obrigatório.")
+        return padrao
+    try:
+        return float(texto)
+    except ValueError:
+        raise ValueError(f"'{nome}' deve ser um número.") from None
+
+@rotas.route('/mapa/clusters.json')
+@cache.em_cache
+def mapa_clusters_json():
+    """
+    Módulos agrupados para o mapa. Parâmetros: sul, oeste, norte, leste (a área visível, em graus)
+    e zoom (nível do Leaflet); um grupo com um só módulo traz também 'nome_modulo'.
+    """
+    try:
+        sul, oeste = _ler_numero('sul', -90.0), _ler_numero('oeste', -180.0)
+        norte, leste = _ler_numero('norte', 90.0), _ler_numero('leste', 180.0)
+        zoom = int(_ler_numero('zoom', 3.0))
+    except ValueError as erro:
+        return jsonify({'erro': str(erro)}), 400
+    if sul > norte or oeste > leste:
+        return jsonify({'erro': "A caixa deve ter sul <= norte e oeste <= leste."}), 400
+
+    session = sessao_escopo()
+    resultado = consultar_clusters(session, sul, oeste, norte, leste, zoom)
+    return jsonify(resultado)
+
+@rotas.route('/alertas/proximos.json')
+@cache.em_cache
+def alertas_proximos_json():
+    """
+    Alertas críticos ativos (módulos cujo último status é crítico) perto de um ponto.
+    Parâmetros: lat, lon, raio_km (padrão 5, máximo 200) e limite (padrão 100).
+    """
+    try:
+        latitude, longitude = _ler_numero('lat'), _ler_numero('lon')
+        raio_km = _ler_numero('raio_km', RAIO_PADRAO_KM)
+        limite = int(_ler_numero('limite', LIMITE_ALERTAS_PROXIMOS))
+    except ValueError as erro:
+        return jsonify({'erro': str(erro)}), 400
+    if not 0 < raio_km <= RAIO_MAXIMO_KM:
+        return jsonify({'erro': f"'raio_km' deve estar entre 0 e {RAIO_MAXIMO_KM:.0f}."}), 400
+
+    session = sessao_escopo()
+    alertas = consultar_alertas_proximos(session, latitude, longitude, raio_km, limite)
+    return jsonify({'latitude': latitude, 'longitude': longitude, 'raio_km': raio_km, 'alertas': alertas})
+
+@rotas.route('/eventos')
+def eventos():
+    """
+    Atualizações ao vivo (Server-Sent Events) para o dashboard.
+    Eventos 'status' trazem um módulo que mudou, no mesmo formato de /modulos.json;
+    'ressincronizar' pede ao cliente que recarregue /modulos.json.
+    Com MAX_CLIENTES_SSE conectados responde 503: o EventSource desiste e a página consulta periodicamente.
+    """
+    monitor.iniciar()
+    assinatura = transmissor.inscrever()
+    if assinatura is None:
+        return Response("Limite de clientes ao vivo atingido.\n", status=503, mimetype='text/plain',
+                        headers={'Retry-After': '60'})
+
+    def gerar():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                evento = assinatura.proximo(INTERVALO_KEEPALIVE_SSE)
+                yield evento.texto if evento else ": keep-alive\n\n"
+        finally:
+            transmissor.cancelar(assinatura)
+
+    return Response(gerar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@rotas.route('/eventos/metricas.json')
+def eventos_metricas():
+    """Clientes SSE conectados e eventos publicados/descartados."""
+    return jsonify(transmissor.metricas())
+
+@rotas.route('/cache.json')
+def cache_json():
+    """Métricas do cache de respostas (acertos, faltas, 304)."""
+    return jsonify(cache.metricas())
+
+@rotas.route('/metrics')
+def metrics():
+    """Métricas do Prometheus deste processo (inclui a ingestão, se estiver embutida)."""
+    return Response(metricas.REGISTRY.render(), content_type=metricas.CONTENT_TYPE)
+
+def _encerrar_sessao(excecao=None):
+    """Ao fim de cada requisição a sessão da thread é fechada e a conexão volta ao pool."""
+    remover_sessao_escopo()
+
+
+def criar_app(template_folder=PASTA_TEMPLATES):
+    """
+    Cria a aplicação Flask com as rotas do site. Em produção: gunicorn -c gunicorn.conf.py 'site3:criar_app()'
+    (vários workers; a engine e o pool de conexões de cada worker são criados depois do fork).
+    """
+    aplicacao = Flask(__name__, template_folder=template_folder)
+    aplicacao.register_blueprint(rotas)
+    aplicacao.teardown_appcontext(_encerrar_sessao)
+    return aplicacao
+
+
+def iniciar_ingestao_embutida():
+    """Assina o MQTT e grava os alertas neste processo, avisando o cache e os clientes SSE a cada lote."""
+    return iniciar_ingestao_em_segundo_plano(ouvintes=[lambda lote: versao_dados.avisar(), monitor.avisar])
+
+
+app = criar_app()
+
+if __name__ == '__main__':
+    if INGESTAO_EMBUTIDA:
+        iniciar_ingestao_embutida()
+    # O reloader executaria este bloco duas vezes e duplicaria a ingestão embutida
+    app.run(debug=True, use_reloader=not INGESTAO_EMBUTIDA)
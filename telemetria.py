@@ -0,0 +1,99 @@
+"""
+Formato binário da telemetria dos módulos, compartilhado pelo nó LoRa (mq7emq2.ino), o gateway
+(lorarecebimento.ino), o Raspberry Pi (Firewatcher_Raspi.py) e a API.
+
+Registro versão 1: 18 bytes, little-endian, mesmo layout da struct RegistroTelemetria do nó LoRa:
+
+    versão u8 | módulo u16 | lat i32 | lon i32 | status u8 | mq2 u16 | mq7 u16 | seq u16
+
+- versão: 0xF0 | VERSION. Nunca é um caractere ASCII, então um payload binário não se confunde com o texto antigo;
+- módulo: 1 = 'A', 2 = 'B', ...;
+- lat/lon: ponto fixo, graus * COORDINATE_SCALE (resolução de ~1 cm);
+- status: 1 = incêndio/pico detectado, 0 = normal;
+- mq2/mq7: leitura bruta do ADC dos sensores de gás;
+- seq: contador do emissor (volta a 0 depois de 65535).
+
+Vários registros podem ser concatenados em um único publish MQTT; o gateway repassa pela serial
+uma linha '#' + registro em hexadecimal, para que bytes '\\n' do registro não quebrem o readline.
+
+O ganho do formato é no ar e na rede (pacote LoRa menor, um publish para todos os módulos, sensores e
+seq incluídos), não em CPU: decodificar um registro sozinho custa mais que interpretar a linha de texto,
+que não traz sensores nem seq. Só em lote (vários registros por publish) a API interpreta mais rápido
+que o texto (benchmarks/bench_telemetria.py).
+"""
+import struct
+from collections import namedtuple
+
+VERSION = 1
+VERSION_BYTE = 0xF0 | VERSION
+COORDINATE_SCALE = 10_000_000
+SERIAL_PREFIX = '#'
+
+RECORD_FORMAT = struct.Struct('<BHiiBHHH')
+RECORD_SIZE = RECORD_FORMAT.size
+
+TelemetryRecord = namedtuple('TelemetryRecord', ['module_id', 'lat', 'lon', 'status', 'mq2', 'mq7', 'seq'],
+                             defaults=(0, 0, 0, 0))
+# Monta o TelemetryRecord direto da tupla, sem o __new__ gerado pelo namedtuple (metade do custo do decode)
+_new_record = tuple.__new__
+
+
+def module_id_from_name(name):
+    """'A', 'Modulo_A' ou 'Modulo A' -> 1."""
+    letter = name.strip().replace('Modulo_', '').replace('Modulo ', '')
+    if len(letter) != 1 or not letter.isalpha():
+        raise ValueError(f"Nome de módulo inválido: {name!r}")
+    return ord(letter.upper()) - ord('A') + 1
+
+
+def module_letter(module_id):
+    """1 -> 'A'; ids acima de 26 viram o próprio número."""
+    return chr(ord('A') + module_id - 1) if 1 <= module_id <= 26 else str(module_id)
+
+
+def is_binary(payload):
+    return len(payload) > 0 and payload[0] == VERSION_BYTE
+
+
+def encode(record):
+    return RECORD_FORMAT.pack(VERSION_BYTE, record.module_id,
+                              round(record.lat * COORDINATE_SCALE), round(record.lon * COORDINATE_SCALE),
+                              record.status, record.mq2, record.mq7, record.seq & 0xFFFF)
+
+
+def encode_batch(records):
+    """Concatena os registros em um único payload."""
+    return b''.join(encode(record) for record in records)
+
+
+def decode_batch(data):
+    """Decodifica um payload com um ou mais registros. ValueError se o tamanho ou a versão não baterem."""
+    if not data or len(data) % RECORD_SIZE:
+        raise ValueError(f"Payload de {len(data)} bytes não é múltiplo do registro de {RECORD_SIZE} bytes")
+    records = []
+    for version, module_id, lat, lon, status, mq2, mq7, seq in RECORD_FORMAT.iter_unpack(data):
+        if version != VERSION_BYTE:
+            raise ValueError(f"Versão de telemetria não suportada: 0x{version:02X}")
+        records.append(_new_record(TelemetryRecord,
+                                   (module_id, lat / COORDINATE_SCALE, lon / COORDINATE_SCALE, status, mq2, mq7, seq)))
+    return records
+
+
+def decode(data):
+    """Decodifica um payload com exatamente um registro."""
+    if len(data) != RECORD_SIZE:
+        raise ValueError(f"Registro de telemetria deve ter {RECORD_SIZE} bytes, recebido {len(data)}")
+    version, module_id, lat, lon, status, mq2, mq7, seq = RECORD_FORMAT.unpack(data)
+    if version != VERSION_BYTE:
+        raise ValueError(f"Versão de telemetria não suportada: 0x{version:02X}")
+    return _new_record(TelemetryRecord, (module_id, lat / COORDINATE_SCALE, lon / COORDINATE_SCALE, status, mq2, mq7, seq))
+
+
+def format_serial(record):
+    """Linha enviada pelo gateway LoRa ao Pi: '#' + registro em hexadecimal."""
+    return SERIAL_PREFIX + encode(record).hex().upper()
+
+
+def decode_serial(line):
+    """Decodifica uma linha '#<hex>' recebida pela serial."""
+    return decode(bytes.fromhex(line[len(SERIAL_PREFIX):]))
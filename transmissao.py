@@ -0,0 +1,146 @@
+import json
+import queue
+import threading
+from collections import namedtuple
+
+# Evento já formatado no protocolo Server-Sent Events, compartilhado por todos os assinantes
+EventoSSE = namedtuple('EventoSSE', ['id', 'texto'])
+
+RESSINCRONIZAR = EventoSSE(None, "event: ressincronizar\ndata: {}\n\n")
+
+
+def formatar_evento(id_evento, tipo, dados):
+    return f"id: {id_evento}\nevent: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+class Assinatura:
+    """Fila limitada de um cliente SSE. Se o cliente não acompanhar, a fila é esvaziada e ele é mandado ressincronizar."""
+
+    def __init__(self, tamanho_fila):
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self.eventos_descartados = 0
+
+    def entregar(self, evento):
+        try:
+            self.fila.put_nowait(evento)
+        except queue.Full:
+            # Cliente lento: em vez de crescer sem limite, descarta o atraso e pede um estado completo
+            while True:
+                try:
+                    self.fila.get_nowait()
+                    self.eventos_descartados += 1
+                except queue.Empty:
+                    break
+            self.fila.put_nowait(RESSINCRONIZAR)
+
+    def proximo(self, timeout):
+        try:
+            return self.fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Transmissor:
+    """
+    Distribui eventos para todos os clientes SSE conectados; cada evento é serializado uma única vez.
+    Com 'max_clientes', inscrever() recusa (retorna None) novos clientes além do limite.
+    """
+
+    def __init__(self, tamanho_fila=64, max_clientes=None):
+        self.tamanho_fila = tamanho_fila
+        self.max_clientes = max_clientes
+        self._assinaturas = set()
+        self._lock = threading.Lock()
+        self._proximo_id = 1
+        self.eventos_publicados = 0
+        self.clientes_recusados = 0
+
+    def inscrever(self):
+        assinatura = Assinatura(self.tamanho_fila)
+        with self._lock:
+            if self.max_clientes is not None and len(self._assinaturas) >= self.max_clientes:
+                self.clientes_recusados += 1
+                return None
+            self._assinaturas.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    @property
+    def clientes(self):
+        return len(self._assinaturas)
+
+    def publicar(self, tipo, dados):
+        with self._lock:
+            id_evento = self._proximo_id
+            self._proximo_id += 1
+            assinaturas = list(self._assinaturas)
+        evento = EventoSSE(id_evento, formatar_evento(id_evento, tipo, dados))
+        for assinatura in assinaturas:
+            assinatura.entregar(evento)
+        self.eventos_publicados += 1
+        return id_evento
+
+    def metricas(self):
+        with self._lock:
+            assinaturas = list(self._assinaturas)
+        return {
+            'clientes': len(assinaturas),
+            'max_clientes': self.max_clientes,
+            'clientes_recusados': self.clientes_recusados,
+            'eventos_publicados': self.eventos_publicados,
+            'eventos_descartados': sum(a.eventos_descartados for a in assinaturas),
+            'maior_fila': max((a.fila.qsize() for a in assinaturas), default=0),
+        }
+
+
+class MonitorMudancas:
+    """
+    Thread única que detecta mudanças no status dos módulos e as publica como deltas.
+    A cada 'intervalo' consulta a versão dos dados; só quando ela muda lê o estado completo
+    (uma consulta) e publica os módulos que mudaram. avisar() antecipa a verificação,
+    usado quando a ingestão roda no mesmo processo.
+    """
+
+    def __init__(self, obter_versao, consultar_estado, transmissor, intervalo=0.5):
+        self.obter_versao = obter_versao
+        self.consultar_estado = consultar_estado
+        self.transmissor = transmissor
+        self.intervalo = intervalo
+        self._acordar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._versao = None
+        self._estado = None
+
+    def iniciar(self):
+        """Inicia a thread na primeira chamada; chamadas seguintes não fazem nada."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name="monitor-sse", daemon=True)
+                self._thread.start()
+
+    def avisar(self, *_):
+        self._acordar.set()
+
+    def _executar(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.verificar()
+            except Exception as e:
+                print(f"Erro ao verificar mudanças para os clientes SSE: {e}")
+
+    def verificar(self):
+        versao = self.obter_versao()
+        if versao == self._versao:
+            return
+        estado = self.consultar_estado()
+        if self._estado is not None:
+            for nome, item in estado.items():
+                if self._estado.get(nome) != item:
+                    self.transmissor.publicar('status', item)
+        self._versao, self._estado = versao, estado